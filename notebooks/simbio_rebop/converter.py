@@ -1,6 +1,7 @@
 import functools
 import itertools
-from typing import Protocol, cast
+from collections import Counter
+from typing import Iterable, Protocol, cast
 
 import numpy as np
 import rebop
@@ -11,8 +12,12 @@
 from symbolite.core import evaluate
 from symbolite.impl import libstd
 
+from network import influencers
+
 type VALUES = Species | Parameter | Constant
 
+COUNTER_PREFIX = "#"
+
 
 class Rebop(Protocol):
     def add_reaction(self, rate: float, reactants: list[str], products: list[str]): ...
@@ -26,7 +31,33 @@ def run(
     ) -> xarray.Dataset: ...
 
 
-def to_rebop(model: type[Compartment], /, values: dict[VALUES, float] = {}):
+def counter_name(reaction: MassAction, /, loop_index: int | None = None) -> str:
+    """Name of the species that counts the firings of a reaction.
+
+    Formatted as `#{reaction}#{loop_index}#{step}`, where reaction is the
+    reaction as named in the model (e.g. `cytoplasm.r_C3_PARP`) and step
+    is the elementary mass-action reaction within it.
+    """
+    group = reaction
+    while type(group.parent).__module__.startswith("simbio."):
+        group = group.parent
+    step = str(reaction).removeprefix(str(group)).removeprefix(".")
+    loop = "" if loop_index is None else str(loop_index)
+    return COUNTER_PREFIX.join(["", str(group), loop, step])
+
+
+def to_rebop(
+    model: type[Compartment],
+    /,
+    values: dict[VALUES, float] = {},
+    *,
+    count_firings: bool = False,
+):
+    """Convert a mass-action model into rebop reactions.
+
+    If count_firings, each reaction produces a counter species (see counter_name),
+    which is never consumed and holds the number of times it fired.
+    """
     sim = Simulator(model)
     problem = sim.create_problem(values)
     p = dict(zip(sim.compiled.parameters, problem.p))
@@ -38,6 +69,10 @@ def to_rebop(model: type[Compartment], /, values: dict[VALUES, float] = {}):
             str(s.variable) for s in r.reactants for _ in range(s.stoichiometry)
         ]
         products = [str(s.variable) for s in r.products for _ in range(s.stoichiometry)]
+        if count_firings:
+            counter = counter_name(r)
+            y[counter] = 0
+            products.append(counter)
         reactions.append((rate, reactants, products))
 
     return reactions, y
@@ -49,6 +84,8 @@ def to_rebop_loopy(
     /,
     values_main: dict[VALUES, float] = {},
     values_loop: dict[VALUES, ArrayLike] = {},
+    *,
+    count_firings: bool = False,
 ):
     @functools.cache
     def is_loop_var(x: VALUES, /) -> bool:
@@ -105,11 +142,37 @@ def variable_to_str(
                 for s in r.products
                 for _ in range(s.stoichiometry)
             ]
+            if count_firings:
+                counter = counter_name(r, loop_ix if is_loop_reaction(r) else None)
+                y[counter] = 0
+                products.append(counter)
             reactions.append((rate, reactants, products))
 
     return reactions, y
 
 
+def prune(reactions, y: dict[str, int], outputs: Iterable, /):
+    """Remove reactions that cannot affect the outputs (see network.influencers),
+    and species that are left without reactions.
+
+    Counters of removed reactions are removed too.
+    """
+
+    def changes(reactants: list[str], products: list[str]) -> list[str]:
+        net = Counter(products)
+        net.subtract(reactants)
+        return [s for s, n in net.items() if n != 0]
+
+    outputs = list(map(str, outputs))
+    _, kept = influencers(
+        [(r, changes(r, p)) for _, r, p in reactions],
+        outputs,
+    )
+    reactions = [reactions[j] for j in kept]
+    species = {s for _, reactants, products in reactions for s in reactants + products}
+    return reactions, {k: v for k, v in y.items() if k in species or k in outputs}
+
+
 def create_rebop(reactions):
     runner = cast(Rebop, rebop.Gillespie())
     for r in sorted(reactions):
@@ -0,0 +1,167 @@
+from dataclasses import dataclass, field
+from typing import Iterable, Sequence
+
+import numpy as np
+import xarray
+from numpy.typing import ArrayLike, NDArray
+
+
+def resample(ds: xarray.Dataset, time: ArrayLike) -> xarray.Dataset:
+    """Forward-fill a sparse trajectory onto a common time grid."""
+    return ds.reindex(time=np.asarray(time), method="ffill")
+
+
+@dataclass
+class _P2Quantile:
+    """Streaming quantile estimator (P² algorithm), vectorized over a grid.
+
+    Jain & Chlamtac (1985). Keeps 5 markers per grid point,
+    so memory does not grow with the number of observations.
+    """
+
+    p: float
+    count: int = field(default=0, init=False)
+    _buffer: list[NDArray] = field(default_factory=list, init=False, repr=False)
+    _q: NDArray = field(init=False, repr=False)
+    _n: NDArray = field(init=False, repr=False)
+    _desired: NDArray = field(init=False, repr=False)
+    _increment: NDArray = field(init=False, repr=False)
+
+    def add(self, x: NDArray):
+        self.count += 1
+        if self.count <= 5:
+            self._buffer.append(x)
+            if self.count == 5:
+                self._initialize()
+            return
+
+        q, n = self._q, self._n
+        q[0] = np.minimum(q[0], x)
+        q[4] = np.maximum(q[4], x)
+        k = (x >= q[1]).astype(int) + (x >= q[2]) + (x >= q[3])
+        n[1:] += np.arange(1, 5).reshape(-1, *(1,) * x.ndim) > k
+        self._desired += self._increment
+
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            up = (d >= 1) & (n[i + 1] - n[i] > 1)
+            down = (d <= -1) & (n[i - 1] - n[i] < -1)
+            move = up | down
+            if not move.any():
+                continue
+            d = np.where(up, 1.0, -1.0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                neighbor_q = np.where(up, q[i + 1], q[i - 1])
+                neighbor_n = np.where(up, n[i + 1], n[i - 1])
+                linear = q[i] + d * (neighbor_q - q[i]) / (neighbor_n - n[i])
+            parabolic_ok = (q[i - 1] < parabolic) & (parabolic < q[i + 1])
+            q[i] = np.where(move, np.where(parabolic_ok, parabolic, linear), q[i])
+            n[i] = np.where(move, n[i] + d, n[i])
+
+    def _initialize(self):
+        self._q = np.sort(np.stack(self._buffer), axis=0)
+        self._n = np.broadcast_to(
+            np.arange(5.0).reshape(-1, *(1,) * (self._q.ndim - 1)),
+            self._q.shape,
+        ).copy()
+        p = self.p
+        self._desired = np.array([0, 2 * p, 4 * p, 2 + 2 * p, 4])
+        self._increment = np.array([0, p / 2, p, (1 + p) / 2, 1])
+        self._buffer = []
+
+    @property
+    def value(self) -> NDArray:
+        if self.count == 0:
+            raise ValueError("no observations")
+        elif self.count < 5:
+            return np.quantile(np.stack(self._buffer), self.p, axis=0)
+        return self._q[2]
+
+
+@dataclass
+class Ensemble:
+    """Running summary of stochastic trajectories on a common time grid.
+
+    Trajectories are forward-filled onto `time`, and only running moments
+    and quantile markers are kept, so memory is O(len(time)) per species
+    regardless of the number of seeds.
+
+    >>> ensemble = Ensemble(time=np.linspace(0, t_max, 1_000))
+    >>> for ds in results:
+    ...     ensemble.add(ds)
+    >>> ensemble.to_dataset()
+    """
+
+    time: NDArray
+    quantiles: Sequence[float] = (0.05, 0.25, 0.5, 0.75, 0.95)
+    count: int = field(default=0, init=False)
+    _mean: dict[str, NDArray] = field(default_factory=dict, init=False, repr=False)
+    _m2: dict[str, NDArray] = field(default_factory=dict, init=False, repr=False)
+    _quantiles: dict[str, list[_P2Quantile]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+
+    def __post_init__(self):
+        self.time = np.asarray(self.time)
+
+    def add(self, ds: xarray.Dataset):
+        """Add a trajectory, resampling it onto the grid if needed."""
+        if ds.sizes["time"] != self.time.size or not np.array_equal(
+            ds["time"], self.time
+        ):
+            ds = resample(ds, self.time)
+
+        if self.count == 0:
+            for k in ds.data_vars:
+                k = str(k)
+                self._mean[k] = np.zeros(self.time.size)
+                self._m2[k] = np.zeros(self.time.size)
+                self._quantiles[k] = [_P2Quantile(q) for q in self.quantiles]
+        elif ds.data_vars.keys() != self._mean.keys():
+            raise ValueError("trajectory variables do not match the ensemble")
+
+        self.count += 1
+        for k, v in ds.data_vars.items():
+            k = str(k)
+            x = v.to_numpy().astype(float)
+            # Welford's online algorithm
+            delta = x - self._mean[k]
+            self._mean[k] += delta / self.count
+            self._m2[k] += delta * (x - self._mean[k])
+            for q in self._quantiles[k]:
+                q.add(x)
+
+    def update(self, datasets: Iterable[xarray.Dataset]):
+        for ds in datasets:
+            self.add(ds)
+        return self
+
+    def to_dataset(self) -> xarray.Dataset:
+        if self.count == 0:
+            raise ValueError("empty ensemble")
+
+        variables = list(self._mean)
+        mean = np.stack([self._mean[k] for k in variables])
+        ddof = 1 if self.count > 1 else 0
+        variance = np.stack([self._m2[k] for k in variables]) / (self.count - ddof)
+        quantile = np.stack(
+            [[q.value for q in self._quantiles[k]] for k in variables],
+            axis=1,
+        )
+        return xarray.Dataset(
+            {
+                "mean": (("variable", "time"), mean),
+                "variance": (("variable", "time"), variance),
+                "quantiles": (("quantile", "variable", "time"), quantile),
+            },
+            coords={
+                "time": self.time,
+                "variable": variables,
+                "quantile": list(self.quantiles),
+            },
+            attrs={"seeds": self.count},
+        )
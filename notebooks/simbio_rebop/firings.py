@@ -0,0 +1,124 @@
+from dataclasses import dataclass, field
+from typing import Iterable, Literal, Sequence
+
+import numpy as np
+import pandas as pd
+import xarray
+
+try:
+    from .converter import COUNTER_PREFIX
+except ImportError:  # imported from this directory, as in runner.py
+    from converter import COUNTER_PREFIX
+
+LEVELS = ("reaction", "loop", "step")
+
+
+def counters(names: Iterable[str], /) -> list[str]:
+    """Select the firing counter species (see converter.counter_name)."""
+    return [k for k in map(str, names) if k.startswith(COUNTER_PREFIX)]
+
+
+def final_counts(result: xarray.Dataset | pd.DataFrame, /) -> dict[str, int]:
+    """Firing counters at the last time point of a trajectory.
+
+    Counters are never consumed, so their last saved values are the totals.
+    Empty if the trajectory has no counters.
+    """
+    return {k: int(np.asarray(result[k])[-1]) for k in counters(result)}
+
+
+def drop_counters(
+    result: xarray.Dataset | pd.DataFrame, /
+) -> xarray.Dataset | pd.DataFrame:
+    """Trajectory without the firing counters."""
+    names = counters(result)
+    if isinstance(result, xarray.Dataset):
+        return result.drop_vars(names)
+    return result.drop(columns=names)
+
+
+def firings(result: xarray.Dataset | pd.DataFrame, /) -> pd.Series:
+    """Number of firings per reaction in a trajectory.
+
+    Requires the final counts in result.attrs["firings"] (see final_counts).
+    Indexed by (reaction, loop, step), where loop is empty for non-loop reactions.
+    """
+    counts = result.attrs.get("firings", {})
+    if len(counts) == 0:
+        raise ValueError("no firing counters, run with count_firings=True")
+
+    index = pd.MultiIndex.from_tuples(
+        [tuple(k.split(COUNTER_PREFIX)[1:]) for k in counts],
+        names=LEVELS,
+    )
+    return pd.Series(list(counts.values()), index=index, name="firings")
+
+
+@dataclass
+class Profile:
+    """Per-reaction firing counts aggregated across seeds.
+
+    >>> profile = Profile().update(results)
+    >>> profile.to_frame().head(10)  # hottest reactions
+    """
+
+    seeds: int = field(default=0, init=False)
+    simulated_time: float = field(default=0, init=False)
+    counts: pd.Series | None = field(default=None, init=False, repr=False)
+
+    def add(self, ds: xarray.Dataset, /, *, t_max: float | None = None):
+        """Add a trajectory.
+
+        t_max defaults to the last time point,
+        which can be earlier than tmax for sparse trajectories.
+        """
+        counts = firings(ds)
+        if self.counts is None:
+            self.counts = counts
+        else:
+            self.counts = self.counts.add(counts, fill_value=0)
+        if t_max is None:
+            t_max = float(ds["time"][-1])
+        self.seeds += 1
+        self.simulated_time += t_max
+
+    def update(self, datasets: Iterable[xarray.Dataset]):
+        for ds in datasets:
+            self.add(ds)
+        return self
+
+    @property
+    def events(self) -> int:
+        if self.counts is None:
+            return 0
+        return int(self.counts.sum())
+
+    @property
+    def events_per_second(self) -> float:
+        """Total SSA events per simulated second."""
+        return self.events / self.simulated_time
+
+    def to_frame(
+        self,
+        by: Sequence[Literal["reaction", "loop", "step"]] = ("reaction",),
+    ) -> pd.DataFrame:
+        """Firings grouped by level, sorted from hottest.
+
+        By default, loop copies (e.g. mitocondria_0, mitocondria_1, ...)
+        are merged into their reaction name in the model.
+        """
+        if self.counts is None:
+            raise ValueError("empty profile")
+
+        counts = self.counts.groupby(level=list(by)).sum()
+        return (
+            pd.DataFrame(
+                {
+                    "firings": counts,
+                    "fraction": counts / counts.sum(),
+                    "per_second": counts / self.simulated_time,
+                }
+            )
+            .sort_values("firings", ascending=False)
+            .rename_axis(index=list(by))
+        )
@@ -1,13 +1,26 @@
-from dataclasses import dataclass
+import functools
+import json
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
 from functools import cached_property
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+import xarray
 from converter import create_rebop, to_rebop_loopy
+from ensemble import Ensemble
+from firings import counters, drop_counters, final_counts, firings
+from numpy.random import SeedSequence
+from seeds import Campaign, to_seed
+from telemetry import Record, Telemetry, format_time
 
 from mito import ARM
 
 t_max = 15 * 3_600  # seconds
 save = list(map(str, [ARM.cytoplasm.C3_A, ARM.cytoplasm.C8_A, ARM.cytoplasm.Apop]))
+grid = np.arange(0, t_max + 1, 60)  # seconds, for the ensemble summaries
 
 
 @dataclass
@@ -15,6 +28,8 @@ class Model:
     path: Path
     N: int
     volume: float
+    count_firings: bool = False
+    timings: dict[str, float] = field(default_factory=dict, init=False)
 
     def __post_init__(self):
         self.path.mkdir(parents=True, exist_ok=True)
@@ -30,62 +45,296 @@ def rebop(self):
                 ARM.volume: self.volume,
                 ARM.mitocondria_volume_fraction: 0.07 / self.N,
             },
+            count_firings=self.count_firings,
         )
-        self.save = save
         return create_rebop(reactions)
 
-    def run(self, seed: int):
-        p = self.path / f"{seed}.parquet"
+    def run(self, replicate: int, seq: SeedSequence, /, *, metadata: dict) -> Path:
+        p = self.path / f"{replicate}.parquet"
         if p.exists():
-            return
-        df = self.rebop.run(
+            return p
+        start = time.perf_counter()
+        rebop = self.rebop
+        built = time.perf_counter()
+        ds = rebop.run(
             self.y,
             tmax=t_max,
             nb_steps=t_max,
-            seed=seed,
-            save=self.save,
+            seed=to_seed(seq),
+            save=[*save, *counters(self.y)],
             sparse=True,
-        ).to_dataframe()
-        df[sorted(df.columns)].to_parquet(p, compression="zstd")
+        )
+        self.timings = {
+            "build_time": built - start,
+            "simulation_time": time.perf_counter() - built,
+        }
+        counts = final_counts(ds)
+        df = drop_counters(ds).to_dataframe()
+        df = df[sorted(df.columns)]
+        df.attrs["seed_sequence"] = metadata
+        if counts:
+            df.attrs["firings"] = counts
+        df.to_parquet(p, compression="zstd")
+        return p
+
+
+def onset(df: pd.DataFrame, /, variable: str = save[0]) -> float:
+    """Time at which variable first reaches half its maximum.
+
+    Returns NaN if it never increases."""
+    x = df[variable].to_numpy()
+    if x.max() <= x[0]:
+        return np.nan
+    return float(df.index[np.argmax(x >= (x[0] + x.max()) / 2)])
 
 
 root = Path("results")
 
 
-def batch(x: tuple[int, str, int]):
-    seed, volume, N = x
+def trajectory(replicate: int, volume: str, N: int) -> xarray.Dataset:
+    """Saved sparse trajectory of a replicate."""
+    df = pd.read_parquet(root / f"ARM{N}" / volume / f"{replicate}.parquet")
+    return xarray.Dataset.from_dataframe(df)
+
+
+def summarize(ensembles: dict[tuple[str, int], Ensemble]):
+    """Write the ensemble of each (volume, N) configuration to ensemble.nc."""
+    for (volume, N), ensemble in ensembles.items():
+        if ensemble.count > 0:
+            ensemble.to_dataset().to_netcdf(root / f"ARM{N}" / volume / "ensemble.nc")
+
+
+def batch(
+    x: tuple[int, str, int],
+    *,
+    campaign: Campaign,
+    count_firings: bool = False,
+) -> Record:
+    """Run a replicate of a (volume, N) configuration.
+
+    Its random stream is derived from the campaign and the spawn key
+    (N, volume, replicate), which is stored in the parquet metadata.
+    """
+    replicate, volume, N = x
+    seq = campaign.stream(N, volume, replicate=replicate)
+    start = time.perf_counter()
     runner = Model(
         root / f"ARM{N}" / volume,
         N,
         float(volume),
+        count_firings=count_firings,
+    )
+    p = runner.run(replicate, seq, metadata=campaign.metadata(seq))
+    df = pd.read_parquet(p)
+    campaign.check(df.attrs.get("seed_sequence", {}), seq)
+    record = Record(
+        N=N,
+        volume=float(volume),
+        seed=replicate,
+        onset=onset(df),
+        skipped=len(runner.timings) == 0,
+        wall_time=time.perf_counter() - start,
+        **runner.timings,
     )
-    runner.run(seed)
+    if not record.skipped and "firings" in df.attrs:
+        record.events = int(firings(df).sum())
+    return record
+
+
+def run_tasks(
+    tasks: list[tuple[int, str, int]],
+    *,
+    workers: int,
+    campaign: Campaign,
+    telemetry: Telemetry,
+    count_firings: bool = False,
+):
+    """Run (replicate, volume, N) tasks, showing the predicted remaining time.
+
+    Trajectories are aggregated as they arrive (see summarize).
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    from tqdm import tqdm
+
+    remaining = {task: (task[2], float(task[1])) for task in tasks}
+    ensembles = defaultdict(lambda: Ensemble(grid))
+    func = functools.partial(batch, campaign=campaign, count_firings=count_firings)
+    with (
+        ProcessPoolExecutor(workers) as executor,
+        tqdm(total=len(tasks), unit="task") as progress,
+    ):
+        futures = {executor.submit(func, task): task for task in tasks}
+        for future in as_completed(futures):
+            replicate, volume, N = task = futures[future]
+            del remaining[task]
+            telemetry.log(future.result())
+            ensembles[volume, N].add(trajectory(replicate, volume, N))
+            progress.update()
+            progress.set_postfix(
+                eta=format_time(telemetry.eta(remaining.values(), workers=workers)),
+                **telemetry.summary(),
+            )
+    summarize(ensembles)
+
+
+def adaptive(
+    configurations: list[tuple[str, int]],
+    seeds: range,
+    *,
+    stopping,
+    workers: int,
+    campaign: Campaign,
+    telemetry: Telemetry,
+    count_firings: bool = False,
+):
+    """Launch seeds per configuration until its stopping rule is done.
+
+    The predicted remaining time is an upper bound, assuming every
+    configuration exhausts its budget. Trajectories are aggregated
+    as they arrive (see summarize).
+    """
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    from tqdm import tqdm
+
+    rules = {c: stopping() for c in configurations}
+    pending = {c: iter(seeds) for c in configurations}
+    ensembles = {c: Ensemble(grid) for c in configurations}
+    func = functools.partial(batch, campaign=campaign, count_firings=count_firings)
+
+    with ProcessPoolExecutor(workers) as executor, tqdm(unit="seed") as progress:
+        running = {}
+
+        def submit(c: tuple[str, int]):
+            seed = next(pending[c], None)
+            if seed is not None:
+                running[executor.submit(func, (seed, *c))] = (seed, c)
+
+        for c in configurations:
+            for _ in range(rules[c].min_samples):
+                submit(c)
+
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                seed, c = running.pop(future)
+                rule = rules[c]
+                record = future.result()
+                telemetry.log(record)
+                ensembles[c].add(trajectory(seed, *c))
+                rule.add(record.onset)
+                progress.update()
+                in_flight = sum(v == c for _, v in running.values())
+                if not rule.done and rule.count + in_flight < rule.max_samples:
+                    submit(c)
+            budget = [
+                (N, float(volume))
+                for (volume, N), rule in rules.items()
+                if not rule.done
+                for _ in range(rule.max_samples - rule.count)
+            ]
+            progress.set_postfix(
+                converged=sum(r.converged for r in rules.values()),
+                eta_max=format_time(telemetry.eta(budget, workers=workers)),
+                **telemetry.summary(),
+            )
+    summarize(ensembles)
+
+    for (volume, N), rule in rules.items():
+        report = rule.report()
+        path = root / f"ARM{N}" / volume / "precision.json"
+        path.write_text(json.dumps(report, indent=2))
+        print(
+            f"ARM{N} volume={volume}: {report['samples']} seeds,",
+            ", ".join(f"{k}±{v / 2:.0f}s" for k, v in rule.precision().items()),
+            "(converged)" if report["converged"] else "(budget exhausted)",
+        )
+    return rules
 
 
 if __name__ == "__main__":
     import itertools
-    import math
     import os
 
-    import numpy as np
     import typer
-    from tqdm.contrib.concurrent import process_map
+    from stopping import SequentialStopping
+
+    def main(
+        *,
+        seeds: tuple[int, int],
+        mito: list[int],
+        workers: int | None = None,
+        ci_width: float | None = None,
+        confidence: float = 0.95,
+        quantiles: list[float] = [],
+        min_seeds: int = 10,
+        count_firings: bool = False,
+        estimate: bool = False,
+        entropy: int | None = None,
+    ):
+        """Run stochastic simulations.
+
+        With --ci-width (in seconds), seeds from the --seeds range are launched
+        per (N, volume) until the confidence intervals of the onset-time mean
+        and --quantiles are narrower than ci_width, or the range is exhausted.
+
+        Per-task telemetry is appended to results/telemetry.jsonl.
+        With --estimate, the campaign duration is predicted from it without running.
 
-    def main(*, seeds: tuple[int, int], mito: list[int], workers: int | None = None):
+        --seeds is a range of replicate indices. Each replicate gets an independent
+        random stream derived from the entropy in results/campaign.json (created
+        on first use, or from --entropy), so disjoint ranges can be run on
+        different machines sharing that file.
+        """
         if workers is None:
             workers = os.cpu_count()
+        telemetry = Telemetry(root / "telemetry.jsonl")
+        campaign = Campaign.load(root / "campaign.json", entropy=entropy)
 
         seed_range = range(*seeds)
         volumes = np.geomspace(0.1, 1, 6)[-1:]
         volumes = [f"{x:.3f}" for x in volumes]
 
-        factors = (seed_range, volumes, mito)
-        process_map(
-            batch,
-            itertools.product(*factors),
-            total=math.prod(map(len, factors)),
-            miniters=1,
-            max_workers=workers,
+        if estimate:
+            tasks = [
+                (N, float(volume))
+                for _, volume, N in itertools.product(seed_range, volumes, mito)
+            ]
+            eta = telemetry.eta(tasks, workers=workers)
+            print(
+                f"{len(tasks)} tasks,",
+                f"{format_time(telemetry.predict(tasks))} CPU time,",
+                f"{format_time(eta)} with {workers} workers",
+                f"(from {len(telemetry.records)} records)",
+            )
+            return
+
+        if ci_width is not None:
+            adaptive(
+                list(itertools.product(volumes, mito)),
+                seed_range,
+                stopping=functools.partial(
+                    SequentialStopping,
+                    width=ci_width,
+                    confidence=confidence,
+                    quantiles=quantiles,
+                    min_samples=min_seeds,
+                    max_samples=len(seed_range),
+                ),
+                workers=workers,
+                campaign=campaign,
+                telemetry=telemetry,
+                count_firings=count_firings,
+            )
+            return
+
+        run_tasks(
+            list(itertools.product(seed_range, volumes, mito)),
+            workers=workers,
+            campaign=campaign,
+            telemetry=telemetry,
+            count_firings=count_firings,
         )
 
     typer.run(main)
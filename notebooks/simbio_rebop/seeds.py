@@ -0,0 +1,86 @@
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from numpy.random import SeedSequence
+
+
+def as_int(part: int | float | str, /) -> int:
+    """Encode a configuration value as a non-negative int for a spawn key."""
+    if isinstance(part, int | np.integer):
+        if part < 0:
+            raise ValueError(f"negative configuration value: {part}")
+        return int(part)
+    return int.from_bytes(str(part).encode(), "little")
+
+
+def to_seed(seq: SeedSequence, /) -> int:
+    """64-bit integer seed for RNGs that do not accept a SeedSequence."""
+    return int(seq.generate_state(1, np.uint64)[0])
+
+
+@dataclass(frozen=True)
+class Campaign:
+    """Independent random streams per (configuration, replicate).
+
+    Streams are derived from a single campaign entropy, and the spawn key
+    (configuration..., replicate) identifies them. Replicate ranges can then be
+    sharded across machines or extended later without overlapping streams,
+    as long as all of them share the campaign entropy.
+
+    >>> campaign = Campaign.load(root / "campaign.json")
+    >>> seq = campaign.stream(N, volume, replicate=0)
+    >>> seq.spawn(2)  # split into sub-streams
+    """
+
+    entropy: int
+
+    @classmethod
+    def load(cls, path: Path, /, *, entropy: int | None = None):
+        """Load the campaign entropy from path, creating it if needed."""
+        path = Path(path)
+        if path.exists():
+            campaign = cls(**json.loads(path.read_text()))
+            if entropy is not None and entropy != campaign.entropy:
+                raise ValueError(f"{path} has a different entropy")
+            return campaign
+
+        if entropy is None:
+            entropy = SeedSequence().entropy
+        campaign = cls(entropy)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"entropy": entropy}))
+        return campaign
+
+    def spawn_key(self, *configuration: int | float | str, replicate: int):
+        return (*map(as_int, configuration), as_int(replicate))
+
+    def stream(self, *configuration: int | float | str, replicate: int):
+        return SeedSequence(
+            self.entropy,
+            spawn_key=self.spawn_key(*configuration, replicate=replicate),
+        )
+
+    def metadata(self, seq: SeedSequence, /) -> dict:
+        """Provenance to store alongside results."""
+        return {"entropy": seq.entropy, "spawn_key": list(seq.spawn_key)}
+
+    def check(self, metadata: dict, /, seq: SeedSequence | None = None):
+        """Raise if a stored result comes from a different campaign,
+        or from a different stream than seq.
+
+        Results without metadata, such as those seeded with raw integers
+        before campaigns, also raise, as their streams are not independent.
+        """
+        if "entropy" not in metadata:
+            raise ValueError(
+                "result has no seed metadata, move it away to rerun it in this campaign"
+            )
+        if metadata["entropy"] != self.entropy:
+            raise ValueError("result belongs to a different campaign")
+        if seq is not None and metadata != self.metadata(seq):
+            raise ValueError(
+                f"result has spawn key {metadata['spawn_key']}"
+                f" instead of {list(seq.spawn_key)}"
+            )
@@ -0,0 +1,87 @@
+import math
+from dataclasses import dataclass, field
+from typing import Sequence
+
+import numpy as np
+from scipy import stats
+
+
+@dataclass
+class SequentialStopping:
+    """Stopping rule for the number of stochastic seeds.
+
+    Samples (e.g. onset times) are added one at a time until the
+    confidence intervals of the mean and the requested quantiles
+    are narrower than `width`, or `max_samples` is reached.
+
+    Quantile intervals are distribution-free (binomial order statistics).
+    Non-finite samples (e.g. cells that did not die before t_max)
+    count towards the budget but not towards the estimates.
+    """
+
+    width: float
+    confidence: float = 0.95
+    quantiles: Sequence[float] = ()
+    min_samples: int = 10
+    max_samples: int = 1_000
+    samples: list[float] = field(default_factory=list, init=False)
+
+    @property
+    def count(self) -> int:
+        return len(self.samples)
+
+    def add(self, x: float):
+        self.samples.append(x)
+
+    def intervals(self) -> dict[str, tuple[float, float]]:
+        x = np.sort(np.asarray(self.samples, dtype=float))
+        x = x[np.isfinite(x)]
+        n = x.size
+        alpha = 1 - self.confidence
+
+        out = {}
+        if n < 2:
+            out["mean"] = (-math.inf, math.inf)
+        else:
+            mean = x.mean()
+            half = stats.t.ppf(1 - alpha / 2, n - 1) * x.std(ddof=1) / math.sqrt(n)
+            out["mean"] = (mean - half, mean + half)
+
+        for q in self.quantiles:
+            low = int(stats.binom.ppf(alpha / 2, n, q))
+            high = int(stats.binom.ppf(1 - alpha / 2, n, q)) + 1
+            if n == 0 or low < 1 or high > n:
+                out[f"q{q:g}"] = (-math.inf, math.inf)
+            else:
+                out[f"q{q:g}"] = (x[low - 1], x[high - 1])
+        return out
+
+    def precision(self) -> dict[str, float]:
+        return {k: high - low for k, (low, high) in self.intervals().items()}
+
+    @property
+    def converged(self) -> bool:
+        if self.count < self.min_samples:
+            return False
+        return all(w <= self.width for w in self.precision().values())
+
+    @property
+    def exhausted(self) -> bool:
+        return self.count >= self.max_samples
+
+    @property
+    def done(self) -> bool:
+        return self.converged or self.exhausted
+
+    def report(self) -> dict:
+        x = np.asarray(self.samples, dtype=float)
+        finite = x[np.isfinite(x)]
+        return {
+            "samples": self.count,
+            "finite": int(finite.size),
+            "mean": float(finite.mean()) if finite.size > 0 else math.nan,
+            "confidence": self.confidence,
+            "target_width": self.width,
+            "intervals": {k: list(map(float, v)) for k, v in self.intervals().items()},
+            "converged": self.converged,
+        }
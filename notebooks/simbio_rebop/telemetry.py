@@ -0,0 +1,147 @@
+import json
+import math
+import os
+import resource
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+
+def peak_rss() -> int:
+    """Peak resident set size of the current process in bytes."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return rss
+    return rss * 1024  # kilobytes in Linux
+
+
+@dataclass(kw_only=True)
+class Record:
+    N: int
+    volume: float
+    seed: int
+    onset: float = math.nan
+    skipped: bool = False
+    build_time: float = math.nan
+    simulation_time: float = math.nan
+    wall_time: float = math.nan
+    events: int | None = None
+    "SSA events, from the firing counters. None unless run with count_firings."
+    worker: int = field(default_factory=os.getpid)
+    peak_rss: int = field(default_factory=peak_rss)
+
+    @property
+    def events_per_second(self) -> float:
+        """NaN unless run with count_firings."""
+        if self.events is None:
+            return math.nan
+        return self.events / self.simulation_time
+
+    def to_json(self) -> str:
+        return json.dumps({**asdict(self), "events_per_second": self.events_per_second})
+
+
+@dataclass
+class CostModel:
+    """Wall time per task as a power law in N and volume.
+
+    log(wall_time) = a + b log(N) + c log(volume)
+    """
+
+    coefficients: np.ndarray = field(default_factory=lambda: np.full(3, np.nan))
+
+    @staticmethod
+    def _design(N, volume):
+        N, volume = np.broadcast_arrays(N, volume)
+        return np.column_stack([np.ones(N.size), np.log(N), np.log(volume)])
+
+    def fit(self, records: Iterable[Record]):
+        records = [r for r in records if not r.skipped and r.wall_time > 0]
+        if len(records) == 0:
+            return self
+
+        t = np.log([r.wall_time for r in records])
+        X = self._design([r.N for r in records], [r.volume for r in records])
+        # Only fit the exponents that the data can identify.
+        identifiable = [0, *(i for i in (1, 2) if np.ptp(X[:, i]) > 0)]
+        self.coefficients = np.zeros(3)
+        self.coefficients[identifiable] = np.linalg.lstsq(
+            X[:, identifiable], t, rcond=None
+        )[0]
+        return self
+
+    def predict(self, N, volume) -> np.ndarray:
+        return np.exp(self._design(N, volume) @ self.coefficients)
+
+
+@dataclass
+class Telemetry:
+    """Append task records to a JSONL file and predict remaining time.
+
+    Records from previous runs in the same file are used for the cost model,
+    so a campaign can be sized before launching it.
+    """
+
+    path: Path
+    records: list[Record] = field(default_factory=list, init=False)
+    cost: CostModel = field(default_factory=CostModel, init=False)
+
+    def __post_init__(self):
+        self.path = Path(self.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            with self.path.open() as f:
+                for line in f:
+                    data = json.loads(line)
+                    data.pop("events_per_second", None)
+                    self.records.append(Record(**data))
+        self.cost.fit(self.records)
+
+    def log(self, record: Record):
+        self.records.append(record)
+        with self.path.open("a") as f:
+            f.write(record.to_json() + "\n")
+        if not record.skipped:
+            self.cost.fit(self.records)
+
+    def predict(self, tasks: Iterable[tuple[int, float]]) -> float:
+        """Predicted CPU seconds for (N, volume) tasks."""
+        tasks = list(tasks)
+        if len(tasks) == 0:
+            return 0
+        N, volume = np.transpose(tasks)
+        return float(self.cost.predict(N, volume).sum())
+
+    def eta(self, tasks: Iterable[tuple[int, float]], *, workers: int) -> float:
+        """Predicted wall seconds to run tasks with the given number of workers."""
+        return self.predict(tasks) / workers
+
+    def summary(self) -> dict[str, str]:
+        done = [r for r in self.records if not r.skipped]
+        if len(done) == 0:
+            return {}
+        out = {
+            "task": f"{np.median([r.wall_time for r in done]):.1f}s",
+            "build": f"{np.mean([r.build_time / r.wall_time for r in done]):.0%}",
+            "rss": f"{max(r.peak_rss for r in done) / 2**20:.0f}MiB",
+        }
+        rates = [r.events_per_second for r in done if r.events is not None]
+        if len(rates) > 0:
+            out["events/s"] = f"{np.median(rates):.3g}"
+        else:
+            out["events/s"] = "n/a without --count-firings"
+        return out
+
+
+def format_time(seconds: float) -> str:
+    if not math.isfinite(seconds):
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days > 0:
+        return f"{days}d{hours:02d}h"
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
@@ -0,0 +1,57 @@
+import numpy as np
+import xarray
+from pytest import mark
+
+from ..ensemble import Ensemble, _P2Quantile, resample
+
+
+@mark.parametrize("p", [0.05, 0.25, 0.5, 0.75, 0.95])
+def test_p2_quantile(p):
+    rng = np.random.default_rng(0)
+    scale = np.array([1, 2, 20])
+    x = rng.normal(loc=[0, 10, 100], scale=scale, size=(10_000, 3))
+    estimator = _P2Quantile(p)
+    for row in x:
+        estimator.add(row)
+    error = estimator.value - np.quantile(x, p, axis=0)
+    assert np.all(np.abs(error) < 0.02 * scale)
+
+
+def test_p2_quantile_few():
+    x = np.array([[3.0], [1.0], [2.0]])
+    estimator = _P2Quantile(0.5)
+    for row in x:
+        estimator.add(row)
+    assert estimator.value == np.quantile(x, 0.5, axis=0)
+
+
+def test_resample():
+    ds = xarray.Dataset({"A": ("time", [1, 2, 3])}, coords={"time": [0.0, 1.5, 4.0]})
+    out = resample(ds, [0, 1, 2, 3, 4, 5])
+    np.testing.assert_array_equal(out["A"], [1, 1, 2, 2, 3, 3])
+
+
+def test_ensemble():
+    rng = np.random.default_rng(0)
+    time = np.linspace(0, 10, 11)
+    dense = []
+    ensemble = Ensemble(time, quantiles=(0.5,))
+    for _ in range(2_000):
+        t = np.sort(np.r_[0, rng.uniform(0, 10, size=8)])
+        a = rng.poisson(10, size=t.size)
+        ds = xarray.Dataset({"A": ("time", a)}, coords={"time": t})
+        ensemble.add(ds)
+        dense.append(resample(ds, time)["A"].to_numpy())
+    dense = np.stack(dense)
+
+    summary = ensemble.to_dataset()
+    assert summary.attrs["seeds"] == len(dense)
+    np.testing.assert_allclose(summary["mean"].sel(variable="A"), dense.mean(0))
+    np.testing.assert_allclose(
+        summary["variance"].sel(variable="A"), dense.var(0, ddof=1)
+    )
+    np.testing.assert_allclose(
+        summary["quantiles"].sel(variable="A", quantile=0.5),
+        np.quantile(dense, 0.5, axis=0),
+        atol=1,
+    )
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import xarray
+
+from ..converter import COUNTER_PREFIX
+from ..firings import drop_counters, final_counts, firings
+
+
+def counter(*levels: str) -> str:
+    return COUNTER_PREFIX.join(["", *levels])
+
+
+def trajectory() -> xarray.Dataset:
+    time = np.array([0.0, 1.0, 3.0])
+    return xarray.Dataset(
+        {
+            "A": ("time", [10, 8, 5]),
+            counter("r", "", "forward"): ("time", [0, 2, 5]),
+            counter("s", "0", ""): ("time", [0, 1, 1]),
+            counter("s", "1", ""): ("time", [0, 0, 3]),
+        },
+        coords={"time": time},
+    )
+
+
+def test_final_counts():
+    ds = trajectory()
+    counts = {
+        counter("r", "", "forward"): 5,
+        counter("s", "0", ""): 1,
+        counter("s", "1", ""): 3,
+    }
+    assert final_counts(ds) == counts
+    assert final_counts(ds.to_dataframe()) == counts
+    assert final_counts(ds[["A"]]) == {}
+
+    assert list(drop_counters(ds)) == ["A"]
+    assert list(drop_counters(ds.to_dataframe()).columns) == ["A"]
+
+
+def test_firings():
+    ds = drop_counters(trajectory())
+    ds.attrs["firings"] = final_counts(trajectory())
+    expected = pd.Series(
+        [5, 1, 3],
+        index=pd.MultiIndex.from_tuples(
+            [("r", "", "forward"), ("s", "0", ""), ("s", "1", "")],
+            names=["reaction", "loop", "step"],
+        ),
+        name="firings",
+    )
+    pd.testing.assert_series_equal(firings(ds), expected)
@@ -0,0 +1,62 @@
+import json
+
+import numpy as np
+from pytest import raises
+
+from ..seeds import Campaign, as_int, to_seed
+
+
+def test_as_int():
+    assert as_int(3) == 3
+    assert as_int(np.int64(3)) == 3
+    assert as_int("0.100") != as_int("1.000")
+    with raises(ValueError):
+        as_int(-1)
+
+
+def test_streams():
+    campaign = Campaign(12345)
+    seeds = {
+        to_seed(campaign.stream(N, volume, replicate=replicate))
+        for N in (1, 10)
+        for volume in ("0.100", "1.000")
+        for replicate in range(10)
+    }
+    assert len(seeds) == 40
+
+    seq = campaign.stream(10, "1.000", replicate=3)
+    assert seq.spawn_key == (10, as_int("1.000"), 3)
+    assert to_seed(seq) == to_seed(Campaign(12345).stream(10, "1.000", replicate=3))
+    assert to_seed(seq) != to_seed(Campaign(54321).stream(10, "1.000", replicate=3))
+
+    # Sub-streams extend the spawn key, so they differ from other replicates.
+    children = seq.spawn(2)
+    assert [c.spawn_key for c in children] == [(*seq.spawn_key, 0), (*seq.spawn_key, 1)]
+    assert len({*map(to_seed, children), *seeds}) == 42
+
+
+def test_load(tmp_path):
+    path = tmp_path / "campaign.json"
+    campaign = Campaign.load(path)
+    assert json.loads(path.read_text()) == {"entropy": campaign.entropy}
+    assert Campaign.load(path) == campaign
+    assert Campaign.load(path, entropy=campaign.entropy) == campaign
+    with raises(ValueError):
+        Campaign.load(path, entropy=campaign.entropy + 1)
+
+    assert Campaign.load(tmp_path / "other.json", entropy=7) == Campaign(7)
+
+
+def test_check():
+    campaign = Campaign(12345)
+    seq = campaign.stream(10, "1.000", replicate=3)
+    metadata = campaign.metadata(seq)
+    campaign.check(metadata)
+    campaign.check(metadata, seq)
+
+    with raises(ValueError, match="no seed metadata"):
+        campaign.check({})
+    with raises(ValueError, match="different campaign"):
+        Campaign(54321).check(metadata)
+    with raises(ValueError, match="spawn key"):
+        campaign.check(metadata, campaign.stream(10, "1.000", replicate=4))
@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+from pytest import approx
+from scipy import stats
+
+from ..stopping import SequentialStopping
+
+
+def test_intervals():
+    rng = np.random.default_rng(0)
+    x = rng.exponential(size=50)
+    rule = SequentialStopping(width=1, quantiles=(0.5,))
+    for v in x:
+        rule.add(v)
+    intervals = rule.intervals()
+
+    expected = stats.t.interval(0.95, x.size - 1, loc=x.mean(), scale=stats.sem(x))
+    assert intervals["mean"] == approx(expected)
+    # Order statistics of the sample
+    low, high = intervals["q0.5"]
+    assert low in x and high in x
+    assert low < np.median(x) < high
+
+
+def test_coverage():
+    """Intervals contain the mean and quantiles of an exponential distribution
+    at about the confidence level."""
+    rng = np.random.default_rng(0)
+    quantiles = (0.25, 0.5, 0.9)
+    truth = {"mean": 1.0} | {f"q{q:g}": -math.log(1 - q) for q in quantiles}
+    covered = dict.fromkeys(truth, 0)
+    repeats = 1_000
+    for _ in range(repeats):
+        rule = SequentialStopping(width=1, quantiles=quantiles)
+        rule.samples = list(rng.exponential(size=100))
+        for k, (low, high) in rule.intervals().items():
+            covered[k] += low <= truth[k] <= high
+
+    for k, n in covered.items():
+        # Order-statistic intervals are conservative.
+        assert 0.92 <= n / repeats <= 0.99, k
+
+
+def test_too_few_samples():
+    rule = SequentialStopping(width=1, quantiles=(0.05,), min_samples=1)
+    for x in (1.0, 2.0, math.inf):
+        rule.add(x)
+    assert rule.intervals() == {
+        "mean": approx(stats.t.interval(0.95, 1, loc=1.5, scale=0.5)),
+        "q0.05": (-math.inf, math.inf),
+    }
+    assert not rule.converged
+
+
+def test_stopping():
+    rng = np.random.default_rng(0)
+    width = 0.5
+    rule = SequentialStopping(width=width, quantiles=(0.5,), max_samples=10_000)
+    while not rule.done:
+        rule.add(rng.normal())
+        if rule.count < rule.min_samples:
+            assert not rule.done
+
+    assert rule.converged and not rule.exhausted
+    assert all(w <= width for w in rule.precision().values())
+    # The median interval is the widest, about 2 * 1.96 * sqrt(pi / 2) / sqrt(n).
+    assert rule.count == approx((2 * 1.96 / width) ** 2 * math.pi / 2, rel=0.3)
+    # It did not converge one sample earlier.
+    rule.samples.pop()
+    assert not rule.converged
+
+    report = rule.report()
+    assert report["converged"] is False
+    assert report["samples"] == rule.count
+
+
+def test_budget():
+    rng = np.random.default_rng(0)
+    rule = SequentialStopping(width=0.01, max_samples=20)
+    while not rule.done:
+        rule.add(rng.normal())
+    assert rule.count == 20
+    assert rule.exhausted and not rule.converged
@@ -0,0 +1,68 @@
+import math
+
+import numpy as np
+from pytest import approx
+
+from ..telemetry import CostModel, Record, Telemetry, format_time
+
+
+def record(N: int, volume: float, wall_time: float, **kwargs) -> Record:
+    return Record(
+        N=N,
+        volume=volume,
+        seed=0,
+        build_time=0.1 * wall_time,
+        simulation_time=0.9 * wall_time,
+        wall_time=wall_time,
+        **kwargs,
+    )
+
+
+def test_events_per_second():
+    assert math.isnan(record(1, 1.0, 10).events_per_second)
+    assert record(1, 1.0, 10, events=900).events_per_second == 100
+
+
+def test_cost_model():
+    records = [
+        record(N, volume, 2 * N**1.5 * volume**-0.5)
+        for N in (1, 10, 100)
+        for volume in (0.1, 1.0)
+    ]
+    cost = CostModel().fit(records)
+    assert cost.coefficients == approx([math.log(2), 1.5, -0.5])
+    assert cost.predict(1000, 0.01) == approx(2 * 1000**1.5 * 0.01**-0.5)
+
+
+def test_cost_model_constant_volume():
+    records = [record(N, 1.0, 3 * N) for N in (1, 10)]
+    cost = CostModel().fit([*records, record(100, 1.0, 0, skipped=True)])
+    assert cost.coefficients == approx([math.log(3), 1, 0])
+    assert np.isnan(CostModel().predict(1, 1.0)).all()
+
+
+def test_telemetry(tmp_path):
+    path = tmp_path / "telemetry.jsonl"
+    telemetry = Telemetry(path)
+    assert telemetry.summary() == {}
+    for N in (1, 10):
+        telemetry.log(record(N, 1.0, 2 * N))
+    assert telemetry.summary()["events/s"] == "n/a without --count-firings"
+    assert telemetry.predict([(100, 1.0)] * 4) == approx(800)
+    assert telemetry.eta([(100, 1.0)] * 4, workers=4) == approx(200)
+
+    telemetry.log(record(10, 1.0, 20, events=1800))
+    assert telemetry.summary()["events/s"] == "100"
+
+    # Records are reloaded from the file.
+    reloaded = Telemetry(path)
+    assert [r.to_json() for r in reloaded.records] == [
+        r.to_json() for r in telemetry.records
+    ]
+    assert reloaded.predict([(100, 1.0)]) == approx(200)
+
+
+def test_format_time():
+    assert format_time(math.nan) == "?"
+    assert format_time(3_725) == "01:02:05"
+    assert format_time(2 * 86_400 + 3 * 3_600) == "2d03h"
@@ -1,7 +1,11 @@
 import xarray
+from numpy.random import SeedSequence
 from numpy.typing import ArrayLike
 from simbio import Constant, Parameter, Species
-from simbio_rebop.converter import create_rebop, to_rebop_loopy
+from simbio_rebop.converter import create_rebop, prune, to_rebop_loopy
+from simbio_rebop.ensemble import resample
+from simbio_rebop.firings import counters, drop_counters, final_counts
+from simbio_rebop.seeds import to_seed
 
 from mito import ARM
 
@@ -12,7 +16,13 @@ def create(
     L: float,
     Intrinsic: float,
     loop_values: dict[Species | Parameter | Constant, ArrayLike],
+    count_firings: bool = False,
+    outputs: list | None = None,
 ):
+    """Create a rebop runner for ARM.
+
+    If outputs are given, reactions that cannot affect them are removed.
+    """
     reactions, y = to_rebop_loopy(
         ARM,
         ARM.mitocondria,
@@ -22,20 +32,43 @@ def create(
             ARM.volume: volume,
         },
         values_loop=loop_values,
+        count_firings=count_firings,
     )
+    if outputs is not None:
+        reactions, y = prune(reactions, y, outputs)
     runner = create_rebop(reactions)
     return runner, y
 
 
 def run(
-    seed: int,
+    seed: int | SeedSequence,
     *,
     t_max: int,
     steps: int,
     create,
     save: list | None = [ARM.cytoplasm.C3_A, ARM.cytoplasm.C8_A, ARM.cytoplasm.Apop],
+    save_at: ArrayLike | None = None,
 ) -> xarray.Dataset:
+    """Run a single seed.
+
+    If save_at is given, the sparse trajectory is forward-filled onto it
+    inside the worker, so that results share a common time index.
+
+    If the model was created with count_firings, the counters are saved
+    and their final counts are moved to ds.attrs["firings"].
+
+    seed can be a SeedSequence, such as those from seeds.Campaign.stream.
+    """
+    if isinstance(seed, SeedSequence):
+        seed = to_seed(seed)
     runner, y = create()
     if save is not None:
-        save = list(map(str, save))
-    return runner.run(y, tmax=t_max, nb_steps=steps, seed=seed, save=save, sparse=True)
+        save = [*map(str, save), *counters(y)]
+    ds = runner.run(y, tmax=t_max, nb_steps=steps, seed=seed, save=save, sparse=True)
+    counts = final_counts(ds)
+    ds = drop_counters(ds)
+    if save_at is not None:
+        ds = resample(ds, save_at)
+    if counts:
+        ds.attrs["firings"] = counts
+    return ds
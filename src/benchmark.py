@@ -0,0 +1,186 @@
+"""Work-precision benchmark of ODE solvers on the ARM models.
+
+Each case is integrated until PARP cleavage with every method and tolerance,
+and compared with a tight-tolerance reference on the delay (t50).
+
+    python -m src.benchmark work_precision.csv
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import itertools
+import sys
+import time
+from dataclasses import dataclass
+from typing import Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+from poincare.simulator import Problem
+from scipy_events import solve_ivp
+from simbio import Simulator
+
+from . import albeck, corbat, mito
+from .metrics import Cleavage, state_index
+from .n_mito.loop_simulator import LoopSimulator
+
+METHODS = ("LSODA", "BDF", "Radau")
+TOLERANCES = tuple(
+    itertools.product((1e-3, 1e-4, 1e-5, 1e-6, 1e-7, 1e-8), (1e-6, 1e-2, 1))
+)
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    problem: Problem
+    cleavage: Cleavage
+
+
+def _case(name: str, sim, substrate, product, problem: Problem, t_end: float):
+    return Case(
+        name,
+        dataclasses.replace(problem, t=(0, t_end)),
+        Cleavage(state_index(sim, substrate), state_index(sim, product)),
+    )
+
+
+def cases(
+    *,
+    loops: Sequence[int] = (1, 10, 100),
+    t_end: float = 24 * 3600,
+) -> Iterator[Case]:
+    """ARM models with their default values, and LoopSimulator with the
+    ligand of mito.ARM and its mitochondrial volume split into N equal loops."""
+    sim = Simulator(mito.ARM)
+    yield _case(
+        "mito.ARM",
+        sim,
+        mito.ARM.cytoplasm.PARP_U,
+        mito.ARM.cytoplasm.PARP_C,
+        sim.create_problem(),
+        t_end,
+    )
+    sim = Simulator(corbat.ARM)
+    yield _case(
+        "corbat.ARM",
+        sim,
+        corbat.ARM.PARP_U,
+        corbat.ARM.PARP_C,
+        sim.create_problem(),
+        t_end,
+    )
+    for model in (
+        albeck.Albeck11b,
+        albeck.Albeck11c,
+        albeck.Albeck11d,
+        albeck.Albeck11e,
+        albeck.Albeck11f,
+    ):
+        sim = Simulator(model)
+        yield _case(
+            f"albeck.{model.__name__}",
+            sim,
+            model.intrinsic.PARP_U,
+            model.intrinsic.PARP_C,
+            sim.create_problem(),
+            t_end,
+        )
+
+    sim = LoopSimulator(
+        mito.ARM_Cito,
+        mito.Mitochondria(
+            CytoC_C=mito.ARM_Cito.CytoC_C,
+            Smac_C=mito.ARM_Cito.Smac_C,
+            Bax_A=mito.ARM_Cito.Bax_A,
+        ),
+    )
+    for N in loops:
+        volume = np.full(N, 0.07 / N)
+        yield _case(
+            f"LoopSimulator(N={N})",
+            sim,
+            mito.ARM_Cito.PARP_U,
+            mito.ARM_Cito.PARP_C,
+            sim.create_problem(
+                main_values={mito.ARM_Cito.L: 1000},
+                loop_values={mito.Mitochondria.volume: volume},
+            ),
+            t_end,
+        )
+
+
+def run(case: Case, method: str, *, rtol: float, atol: float) -> dict:
+    """Integrate a case until the last cleavage level.
+
+    Returns the wall time, the number of RHS and Jacobian evaluations and
+    of LU decompositions, and the cleavage metrics.
+    """
+    problem = case.problem
+    start = time.perf_counter()
+    # A fresh dy per call, as the finite-difference Jacobian keeps the outputs.
+    solution = solve_ivp(
+        lambda t, y: problem.rhs(t, y, problem.p, np.empty_like(y)),
+        problem.t,
+        problem.y,
+        method=method,
+        events=case.cleavage.events(problem.y),
+        rtol=rtol,
+        atol=atol,
+    )
+    elapsed = time.perf_counter() - start
+    t10, t50, t90 = (t[0] if t.size > 0 else np.nan for t in solution.t_events)
+    return {
+        "success": solution.status != -1,
+        "time": elapsed,
+        "nfev": int(solution.nfev),
+        "njev": int(solution.njev),
+        "nlu": int(solution.nlu),
+        "delay": float(t50),
+        "switch_width": float((t90 - t10) / (8 * np.log(9))),
+    }
+
+
+def work_precision(
+    cases: Sequence[Case],
+    *,
+    methods: Sequence[str] = METHODS,
+    tolerances: Sequence[tuple[float, float]] = TOLERANCES,
+    reference: tuple[str, float, float] = ("Radau", 1e-10, 1e-8),
+) -> pd.DataFrame:
+    """Cost and delay error of each case, method and (rtol, atol).
+
+    The error is relative to the delay of the reference (method, rtol, atol).
+    Radau converges at the loosest tolerances: at (1e-10, 1e-8), its delay
+    agrees with those of all methods at (1e-12, 1e-10) to 1e-10.
+    """
+    rows = []
+    for case in cases:
+        expected = run(case, reference[0], rtol=reference[1], atol=reference[2])
+        for method, (rtol, atol) in itertools.product(methods, tolerances):
+            result = run(case, method, rtol=rtol, atol=atol)
+            rows.append(
+                {
+                    "case": case.name,
+                    "method": method,
+                    "rtol": rtol,
+                    "atol": atol,
+                    **result,
+                    "error": abs(result["delay"] / expected["delay"] - 1),
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "work_precision.csv"
+    df = work_precision(list(cases()))
+    df.to_csv(path, index=False)
+    print(
+        df.pivot_table(
+            index=["case", "rtol", "atol"],
+            columns="method",
+            values=["time", "error"],
+        ).to_string()
+    )
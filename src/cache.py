@@ -0,0 +1,179 @@
+import dataclasses
+import hashlib
+import inspect
+import numbers
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from poincare.compile import build_first_order_vectorized_body
+from poincare.simulator import Simulator
+from scipy import sparse
+
+
+def structural_hash(sim) -> str:
+    """Hash of the generated RHS and the default values of a Simulator or
+    LoopSimulator, and of the exchange rates of a LoopSimulator, which is
+    stable across processes."""
+    h = hashlib.sha256()
+    if hasattr(sim, "main_sim"):
+        h.update(sim.build_func().encode())
+        _update(h, dict(sim.exchange))
+        sims = [sim.main_sim, *sim.loop_sims]
+    else:
+        h.update(build_first_order_vectorized_body(sim.model).func.encode())
+        h.update(repr(list(sim.transform.output)).encode())
+        sims = [sim]
+    for s in sims:
+        for k, v in s.compiled.mapper.items():
+            h.update(f"{k}={v};".encode())
+    return h.hexdigest()
+
+
+def _update(h, x):
+    match x:
+        case Mapping():
+            items = sorted((str(k), v) for k, v in x.items())
+            h.update(b"{")
+            for k, v in items:
+                h.update(k.encode())
+                _update(h, v)
+            h.update(b"}")
+        case pd.DataFrame():
+            _update(h, x.to_dict(orient="list"))
+        case np.ndarray() | pd.Series() | list() | tuple():
+            x = np.asarray(x)
+            if x.dtype == object:
+                h.update(b"(")
+                for v in x:
+                    _update(h, v)
+                h.update(b")")
+            else:
+                h.update(f"{x.dtype}{x.shape}".encode())
+                h.update(np.ascontiguousarray(x).tobytes())
+        case _ if sparse.issparse(x):
+            x = sparse.csr_array(x)
+            x.sum_duplicates()
+            h.update(f"csr{x.shape}".encode())
+            for a in (x.indptr, x.indices, x.data):
+                _update(h, a)
+        case _ if dataclasses.is_dataclass(x):
+            _update(h, {f.name: getattr(x, f.name) for f in dataclasses.fields(x)})
+        case numbers.Real():
+            h.update(repr(float(x)).encode())
+        case _:
+            h.update(repr(x).encode())
+
+
+def _without_stats(df):
+    """Copy without the Stats of an instrumented solve, which describe that solve."""
+    df = df.copy(deep=True)
+    df.attrs.pop("stats", None)
+    return df
+
+
+class Cached:
+    """Drop-in wrapper around Simulator.solve and LoopSimulator.solve
+    that memoizes solutions.
+
+    Solutions are keyed on the model structure, the values, save_at and
+    the solver settings. The most recently used `maxsize` solutions are kept
+    in memory and, if `path` is given, all of them are written there as
+    parquet files, or netCDF files for xarray outputs of LoopSimulator,
+    that are reused across sessions.
+    Solves with events are not cached. Results from the cache have no
+    attrs["stats"] of an instrumented LoopSimulator, as no solve was made.
+
+    >>> sim = Cached(Simulator(ARM), path=Path("results/cache"))
+    >>> df = sim.solve({ARM.L: 10}, save_at=t)  # solved
+    >>> df = sim.solve({ARM.L: 10}, save_at=t)  # from cache
+    """
+
+    def __init__(self, sim, /, *, maxsize: int = 128, path: Path | None = None):
+        self.sim = sim
+        self.maxsize = maxsize
+        self.path = None if path is None else Path(path)
+        self.memory: OrderedDict[str, pd.DataFrame] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._hash = structural_hash(sim)
+        self._signature = inspect.signature(sim.solve)
+
+    def __getattr__(self, name):
+        return getattr(self.sim, name)
+
+    def key(self, *args, **kwargs) -> str:
+        bound = self._signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        h = hashlib.sha256(self._hash.encode())
+        _update(h, bound.arguments)
+        return h.hexdigest()
+
+    def solve(self, *args, **kwargs) -> pd.DataFrame:
+        if len(kwargs.get("events", ())) > 0:
+            return self.sim.solve(*args, **kwargs)
+
+        key = self.key(*args, **kwargs)
+        df = self._get(key)
+        if df is None:
+            self.misses += 1
+            df = self.sim.solve(*args, **kwargs)
+            self._set(key, _without_stats(df))
+            return df
+        self.hits += 1
+        return df.copy(deep=True)
+
+    def interact(self, *args, **kwargs):
+        return Simulator.interact(self, *args, **kwargs)
+
+    def clear(self):
+        self.memory.clear()
+
+    def _get(self, key: str) -> pd.DataFrame | None:
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+
+        if self.path is None:
+            return None
+        p = self.path / f"{key}.parquet"
+        if p.exists():
+            df = pd.read_parquet(p)
+            df.columns = [self._columns.get(k, k) for k in df.columns]
+        elif (p := p.with_suffix(".nc")).exists():
+            import xarray
+
+            with xarray.open_dataset(p) as ds:
+                df = ds.load()
+        else:
+            return None
+        self._remember(key, df)
+        return df
+
+    def _set(self, key: str, df: pd.DataFrame):
+        self._remember(key, df)
+        if self.path is None:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        if isinstance(df, pd.DataFrame):
+            df.rename(columns=str).to_parquet(self.path / f"{key}.parquet")
+        else:
+            df.to_netcdf(self.path / f"{key}.nc")
+
+    def _remember(self, key: str, df: pd.DataFrame):
+        self.memory[key] = df
+        if len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+
+    @property
+    def _columns(self) -> dict[str, object]:
+        """Restore LoopSimulator columns, which are variables, from their names."""
+        if not hasattr(self.sim, "main_sim"):
+            return {}
+        variables = [
+            *self.sim.main_sim.compiled.variables,
+            *(v for loop in self.sim.compiled_loops for v in loop.variables),
+        ]
+        return {str(v): v for v in variables}
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Sequence
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from scipy.optimize import OptimizeResult, differential_evolution
+from simbio import Simulator
+
+from .literature_tests import albeck2008
+from .metrics import Cleavage, state_index
+from .sweep import Model
+
+# Albeck 2008 simulate 50 ng/ml TRAIL as 3000 ligands per cell.
+LIGANDS_PER_NG_ML = 3_000 / 50
+
+
+def targets(drug: str = "TRAIL") -> pd.DataFrame:
+    """Albeck 2008 Table 1, in seconds and ligands per cell, indexed by dose."""
+    out = {}
+    for name, df in [
+        ("delay", albeck2008.onset()),
+        ("switch_width", albeck2008.switch_width()),
+    ]:
+        df = df[df["drug"] == drug]
+        dose = df["treatment"].pint.to("ng / ml").pint.magnitude
+        for k in ("mean", "std"):
+            out[f"{name}_{k}"] = pd.Series(
+                df[f"time_{k}"].pint.to("s").pint.magnitude.to_numpy(),
+                index=pd.Index(dose.to_numpy(), name="dose"),
+            )
+    df = pd.DataFrame(out)
+    df.insert(0, "ligand", df.index * LIGANDS_PER_NG_ML)
+    return df
+
+
+@dataclass(frozen=True, kw_only=True)
+class Calibration:
+    """Fit parameters to the delay and switch width of Albeck 2008 Table 1.
+
+    Parameters are searched in log10(value / default) within bounds,
+    with differential evolution. Each generation is evaluated in a process
+    pool, where the simulator is built once per worker. Evaluated points are
+    memoized and appended to the checkpoint file, so that an interrupted fit
+    with the same seed replays them without solving and resumes where it
+    stopped.
+
+    >>> calibration = Calibration(
+    ...     simulator=functools.partial(Simulator, ARM, backend="numba"),
+    ...     parameters=[ARM.KF, ARM.cytoplasm.XIAP],
+    ...     ligand=ARM.L,
+    ...     substrate=ARM.cytoplasm.PARP_U,
+    ...     product=ARM.cytoplasm.PARP_C,
+    ...     checkpoint=Path("results/calibration.jsonl"),
+    ... )
+    >>> result = calibration.fit(seed=0)
+    >>> calibration.values(result.x)
+    """
+
+    simulator: Callable[[], Simulator]
+    parameters: Sequence
+    ligand: object
+    substrate: object
+    product: object
+    bounds: tuple[float, float] = (-1, 1)
+    t_end: float = 24 * 3600
+    data: pd.DataFrame = field(default_factory=targets)
+    checkpoint: Path | None = None
+    workers: int | None = None
+
+    def fit(self, *, seed: int, **kwargs) -> OptimizeResult:
+        """Minimize the cost with scipy.optimize.differential_evolution."""
+        objective = _Objective.from_calibration(self)
+        memo = Memo(self.checkpoint)
+        workers = self.workers if self.workers is not None else os.cpu_count()
+
+        _initialize(objective)
+        if workers == 1:
+            return differential_evolution(
+                _cost,
+                [self.bounds] * len(self.parameters),
+                seed=seed,
+                updating="deferred",
+                workers=memo.wrap(map),
+                **kwargs,
+            )
+
+        with ProcessPoolExecutor(
+            workers,
+            initializer=_initialize,
+            initargs=(objective,),
+        ) as executor:
+            return differential_evolution(
+                _cost,
+                [self.bounds] * len(self.parameters),
+                seed=seed,
+                updating="deferred",
+                workers=memo.wrap(executor.map),
+                **kwargs,
+            )
+
+    def values(self, x: NDArray) -> dict[str, float]:
+        """Parameter values from log10 factors."""
+        return _Objective.from_calibration(self).values(x)
+
+    def compare(self, x: NDArray) -> pd.DataFrame:
+        """Simulated and experimental metrics for each dose."""
+        objective = _Objective.from_calibration(self)
+        simulated = pd.DataFrame(
+            list(map(objective.metrics, objective.points(x))),
+            index=self.data.index,
+        )
+        return self.data.join(simulated)
+
+
+@dataclass
+class Memo:
+    """Cache of evaluated points, optionally persisted to a JSONL file."""
+
+    path: Path | None = None
+    cache: dict[tuple[float, ...], float] = field(default_factory=dict, init=False)
+
+    def __post_init__(self):
+        if self.path is None:
+            return
+        self.path = Path(self.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            with self.path.open() as f:
+                for line in f:
+                    data = json.loads(line)
+                    self.cache[tuple(data["x"])] = data["cost"]
+
+    def store(self, x: tuple[float, ...], cost: float):
+        self.cache[x] = cost
+        if self.path is not None:
+            with self.path.open("a") as f:
+                f.write(json.dumps({"x": x, "cost": cost}) + "\n")
+
+    def wrap(self, mapper: Callable) -> Callable:
+        """Wrap a map-like callable to only evaluate points not in the cache."""
+
+        def memoized_map(func, iterable):
+            xs = [tuple(float(v) for v in x) for x in iterable]
+            missing = list(dict.fromkeys(x for x in xs if x not in self.cache))
+            for x, cost in zip(missing, mapper(func, missing)):
+                self.store(x, float(cost))
+            return [self.cache[x] for x in xs]
+
+        return memoized_map
+
+
+@dataclass(frozen=True)
+class _Objective:
+    simulator: Callable[[], Simulator]
+    parameters: list[str]
+    defaults: NDArray
+    ligand: str
+    cleavage: Cleavage
+    t_end: float
+    data: pd.DataFrame
+
+    @classmethod
+    def from_calibration(cls, calibration: Calibration):
+        sim = calibration.simulator()
+        model = Model(sim)
+        parameters = [model.name(k) for k in calibration.parameters]
+        defaults = model.defaults(parameters)
+        return cls(
+            simulator=calibration.simulator,
+            parameters=parameters,
+            defaults=np.array([defaults[k] for k in parameters]),
+            ligand=model.name(calibration.ligand),
+            cleavage=Cleavage(
+                state_index(sim, calibration.substrate),
+                state_index(sim, calibration.product),
+            ),
+            t_end=calibration.t_end,
+            data=calibration.data,
+        )
+
+    def values(self, x: NDArray) -> dict[str, float]:
+        factors = 10 ** np.asarray(x)
+        return {k: float(v) for k, v in zip(self.parameters, self.defaults * factors)}
+
+    def points(self, x: NDArray) -> list[dict[str, float]]:
+        values = self.values(x)
+        return [{**values, self.ligand: L} for L in self.data["ligand"]]
+
+    @property
+    def model(self) -> Model:
+        if self.simulator not in _models:
+            _models[self.simulator] = Model(self.simulator())
+        return _models[self.simulator]
+
+    def metrics(self, values: dict[str, float]) -> dict[str, float]:
+        return self.cleavage(self.model.create_problem(values, t_end=self.t_end))
+
+    def cost(self, x: NDArray) -> float:
+        """Sum of squared standardized residuals.
+
+        Metrics that are NaN, because c = 0.1, 0.5 or 0.9 is not crossed
+        before t_end, count as t_end. For the delay, this is a lower bound.
+        For the switch width, which is then NaN even if the delay is finite,
+        it is a fixed penalty of order t_end, much larger than the data,
+        so that incomplete switches are always worse than complete ones.
+        """
+        out = 0.0
+        for values, (_, row) in zip(self.points(x), self.data.iterrows()):
+            metrics = self.metrics(values)
+            for k in ("delay", "switch_width"):
+                value = metrics[k] if np.isfinite(metrics[k]) else self.t_end
+                out += ((value - row[f"{k}_mean"]) / row[f"{k}_std"]) ** 2
+        return out
+
+
+_models: dict[Callable, Model] = {}
+_objective: _Objective | None = None
+
+
+def _initialize(objective: _Objective):
+    global _objective
+    _objective = objective
+
+
+def _cost(x: NDArray) -> float:
+    assert _objective is not None
+    return _objective.cost(x)
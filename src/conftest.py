@@ -0,0 +1,28 @@
+import numba
+import pytest
+
+from .mito import ARM_Cito, Mitochondria
+from .n_mito.loop_simulator import LoopSimulator
+
+
+@pytest.fixture(scope="session")
+def arm_loop() -> LoopSimulator:
+    """ARM_Cito with Mitochondria loops, built and compiled once."""
+    return LoopSimulator(
+        ARM_Cito,
+        Mitochondria(
+            CytoC_C=ARM_Cito.CytoC_C,
+            Smac_C=ARM_Cito.Smac_C,
+            Bax_A=ARM_Cito.Bax_A,
+        ),
+    )
+
+
+@pytest.fixture
+def workqueue(monkeypatch):
+    """Run numba parallel code on the workqueue threading layer.
+
+    Later tests fork process pools, which hangs at exit after parallel
+    code ran on TBB (see LoopSimulator.parallel).
+    """
+    monkeypatch.setattr(numba.config, "THREADING_LAYER", "workqueue")
@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import dataclasses
+from dataclasses import dataclass
+from functools import cached_property
+
+import numba
+import numpy as np
+from numpy.typing import NDArray
+from poincare.simulator import Problem
+from scipy import sparse
+from scipy.linalg import null_space, qr
+
+from .network import Network
+
+
+def conservation_laws(stoichiometry: NDArray | sparse.sparray) -> NDArray:
+    """Orthonormal basis (rows) of the left null space of the stoichiometry.
+
+    It is computed densely, so it is meant for the network of a single loop.
+    """
+    if sparse.issparse(stoichiometry):
+        stoichiometry = stoichiometry.toarray()
+    return null_space(stoichiometry.T).T
+
+
+def _dependent(laws: NDArray, scale: NDArray) -> NDArray:
+    """Species eliminated by each law, chosen by column-pivoted QR,
+    which prefers the most abundant species of each moiety."""
+    if len(laws) == 0:
+        return np.zeros(0, dtype=int)
+    _, _, pivots = qr(laws * scale, mode="economic", pivoting=True)
+    return np.sort(pivots[: len(laws)])
+
+
+def _round(laws: NDArray) -> NDArray:
+    integer = np.isclose(laws, np.round(laws), rtol=0, atol=1e-9)
+    laws[integer] = np.round(laws[integer])
+    return laws
+
+
+@dataclass(frozen=True)
+class Conservation:
+    """Conservation laws in the layout of a LoopSimulator state,
+    M main species followed by N loops of L species each.
+
+    Laws are either global, coupling main species with the sum over loops,
+    or local to each loop. Each eliminates a dependent species, main or loop
+    respectively, which is computed from the totals and independent species.
+    For a Simulator, L = 0 and all laws are global.
+    """
+
+    M: int
+    L: int
+    main: NDArray
+    "Global laws, (kg, M + L), identity on main_dependent, zero on loop_dependent."
+    main_dependent: NDArray
+    loop: NDArray
+    "Local laws, (kl, L), with identity on loop_dependent."
+    loop_dependent: NDArray
+
+    @classmethod
+    def from_network(cls, network: Network, M: int, scale: NDArray) -> Conservation:
+        """From the network of a single loop (or of a Simulator, with M species)."""
+        laws = conservation_laws(network.stoichiometry)
+        L = len(network.species) - M
+        # Split into laws without main species, and their complement.
+        local = null_space(laws[:, :M].T).T
+        global_ = null_space(local).T
+        local, global_ = (local @ laws)[:, M:], global_ @ laws
+
+        loop_dependent = _dependent(local, scale[M:])
+        loop = _round(np.linalg.solve(local[:, loop_dependent], local))
+        main_dependent = _dependent(global_[:, :M], scale[:M])
+        main = np.linalg.solve(global_[:, main_dependent], global_)
+        main[:, M:] -= main[:, M + loop_dependent] @ loop
+        return cls(M, L, _round(main), main_dependent, loop, loop_dependent)
+
+    @cached_property
+    def main_independent(self) -> NDArray:
+        return np.setdiff1d(np.arange(self.M), self.main_dependent)
+
+    @cached_property
+    def loop_independent(self) -> NDArray:
+        return np.setdiff1d(np.arange(self.L), self.loop_dependent)
+
+    def loops(self, size: int) -> int:
+        """Number of loops of a full state of the given size."""
+        return (size - self.M) // self.L if self.L > 0 else 0
+
+    def reduced_loops(self, size: int) -> int:
+        """Number of loops of a reduced state of the given size."""
+        Li = self.loop_independent.size
+        return (size - self.main_independent.size) // Li if Li > 0 else 0
+
+    def independent(self, size: int) -> NDArray:
+        """Indices of the independent species in a full state of the given size."""
+        return np.concatenate(
+            [
+                self.main_independent,
+                *(
+                    self.M + n * self.L + self.loop_independent
+                    for n in range(self.loops(size))
+                ),
+            ]
+        )
+
+    def totals(self, y: NDArray) -> NDArray:
+        """Global totals followed by the local totals of each loop."""
+        loops = y[self.M :].reshape(-1, self.L) if self.L > 0 else np.zeros((0, 0))
+        main = self.main @ np.concatenate([y[: self.M], loops.sum(0)])
+        return np.concatenate([main, *(self.loop @ x for x in loops)])
+
+    def reduce(self, y: NDArray) -> NDArray:
+        return y[self.independent(len(y))]
+
+    def reconstruct(self, x: NDArray, totals: NDArray) -> NDArray:
+        """Full state from the reduced state x, of shape (n,) or (n, T)."""
+        N = self.reduced_loops(len(x))
+        Mi, Li = self.main_independent.size, self.loop_independent.size
+        kg, kl = len(self.main), len(self.loop)
+
+        y = np.empty((self.M + N * self.L, *x.shape[1:]))
+        y[self.main_independent] = x[:Mi]
+        loop_sum = np.zeros((self.L, *x.shape[1:]))
+        for n in range(N):
+            block = y[self.M + n * self.L : self.M + (n + 1) * self.L]
+            block[self.loop_independent] = x[Mi + n * Li : Mi + (n + 1) * Li]
+            t = totals[kg + n * kl : kg + (n + 1) * kl]
+            block[self.loop_dependent] = (
+                t.reshape(kl, *[1] * (x.ndim - 1))
+                - self.loop[:, self.loop_independent] @ block[self.loop_independent]
+            )
+            loop_sum += block
+        y[self.main_dependent] = (
+            totals[:kg].reshape(kg, *[1] * (x.ndim - 1))
+            - self.main[:, self.main_independent] @ y[self.main_independent]
+            - self.main[:, self.M :] @ loop_sum
+        )
+        return y
+
+    def jacobian(self, size: int) -> sparse.csr_array:
+        """Derivative of reconstruct, (full, reduced), for a reduced state
+        of the given size."""
+        N = self.reduced_loops(size)
+        Mi, Li = self.main_independent.size, self.loop_independent.size
+        block = np.zeros((self.L, Li))
+        block[self.loop_independent] = np.eye(Li)
+        block[self.loop_dependent] = -self.loop[:, self.loop_independent]
+
+        main = np.zeros((self.M, size))
+        main[self.main_independent, :Mi] = np.eye(Mi)
+        main[self.main_dependent, :Mi] = -self.main[:, self.main_independent]
+        main[self.main_dependent, Mi:] = np.tile(-self.main[:, self.M :] @ block, N)
+        if N == 0:
+            return sparse.csr_array(main)
+        loops = sparse.hstack(
+            [
+                sparse.csr_array((N * self.L, Mi)),
+                sparse.kron(sparse.eye_array(N), block),
+            ]
+        )
+        return sparse.vstack([sparse.csr_array(main), loops], format="csr")
+
+    def rhs(self, rhs):
+        """RHS of the reduced state, for problems with p = [p, totals].
+
+        It is compiled with numba if rhs is.
+        """
+        M, L = self.M, self.L
+        Mi, Li = self.main_independent.size, self.loop_independent.size
+        kg, kl = len(self.main), len(self.loop)
+        main_independent = self.main_independent
+        main_dependent = self.main_dependent
+        loop_independent = self.loop_independent
+        loop_dependent = self.loop_dependent
+        C_main = np.ascontiguousarray(self.main[:, main_independent])
+        C_loop_sum = np.ascontiguousarray(self.main[:, M:])
+        C_loop = np.ascontiguousarray(self.loop[:, loop_independent])
+
+        @numba.njit
+        def fill(x, p, y, N, P):
+            for i in range(Mi):
+                y[main_independent[i]] = x[i]
+            loop_sum = np.zeros(L)
+            for n in range(N):
+                y_start, x_start, p_start = M + n * L, Mi + n * Li, P + kg + n * kl
+                for i in range(Li):
+                    y[y_start + loop_independent[i]] = x[x_start + i]
+                for r in range(kl):
+                    value = p[p_start + r]
+                    for i in range(Li):
+                        value -= C_loop[r, i] * x[x_start + i]
+                    y[y_start + loop_dependent[r]] = value
+                for i in range(L):
+                    loop_sum[i] += y[y_start + i]
+            for r in range(kg):
+                value = p[P + r]
+                for i in range(Mi):
+                    value -= C_main[r, i] * x[i]
+                for i in range(L):
+                    value -= C_loop_sum[r, i] * loop_sum[i]
+                y[main_dependent[r]] = value
+
+        @numba.njit
+        def take(dy, dx, N):
+            for i in range(Mi):
+                dx[i] = dy[main_independent[i]]
+            for n in range(N):
+                for i in range(Li):
+                    dx[Mi + n * Li + i] = dy[M + n * L + loop_independent[i]]
+
+        def reduced(t, x, p, dx):
+            N = (x.size - Mi) // Li if Li > 0 else 0
+            P = p.size - kg - N * kl
+            y = np.empty(M + N * L)
+            fill(x, p, y, N, P)
+            dy = rhs(t, y, p[:P], np.empty_like(y))
+            take(dy, dx, N)
+            return dx
+
+        if isinstance(rhs, numba.core.dispatcher.Dispatcher):
+            return numba.njit(reduced)
+        return reduced
+
+
+class Reduced:
+    """Simulator or LoopSimulator that integrates only independent species.
+
+    Conserved totals are detected from the left null space of the
+    stoichiometry, and dependent species are reconstructed on output.
+    Dependent species are the most abundant ones in the first problem.
+
+    By default, only laws local to each loop are eliminated. Global laws
+    can make it slower: a dependent species that is depleted (e.g. Smac_A,
+    computed from Smac in all mitochondria) is reconstructed with an error
+    relative to its total, which LSODA pays with more Jacobian updates.
+    For a Simulator, all laws are global.
+
+    For a LoopSimulator, loop outputs, observables and the Jacobian
+    sparsity are computed from the full state, rebuilt from the
+    independent species and the totals. Further loop compartments
+    (LoopSimulator.loops) are not supported.
+
+    >>> sim = Reduced(LoopSimulator(ARM_Cito, Mitochondria(...)))
+    >>> df = sim.solve(loop_values={Mitochondria.Bcl2: bcl2}, save_at=t)
+    """
+
+    def __init__(self, sim, /, *, global_laws: bool = False):
+        self.sim = sim
+        self.global_laws = global_laws
+        self.conservation: Conservation | None = None
+        self._rhs = None
+
+    def __getattr__(self, name):
+        return getattr(self.sim, name)
+
+    def _conservation(self, y0: NDArray) -> Conservation:
+        if hasattr(self.sim, "main_sim"):
+            if len(self.sim.loops) > 0:
+                raise ValueError("Reduced supports a single loop compartment")
+            M = len(self.sim.main_sim.compiled.variables)
+            L = len(self.sim.compiled_loop.variables)
+            network = Network.from_loop_simulator(self.sim, 1)
+            scale = np.ones(M + L)
+            scale[: min(y0.size, M + L)] += np.abs(y0[: M + L])
+        else:
+            network = Network.from_simulator(self.sim)
+            M, scale = len(network.species), 1 + np.abs(y0)
+        conservation = Conservation.from_network(network, M, scale)
+        if self.global_laws:
+            return conservation
+        return dataclasses.replace(
+            conservation,
+            main=conservation.main[:0],
+            main_dependent=conservation.main_dependent[:0],
+        )
+
+    def create_problem(self, *args, **kwargs) -> Problem:
+        problem = self.sim.create_problem(*args, **kwargs)
+        if self.conservation is None:
+            self.conservation = self._conservation(problem.y)
+            self._rhs = self.conservation.rhs(problem.rhs)
+
+        conservation = self.conservation
+        totals = conservation.totals(problem.y)
+        transform = problem.transform
+
+        def reconstruct(t, x, p, out):
+            y = conservation.reconstruct(x, p[p.size - totals.size :])
+            return transform(t, y, p[: p.size - totals.size], out)
+
+        return Problem(
+            rhs=self._rhs,
+            t=problem.t,
+            y=conservation.reduce(problem.y),
+            p=np.concatenate([problem.p, totals]),
+            transform=reconstruct,
+            scale=problem.scale,
+        )
+
+    def _full(self, x: NDArray, p: NDArray) -> tuple[NDArray, NDArray]:
+        """Full state and parameters from those of a reduced problem."""
+        conservation = self.conservation
+        k = len(conservation.main) + conservation.reduced_loops(x.size) * len(
+            conservation.loop
+        )
+        return conservation.reconstruct(x, p[p.size - k :]), p[: p.size - k]
+
+    def loop_counts(self, x: NDArray, p: NDArray) -> list[int]:
+        return self.sim.loop_counts(*self._full(x, p))
+
+    def projection(self, observables, x: NDArray, p: NDArray) -> sparse.csr_array:
+        """Projection of the full state (see LoopSimulator.projection)."""
+        return self.sim.projection(observables, *self._full(x, p))
+
+    def jacobian_sparsity(self, x: NDArray, p: NDArray) -> sparse.csr_array:
+        """Structural non-zeros of the Jacobian of the reduced RHS."""
+        y, p = self._full(x, p)
+        sparsity = self.sim.jacobian_sparsity(y, p).astype(float)
+        dy_dx = abs(self.conservation.jacobian(x.size))
+        independent = self.conservation.independent(y.size)
+        return sparse.csr_array((sparsity[independent] @ dy_dx) != 0)
+
+    def solve(self, *args, **kwargs):
+        return type(self.sim).solve(self, *args, **kwargs)
+
+    def _loop_output(self, *args):
+        return type(self.sim)._loop_output(self, *args)
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import functools
+from dataclasses import dataclass, field
+from typing import Mapping
+
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike, NDArray
+from scipy.linalg import cho_factor, cho_solve, solve_triangular
+from scipy.optimize import minimize
+from scipy.stats import qmc
+
+from . import metrics
+from .sweep import Evaluator, Sweep
+
+
+@dataclass
+class GaussianProcess:
+    """Gaussian process regression with an anisotropic squared exponential kernel.
+
+    Inputs are expected in the unit hypercube. Length scales and noise are
+    fitted by maximizing the marginal likelihood.
+    """
+
+    length_scale: NDArray = field(init=False)
+    noise: float = field(init=False)
+
+    def _kernel(self, X1: NDArray, X2: NDArray) -> NDArray:
+        d = (X1[:, None, :] - X2[None, :, :]) / self.length_scale
+        return np.exp(-0.5 * np.sum(d**2, axis=-1))
+
+    def _factor(self, X: NDArray):
+        K = self._kernel(X, X)
+        K[np.diag_indices_from(K)] += self.noise
+        return cho_factor(K, lower=True)
+
+    def _negative_log_likelihood(self, theta: NDArray, X: NDArray, y: NDArray):
+        self.length_scale, self.noise = np.exp(theta[:-1]), np.exp(theta[-1])
+        try:
+            L = self._factor(X)
+        except np.linalg.LinAlgError:
+            return np.inf
+        alpha = cho_solve(L, y)
+        return 0.5 * y @ alpha + np.log(np.diag(L[0])).sum()
+
+    def fit(self, X: ArrayLike, y: ArrayLike):
+        X, y = np.asarray(X, dtype=float), np.asarray(y, dtype=float)
+        self.y_mean, self.y_std = y.mean(), y.std() if y.std() > 0 else 1.0
+        y = (y - self.y_mean) / self.y_std
+
+        d = X.shape[1]
+        bounds = [(np.log(1e-2), np.log(1e2))] * d + [(np.log(1e-10), np.log(1e-1))]
+        theta = np.array([np.log(0.3)] * d + [np.log(1e-6)])
+        result = minimize(
+            self._negative_log_likelihood,
+            theta,
+            args=(X, y),
+            method="L-BFGS-B",
+            bounds=bounds,
+        )
+        self.length_scale, self.noise = np.exp(result.x[:-1]), np.exp(result.x[-1])
+        self.X = X
+        self.L = self._factor(X)
+        self.alpha = cho_solve(self.L, y)
+        return self
+
+    def predict(self, X: ArrayLike) -> tuple[NDArray, NDArray]:
+        """Mean and standard deviation at X."""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        k = self._kernel(X, self.X)
+        mean = k @ self.alpha
+        v = solve_triangular(self.L[0], k.T, lower=True)
+        variance = np.clip(1 - np.sum(v**2, axis=0), 0, None)
+        return self.y_mean + self.y_std * mean, self.y_std * np.sqrt(variance)
+
+
+@dataclass(kw_only=True)
+class Emulator:
+    """Surrogate of sweep outputs over a box of parameter values.
+
+    Each output (observable, metric) is emulated by a Gaussian process in
+    log10 of the parameter values, trained on a Sobol design. Queries outside
+    the domain, or setting other parameters, are solved with the sweep instead,
+    with zero uncertainty, by a simulator built on the first such query.
+
+    >>> emulator = Emulator.train(
+    ...     Sweep(
+    ...         simulator=functools.partial(Simulator, ARM, backend="numba"),
+    ...         save_at=np.linspace(0, 15 * 3600, 1_000),
+    ...         observables=[ARM.cytoplasm.C3_A],
+    ...         metrics={"onset": metrics.onset},
+    ...     ),
+    ...     domain={ARM.mitocondria.pore_transport_rate: (1e-2, 1e3)},
+    ...     n=64,
+    ... )
+    >>> mean, std = emulator.predict({"mitocondria.pore_transport_rate": 3})
+    """
+
+    sweep: Sweep
+    domain: dict[str, tuple[float, float]]
+    processes: dict[tuple[str, str], GaussianProcess]
+
+    @classmethod
+    def train(cls, sweep: Sweep, domain: Mapping, *, n: int = 128, seed: int = 0):
+        model = sweep.model()
+        domain = {model.name(k): v for k, v in domain.items()}
+        low, high = np.log10(np.transpose(list(domain.values())))
+        unit = qmc.Sobol(len(domain), scramble=True, seed=seed).random(n)
+        points = pd.DataFrame(10 ** qmc.scale(unit, low, high), columns=list(domain))
+
+        outputs = _outputs(sweep.run(points), len(points))
+        processes = {}
+        for key, y in outputs.items():
+            finite = np.isfinite(y.to_numpy())
+            processes[key] = GaussianProcess().fit(unit[finite], y[finite])
+        return cls(sweep=sweep, domain=domain, processes=processes)
+
+    def contains(self, values: Mapping[str, float]) -> bool:
+        if values.keys() != self.domain.keys():
+            return False
+        return all(low <= values[k] <= high for k, (low, high) in self.domain.items())
+
+    @functools.cached_property
+    def _evaluator(self) -> Evaluator:
+        return Evaluator(self.sweep)
+
+    def _unit(self, values: Mapping[str, float]) -> NDArray:
+        low, high = np.log10(np.transpose(list(self.domain.values())))
+        x = np.log10([values[k] for k in self.domain])
+        return (x - low) / (high - low)
+
+    def predict(self, values: Mapping[str, float]) -> tuple[pd.Series, pd.Series]:
+        """Mean and standard deviation of each output.
+
+        Falls back to solving if values are outside the domain.
+        """
+        if not self.contains(values):
+            evaluate = self._evaluator
+            y = pd.Series(evaluate(values), index=evaluate.outputs)
+            return y, pd.Series(0.0, index=y.index)
+
+        x = self._unit(values)
+        mean, std = {}, {}
+        for key, gp in self.processes.items():
+            (mean[key],), (std[key],) = gp.predict(x)
+        index = pd.MultiIndex.from_tuples(mean, names=["observable", "metric"])
+        return (
+            pd.Series(list(mean.values()), index=index),
+            pd.Series(list(std.values()), index=index),
+        )
+
+    def curves(self, values: Mapping[str, float]) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Mean and standard deviation of observables trained with `at` metrics."""
+        mean, std = self.predict(values)
+        mean, std = (
+            x[x.index.get_level_values("metric").str.startswith("t=")]
+            .unstack("observable")
+            .rename(index=lambda k: float(k.removeprefix("t=")))
+            for x in (mean, std)
+        )
+        return (
+            mean.sort_index().rename_axis("time"),
+            std.sort_index().rename_axis("time"),
+        )
+
+
+def at(times: ArrayLike) -> dict[str, functools.partial]:
+    """Metrics with the value of an observable at each time, to emulate curves.
+
+    >>> Sweep(..., metrics=at(np.linspace(0, 15 * 3600, 50)))
+    """
+    return {f"t={float(t)}": functools.partial(metrics.value_at, time=t) for t in times}
+
+
+def _outputs(df: pd.DataFrame, n: int) -> pd.DataFrame:
+    point = np.repeat(np.arange(n), len(df) // n)
+    return df.assign(point=point).pivot(
+        index="point",
+        columns=["observable", "metric"],
+        values="value",
+    )
@@ -8,14 +8,14 @@
 import pint_pandas
 
 
-def test_onset():
+def onset() -> pd.DataFrame:
     """Delay until apoptosis onset.
 
     Defined as the half-maximum of cleavage.
 
     Table 1.
     """
-    data = pd.DataFrame(
+    return pd.DataFrame(
         {
             "drug": ["TRAIL", "TRAIL", "TRAIL", "TRAIL", "TRAIL", "TNF"],
             "treatment": pd.Series([1000, 250, 50, 10, 2, 100], dtype="pint[ng / ml]"),
@@ -25,7 +25,7 @@ def test_onset():
     )
 
 
-def test_switch_width():
+def switch_width() -> pd.DataFrame:
     """Width of the cleavage curve.
 
     Defined as:
@@ -34,7 +34,7 @@ def test_switch_width():
 
     Table 1.
     """
-    data = pd.DataFrame(
+    return pd.DataFrame(
         {
             "drug": ["TRAIL", "TRAIL", "TRAIL", "TRAIL", "TRAIL", "TNF"],
             "treatment": pd.Series([1000, 250, 50, 10, 2, 100], dtype="pint[ng / ml]"),
@@ -0,0 +1,274 @@
+"""Transformations of the source of the ODE steps generated by LoopSimulator."""
+
+import ast
+from collections import Counter
+
+
+class _Simplify(ast.NodeTransformer):
+    """Remove the trivial operations emitted for mass-action terms:
+    x ** 1, 1.0 * x, -1.0 * x, x + 0 and a + -b."""
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        left, right = node.left, node.right
+        match node.op:
+            case ast.Pow() if _is_constant(right, 1):
+                return left
+            case ast.Mult() if _is_constant(left, 1):
+                return right
+            case ast.Mult() if _is_constant(left, -1):
+                return ast.UnaryOp(ast.USub(), right)
+            case ast.Add() if _is_constant(right, 0):
+                return left
+            case ast.Add() if isinstance(right, ast.UnaryOp) and isinstance(
+                right.op, ast.USub
+            ):
+                return ast.BinOp(left, ast.Sub(), right.operand)
+        return node
+
+
+def _is_constant(node: ast.AST, value: float) -> bool:
+    """Whether node is the literal value, where negative literals parse as
+    -(literal)."""
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return _is_constant(node.operand, -value)
+    return (
+        isinstance(node, ast.Constant)
+        and isinstance(node.value, int | float)
+        and node.value == value
+    )
+
+
+def _is_candidate(node: ast.AST) -> bool:
+    """Operations and reads of y and p, but not writes to ydot or constants."""
+    match node:
+        case ast.UnaryOp(operand=ast.Constant()):
+            return False
+        case ast.BinOp() | ast.UnaryOp():
+            return True
+        case ast.Subscript(value=ast.Name(id="y" | "p"), ctx=ast.Load()):
+            return True
+    return False
+
+
+def _expressions(stmt: ast.stmt) -> list[ast.expr]:
+    match stmt:
+        case ast.Assign(value=value) | ast.AugAssign(value=value):
+            return [value]
+    return []
+
+
+class _ValueNumbering:
+    """Number expressions so that equal ones, structurally, get the same number.
+
+    Names are numbered with the count of previous assignments to them,
+    so that expressions are not shared across a rebinding.
+    """
+
+    def __init__(self):
+        self.table: dict[tuple, int] = {}
+        self.numbers: dict[int, int] = {}
+        self.versions: Counter[str] = Counter()
+
+    def __call__(self, node: ast.AST) -> int:
+        match node:
+            case ast.Name(id=name):
+                key = ("Name", name, self.versions[name])
+            case ast.Constant(value=value):
+                key = ("Constant", repr(value))
+            case _:
+                key = (type(node).__name__, *map(self._field, _fields(node)))
+        number = self.table.setdefault(key, len(self.table))
+        self.numbers[id(node)] = number
+        return number
+
+    def _field(self, value):
+        if isinstance(value, list):
+            return tuple(map(self._field, value))
+        if isinstance(value, ast.expr_context | ast.operator | ast.unaryop):
+            return type(value).__name__
+        if isinstance(value, ast.AST):
+            return self(value)
+        return value
+
+    def assign(self, stmt: ast.stmt):
+        for node in ast.walk(stmt):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                self.versions[node.id] += 1
+
+
+def _fields(node: ast.AST) -> list:
+    return [value for _, value in ast.iter_fields(node)]
+
+
+def _eliminate(body: list[ast.stmt], prefix: str) -> list[ast.stmt]:
+    """Common-subexpression elimination within a block of assignments.
+
+    Expressions are hash-consed by value numbering, in a single pass.
+    Candidates referenced more than once, counting the operands of a
+    repeated expression once, are assigned to a temporary before the first
+    statement that uses them, operands first.
+    """
+    number = _ValueNumbering()
+    for stmt in body:
+        for value in _expressions(stmt):
+            number(value)
+        number.assign(stmt)
+
+    references: Counter[int] = Counter()
+    stack = [value for stmt in reversed(body) for value in _expressions(stmt)]
+    while stack:
+        node = stack.pop()
+        if _is_candidate(node):
+            n = number.numbers[id(node)]
+            references[n] += 1
+            if references[n] > 1:
+                continue
+        stack.extend(reversed(list(ast.iter_child_nodes(node))))
+
+    names: dict[int, str] = {}
+
+    def rewrite(node: ast.AST, temporaries: list[ast.stmt]) -> ast.AST:
+        if _is_candidate(node):
+            n = number.numbers[id(node)]
+            if n in names:
+                return ast.Name(names[n], ast.Load())
+            if references[n] > 1:
+                value = rebuild(node, temporaries)
+                name = names[n] = f"{prefix}{len(names)}"
+                temporaries.append(ast.Assign([ast.Name(name, ast.Store())], value))
+                return ast.Name(name, ast.Load())
+        return rebuild(node, temporaries)
+
+    def rebuild(node: ast.AST, temporaries: list[ast.stmt]) -> ast.AST:
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                setattr(node, field, [rewrite(x, temporaries) for x in value])
+            elif isinstance(value, ast.expr):
+                setattr(node, field, rewrite(value, temporaries))
+        return node
+
+    out = []
+    for stmt in body:
+        temporaries = []
+        if isinstance(stmt, ast.Assign | ast.AugAssign):
+            stmt.value = rewrite(stmt.value, temporaries)
+        out.extend([*temporaries, stmt])
+    return out
+
+
+def optimize(source: str) -> str:
+    """Simplify and apply common-subexpression elimination to the source
+    of an ODE step, separately for the main body and the loop body."""
+    module = _Simplify().visit(ast.parse(source))
+    (func,) = module.body
+    func.body = _eliminate(func.body, "_m")
+    for stmt in func.body:
+        if isinstance(stmt, ast.For):
+            stmt.body = _eliminate(stmt.body, "_l")
+    return ast.unparse(ast.fix_missing_locations(module))
+
+
+class _Offset(ast.NodeTransformer):
+    """Add y_offset to y and ydot indices, and p_offset to p indices."""
+
+    def visit_Subscript(self, node: ast.Subscript) -> ast.AST:
+        self.generic_visit(node)
+        if isinstance(node.value, ast.Name) and node.value.id in ("y", "p", "ydot"):
+            offset = "p_offset" if node.value.id == "p" else "y_offset"
+            node.slice = ast.BinOp(ast.Name(offset, ast.Load()), ast.Add(), node.slice)
+        return node
+
+
+def stack(source: str, y_step: int, p_step: int) -> str:
+    """ODE step of independent copies of a system, from its ODE step.
+
+    Copies are laid out as the loops of LoopSimulator, with no main species.
+    """
+    module = ast.parse(source)
+    (func,) = module.body
+    body = [
+        _Offset().visit(stmt) for stmt in func.body if not isinstance(stmt, ast.Return)
+    ]
+    (loop,) = ast.parse(
+        f"""
+for loop_num in range(N_loops):
+    y_offset = loop_num * {y_step}
+    p_offset = loop_num * {p_step}
+"""
+    ).body
+    loop.body.extend(body)
+    func.body = [
+        *ast.parse(f"N_loops = y.size // {y_step}").body,
+        loop,
+        *ast.parse("return ydot").body,
+    ]
+    return ast.unparse(ast.fix_missing_locations(module))
+
+
+def parallelize(source: str) -> str:
+    """Split the loops of an ODE step into chunks run in parallel threads.
+
+    Accumulations into main species (ydot[i] += ...) go to per-chunk partial
+    sums, which are added to ydot after the parallel loop, so that threads
+    never write to the same element. It must be compiled with
+    numba.njit(parallel=True).
+    """
+    module = ast.parse(source)
+    (func,) = module.body
+    body = []
+    for stmt in func.body:
+        if isinstance(stmt, ast.For):
+            body.extend(_parallelize_loop(stmt))
+        else:
+            body.append(stmt)
+    func.body = body
+    return ast.unparse(ast.fix_missing_locations(module))
+
+
+def _parallelize_loop(loop: ast.For) -> list[ast.stmt]:
+    (N,) = loop.iter.args
+    N = ast.unparse(N)
+
+    targets: dict[str, int] = {}
+    for stmt in ast.walk(loop):
+        if isinstance(stmt, ast.AugAssign):
+            j = targets.setdefault(ast.unparse(stmt.target), len(targets))
+            stmt.target = ast.parse(f"_partial[_chunk, {j}]").body[0].value
+            stmt.target.ctx = ast.Store()
+
+    (chunks,) = ast.parse(
+        f"""
+for _chunk in numba.prange(_n_chunks):
+    for {ast.unparse(loop.target)} in range(
+        _chunk * {N} // _n_chunks, (_chunk + 1) * {N} // _n_chunks
+    ):
+        pass
+"""
+    ).body
+    chunks.body[0].body = loop.body
+    return [
+        *ast.parse(
+            f"_n_chunks = min(numba.get_num_threads(), {N})\n"
+            f"_partial = np.zeros((_n_chunks, {len(targets)}))"
+        ).body,
+        chunks,
+        *ast.parse(
+            "for _chunk in range(_n_chunks):\n"
+            + "".join(f"    {k} += _partial[_chunk, {j}]\n" for k, j in targets.items())
+            if len(targets) > 0
+            else ""
+        ).body,
+    ]
+
+
+def count_operations(source: str) -> dict[str, int]:
+    """Arithmetic operations in the main body and in each loop iteration."""
+    (func,) = ast.parse(source).body
+    counts = {"main": 0, "loop": 0}
+    for stmt in func.body:
+        key = "loop" if isinstance(stmt, ast.For) else "main"
+        counts[key] += sum(
+            isinstance(node, ast.BinOp | ast.UnaryOp) for node in ast.walk(stmt)
+        )
+    return counts
@@ -0,0 +1,128 @@
+"""Timings and counters of LoopSimulator builds and solves."""
+
+import dataclasses
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+
+import numpy as np
+from numpy.typing import NDArray
+from poincare.simulator import Problem
+from poincare.solvers import LSODA, Solution, Solver
+from scipy import integrate
+
+
+@dataclass
+class Stats:
+    """Wall times, in seconds, and counters of LoopSimulator runs.
+
+    Counters are 0 where the solver does not report them. Stats add up,
+    so that an ensemble is aggregated with sum(stats, Stats()).
+    """
+
+    build: float = 0
+    "Symbolic build of the main and loop compartments."
+    codegen: float = 0
+    "Generation, optimization and exec of the ODE step source."
+    compile: float = 0
+    "Numba compilation of the ODE step."
+    create_initials: float = 0
+    integrate: float = 0
+    nfev: int = 0
+    "RHS evaluations."
+    njev: int = 0
+    "Jacobian evaluations."
+    nsteps: int = 0
+    solves: int = 0
+
+    def __add__(self, other: "Stats") -> "Stats":
+        return Stats(
+            **{
+                f.name: getattr(self, f.name) + getattr(other, f.name)
+                for f in fields(self)
+            }
+        )
+
+    @contextmanager
+    def timer(self, name: str):
+        """Add the wall time of the block to the given field."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            setattr(self, name, getattr(self, name) + time.perf_counter() - start)
+
+
+class _Counter:
+    """RHS that counts its evaluations."""
+
+    def __init__(self, rhs):
+        self.rhs = rhs
+        self.n = 0
+
+    def __call__(self, t, y, p, dy):
+        self.n += 1
+        return self.rhs(t, y, p, dy)
+
+
+def _is_odeint(solver: Solver, problem: Problem, save_at, events) -> bool:
+    """Whether poincare's LSODA integrates with odeint."""
+    if not isinstance(solver, LSODA):
+        return False
+    if solver.implementation == "odeint":
+        return True
+    return (
+        solver.implementation is None
+        and problem.t[0] == 0
+        and save_at is not None
+        and len(events) == 0
+    )
+
+
+@dataclass(frozen=True)
+class Instrumented:
+    """Solver that adds its integration time and counters to stats.
+
+    RHS evaluations are counted by wrapping the RHS, except for numbalsoda,
+    which needs the compiled function. Jacobian evaluations and steps are
+    reported by odeint, which is poincare's default for LSODA.
+    """
+
+    solver: Solver
+    stats: Stats
+
+    def __call__(
+        self, problem: Problem, *, save_at: NDArray | None = None, events=()
+    ) -> Solution:
+        solver = self.solver
+        if isinstance(solver, LSODA) and solver.implementation == "numbalsoda":
+            with self.stats.timer("integrate"):
+                return solver(problem, save_at=save_at, events=events)
+
+        counter = _Counter(problem.rhs)
+        with self.stats.timer("integrate"):
+            if _is_odeint(solver, problem, save_at, events):
+                y, info = integrate.odeint(
+                    counter,
+                    tfirst=True,
+                    t=save_at,
+                    y0=problem.y,
+                    args=(problem.p, np.empty_like(problem.y)),
+                    atol=solver.atol,
+                    rtol=solver.rtol,
+                    h0=solver.first_step if solver.first_step is not None else 0,
+                    hmin=solver.min_step,
+                    hmax=solver.max_step if solver.max_step is not np.inf else 0,
+                    full_output=True,
+                )
+                self.stats.njev += int(info["nje"][-1])
+                self.stats.nsteps += int(info["nst"][-1])
+                out = np.empty((save_at.size, len(problem.scale)))
+                solution = Solution(
+                    save_at, problem.transform(save_at, y.T, problem.p, out.T).T
+                )
+            else:
+                problem = dataclasses.replace(problem, rhs=counter)
+                solution = solver(problem, save_at=save_at, events=events)
+        self.stats.nfev += counter.n
+        return solution
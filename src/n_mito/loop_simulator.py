@@ -1,10 +1,12 @@
-from dataclasses import dataclass, field, replace
-from typing import Literal, Sequence, assert_never
+import re
+from dataclasses import dataclass, field, is_dataclass, replace
+from functools import cached_property
+from typing import Literal, Mapping, Sequence, assert_never
 
 import numba
 import numpy as np
 import pandas as pd
-from numpy.typing import ArrayLike
+from numpy.typing import ArrayLike, NDArray
 from poincare import Variable
 from poincare.compile import (
     Compiled,
@@ -13,30 +15,105 @@
     substitute,
 )
 from poincare.simulator import Problem
-from poincare.solvers import LSODA
+from poincare.solvers import BDF, LSODA, Radau, Solution, Solver
+from scipy import sparse
+from scipy_events import ChangeAt, solve_ivp
 from simbio import Compartment, Simulator
+from simbio.core import _species_to_variable
+
+from .codegen import count_operations, optimize, parallelize
+from .instrumentation import Instrumented, Stats
 
 
 @dataclass(repr=False)
 class LoopSimulator:
+    """Main compartment coupled to N copies of a loop compartment.
+
+    Further loop compartments, each with its own number of copies, can be
+    given in `loops`. Each one is an independent loop block in the same
+    ODE step, after those of `loop`, and the numbers of copies of each
+    are appended to the parameters. Values of loop_values go to the loop
+    compartment that owns them.
+
+    Copies of `loop` can also exchange species with their neighbours, at
+    the rates given in `exchange`, through an adjacency matrix over loop
+    indices. The adjacency must be symmetric, so that exchange conserves
+    mass. The rates, followed by the adjacency in CSR format, are stored
+    in the parameters after those of the loops, and the exchange is
+    generated as a loop over the edges of each copy. With
+    BDF or Radau, solve passes the Jacobian sparsity (jacobian_sparsity)
+    to the solver, whose size grows with the number of loops and edges.
+    """
+
     main: type[Compartment]
     loop: Compartment
     compiled_loop: Compiled[Variable, str] = field(init=False)
+    loops: Sequence[Compartment] = field(default=(), kw_only=True)
+    "Further loop compartments, as independent blocks after those of loop."
+    optimize: bool = field(default=True, kw_only=True)
+    "Simplify and eliminate common subexpressions in the generated code."
+    parallel: int | None = field(default=None, kw_only=True)
+    """Number of loops from which the RHS runs in parallel threads, if any.
+
+    It uses numba's threading layer. A process that forks after using TBB,
+    as the process pools of sweep and calibration do on Linux, hangs at
+    exit, so set NUMBA_THREADING_LAYER=omp or workqueue in such programs.
+    """
+    exchange: Mapping[Variable, float] = field(default_factory=dict, kw_only=True)
+    "Rate constants of the loop species exchanged with neighbouring loops."
+    instrument: bool = field(default=False, kw_only=True)
+    "Record timings and counters in `stats`, and per solve in result.attrs."
 
     def __post_init__(self):
-        self.main_sim = Simulator(self.main)
-        self.loop_sim = Simulator(self.loop)
-        self.compiled_loop = self._build_loop(self.main_sim.compiled)
-        self.func = self._compile_func()
+        stats = Stats()
+        with stats.timer("build"):
+            self.main_sim = Simulator(self.main)
+            self.loop_sims = [Simulator(loop) for loop in self.all_loops]
+            self.loop_sim = self.loop_sims[0]
+            self.compiled_loops = self._build_loops(self.main_sim.compiled)
+            self.compiled_loop = self.compiled_loops[0]
+        with stats.timer("codegen"):
+            self.func = self._compile_func()
         self.func = numba.njit(self.func)
+        self.stats = stats if self.instrument else None
+
+    @property
+    def all_loops(self) -> list[Compartment]:
+        return [self.loop, *self.loops]
 
-    def _build_loop(self, external: Compiled):
-        symbolic = build_first_order_symbolic_ode(self.loop)
+    def _build_loops(self, external: Compiled) -> list[Compiled[Variable, str]]:
+        compiled = []
+        for j, loop in enumerate(self.all_loops):
+            if len(self.loops) == 0:
+                header = []
+            elif j == 0:
+                header = [
+                    f"y_start_0 = {len(external.variables)}",
+                    f"p_start_0 = {len(external.parameters)}",
+                ]
+            else:
+                y_step = len(compiled[-1].variables)
+                p_step = len(compiled[-1].parameters)
+                header = [
+                    f"y_start_{j} = y_start_{j - 1} + N_loops_{j - 1} * {y_step}",
+                    f"p_start_{j} = p_start_{j - 1} + N_loops_{j - 1} * {p_step}",
+                ]
+            compiled.append(self._build_loop(external, loop, j, header))
+        return compiled
+
+    def _build_loop(
+        self,
+        external: Compiled,
+        loop: Compartment,
+        j: int = 0,
+        header: Sequence[str] = (),
+    ):
+        symbolic = build_first_order_symbolic_ode(loop)
 
         def is_not_from_main(x: Variable):
             parent = x.parent
             while parent is not None and parent is not self.main:
-                if parent is self.loop:
+                if parent is loop:
                     return True
                 parent = parent.parent
             return False
@@ -67,12 +144,23 @@ def is_not_from_main(x: Variable):
         y_step = len(loop_variables)
         p_step = len(parameters)
         indent = 4 * " "
-        lines = [
-            f"N_loops = (y.size - {y_offset}) // {y_step}",
-            "for loop_num in range(N_loops):",
-            f"{indent}y_offset = loop_num * {y_step} + {y_offset}",
-            f"{indent}p_offset = loop_num * {p_step} + {p_offset}",
-        ]
+        if len(self.loops) == 0:
+            lines = [
+                f"N_loops = (y.size - {y_offset}) // {y_step}",
+                "for loop_num in range(N_loops):",
+                f"{indent}y_offset = loop_num * {y_step} + {y_offset}",
+                f"{indent}p_offset = loop_num * {p_step} + {p_offset}",
+            ]
+        else:
+            # The number of copies of each loop are the last parameters.
+            K = len(self.all_loops)
+            lines = [
+                *header,
+                f"N_loops_{j} = int(p[p.size - {K - j}])",
+                f"for loop_num in range(N_loops_{j}):",
+                f"{indent}y_offset = loop_num * {y_step} + y_start_{j}",
+                f"{indent}p_offset = loop_num * {p_step} + p_start_{j}",
+            ]
         for k, eq in diff_eqs.items():
             ix = mapping.get(k).removeprefix("y")
             left = f"ydot{ix}"
@@ -85,52 +173,302 @@ def is_not_from_main(x: Variable):
 
     def build_func(self):
         compiled = build_first_order_vectorized_body(self.main)
-        loop = self._build_loop(compiled)
+        loops = self._build_loops(compiled)
         return "\n    ".join(
             [
                 compiled.func.removesuffix("return ydot"),
-                *loop.func.splitlines(),
+                *(line for loop in loops for line in loop.func.splitlines()),
+                *self._build_exchange(compiled, loops),
                 "",
                 "return ydot",
             ]
         )
 
-    def _compile_func(self):
+    @cached_property
+    def _exchanged(self) -> dict[int, float]:
+        """Rate constant of exchanged species, by index in the loop."""
+        return {
+            self.compiled_loop.variables.index(_species_to_variable(k)): float(v)
+            for k, v in self.exchange.items()
+        }
+
+    def _build_exchange(
+        self, external: Compiled, loops: list[Compiled[Variable, str]]
+    ) -> list[str]:
+        if len(self.exchange) == 0:
+            return []
+        y_step = len(loops[0].variables)
+        p_step = len(loops[-1].parameters)
+        if len(self.loops) == 0:
+            N, y_start = "N_loops", len(external.variables)
+            csr = f"{len(external.parameters)} + N_loops * {p_step}"
+            end = "p.size"
+        else:
+            K = len(self.all_loops)
+            N, y_start = "N_loops_0", "y_start_0"
+            csr = f"p_start_{K - 1} + N_loops_{K - 1} * {p_step}"
+            end = f"p.size - {K}"
+        indent = 4 * " "
+        lines = [
+            # indptr (N + 1), indices and weights (n_edges each)
+            f"_rates = {csr}",
+            f"_indptr = _rates + {len(self._exchanged)}",
+            f"_indices = _indptr + {N} + 1",
+            f"_weights = _indices + ({end} - _indices) // 2",
+            f"for loop_num in range({N}):",
+            f"{indent}y_offset = loop_num * {y_step} + {y_start}",
+            f"{indent}_first = int(p[_indptr + loop_num])",
+            f"{indent}_last = int(p[_indptr + loop_num + 1])",
+            f"{indent}for _edge in range(_first, _last):",
+            f"{2 * indent}_neighbor = int(p[_indices + _edge]) * {y_step} + {y_start}",
+            f"{2 * indent}_weight = p[_weights + _edge]",
+        ]
+        for r, i in enumerate(self._exchanged):
+            lines.append(
+                f"{2 * indent}ydot[y_offset + {i}] = ydot[y_offset + {i}]"
+                f" + p[_rates + {r}] * _weight"
+                f" * (y[_neighbor + {i}] - y[y_offset + {i}])"
+            )
+        return lines
+
+    def _compile_func(self, *, parallel: bool = False):
         func = self.build_func()
+        if self.optimize:
+            func = optimize(func)
+        if parallel:
+            func = parallelize(func)
         lm = {}
         exec(func, globals(), lm)
         return lm["ode_step"]
 
+    @cached_property
+    def operations(self) -> dict[str, dict[str, int]]:
+        """Arithmetic operations of the ODE step, in the main body and in each
+        loop iteration, as generated and as compiled."""
+        func = self.build_func()
+        return {
+            "generated": count_operations(func),
+            "compiled": count_operations(optimize(func) if self.optimize else func),
+        }
+
+    @cached_property
+    def parallel_func(self):
+        return numba.njit(parallel=True)(self._compile_func(parallel=True))
+
+    def loop_counts(self, y: NDArray, p: NDArray) -> list[int]:
+        """Number of copies of each loop compartment in a state."""
+        if len(self.loops) == 0:
+            M = len(self.main_sim.compiled.variables)
+            return [(y.size - M) // len(self.compiled_loop.variables)]
+        return [int(n) for n in p[-len(self.all_loops) :]]
+
+    def rhs(self, y: NDArray, p: NDArray):
+        """Serial or parallel RHS for the given state and parameters."""
+        N = sum(self.loop_counts(y, p))
+        if self.parallel is not None and N >= self.parallel:
+            return self.parallel_func
+        return self.func
+
+    def adjacency(self, y: NDArray, p: NDArray) -> sparse.csr_array:
+        """Adjacency between copies of loop, from the parameters."""
+        N = self.loop_counts(y, p)[0]
+        if len(self.exchange) == 0:
+            return sparse.csr_array((N, N))
+        K = len(self.all_loops) if len(self.loops) > 0 else 0
+        start = len(self.main_sim.compiled.parameters) + sum(
+            n * len(loop.parameters)
+            for n, loop in zip(self.loop_counts(y, p), self.compiled_loops)
+        )
+        csr = p[start + len(self._exchanged) : p.size - K]
+        n_edges = (csr.size - N - 1) // 2
+        indptr = csr[: N + 1].astype(int)
+        indices = csr[N + 1 : N + 1 + n_edges].astype(int)
+        return sparse.csr_array((csr[N + 1 + n_edges :], indices, indptr), (N, N))
+
+    @cached_property
+    def _references(self) -> tuple[list, list[list]]:
+        """Species read by each equation of the main and of each loop, as
+        (row, [columns]), where loop species are (index,) and main species
+        are plain indices."""
+
+        def index(offset, i):
+            return (int(i),) if offset else int(i)
+
+        def references(source: str):
+            refs = []
+            for match in re.finditer(r"ydot\[(y_offset \+ )?(\d+)\] \+?= (.*)", source):
+                row = index(*match.groups()[:2])
+                columns = re.findall(r"\by\[(y_offset \+ )?(\d+)\]", match[3])
+                refs.append((row, [index(*c) for c in columns]))
+            return refs
+
+        compiled = build_first_order_vectorized_body(self.main)
+        return references(compiled.func), [
+            references(loop.func) for loop in self._build_loops(compiled)
+        ]
+
+    def jacobian_sparsity(self, y: NDArray, p: NDArray) -> sparse.csr_array:
+        """Structural non-zeros of the Jacobian of the RHS."""
+        main, loops = self._references
+        rows, columns = [], []
+        for row, cols in main:
+            rows.append(np.full(len(cols), row))
+            columns.append(np.asarray(cols, dtype=int))
+
+        start = len(self.main_sim.compiled.variables)
+        starts = []
+        for refs, loop, N in zip(loops, self.compiled_loops, self.loop_counts(y, p)):
+            L = len(loop.variables)
+            base = start + L * np.arange(N)
+            starts.append(base)
+
+            def position(i):
+                return base + i[0] if isinstance(i, tuple) else np.full(N, i)
+
+            for row, cols in refs:
+                for col in cols:
+                    rows.append(position(row))
+                    columns.append(position(col))
+            start += N * L
+
+        if len(self.exchange) > 0:
+            adjacency = self.adjacency(y, p).tocoo()
+            base = starts[0]
+            for i in self._exchanged:
+                rows.extend([base[adjacency.row] + i, base + i])
+                columns.extend([base[adjacency.col] + i, base + i])
+
+        rows, columns = np.concatenate(rows), np.concatenate(columns)
+        return sparse.csr_array(
+            (np.ones(rows.size, dtype=bool), (rows, columns)), (y.size, y.size)
+        )
+
+    def projection(
+        self,
+        observables: Mapping[str, Variable | Mapping[Variable, float]],
+        y: NDArray,
+        p: NDArray,
+    ) -> sparse.csr_array:
+        """Matrix of the observables as linear combinations of the state.
+
+        Each observable is a species, or a mapping of species to their
+        coefficients, such as {CytoC_C: 1, CytoC_M: 1}. Loop species are
+        summed over all loops.
+        """
+        main_variables = self.main_sim.compiled.variables
+        counts = self.loop_counts(y, p)
+        starts = len(main_variables) + np.cumsum(
+            [
+                0,
+                *(
+                    n * len(loop.variables)
+                    for n, loop in zip(counts, self.compiled_loops)
+                ),
+            ]
+        )
+        rows, columns, data = [], [], []
+        for row, observable in enumerate(observables.values()):
+            if not isinstance(observable, Mapping):
+                observable = {observable: 1}
+            for k, coefficient in observable.items():
+                k = _species_to_variable(k)
+                if k in main_variables:
+                    indices = [main_variables.index(k)]
+                else:
+                    owners = [
+                        start
+                        + len(loop.variables) * np.arange(n)
+                        + loop.variables.index(k)
+                        for start, n, loop in zip(starts, counts, self.compiled_loops)
+                        if k in loop.variables
+                    ]
+                    if len(owners) != 1:
+                        raise ValueError(f"{k} is in {len(owners)} compartments")
+                    (indices,) = owners
+                rows.extend(row for _ in indices)
+                columns.extend(indices)
+                data.extend(coefficient for _ in indices)
+        return sparse.csr_array(
+            (data, (rows, columns)), (len(observables), y.size), dtype=float
+        )
+
+    def _split_loop_values(
+        self, loop_values: dict[Variable, ArrayLike]
+    ) -> list[dict[Variable, ArrayLike]]:
+        if len(self.loops) == 0:
+            return [loop_values]
+        main = self.main_sim.compiled.mapper
+        split = [{} for _ in self.loop_sims]
+        for k, v in loop_values.items():
+            var = _species_to_variable(k)
+            owners = [
+                values
+                for values, sim in zip(split, self.loop_sims)
+                if var in sim.compiled.mapper and var not in main
+            ]
+            if len(owners) != 1:
+                raise ValueError(f"{k} is in {len(owners)} loop compartments")
+            owners[0][k] = v
+        return split
+
     def create_initials(
         self,
         *,
         main_values: dict[Variable, float] = {},
         loop_values: dict[Variable, ArrayLike] = {},
+        adjacency: ArrayLike | sparse.sparray | None = None,
     ):
         problem_main = self.main_sim.create_problem(values=main_values)
 
         y = [problem_main.y]
         p = [problem_main.p]
-        mask_y = np.array(
-            [
-                i
-                for i, x in enumerate(self.loop_sim.compiled.variables)
-                if x in self.compiled_loop.variables
-            ]
-        )
-        mask_p = np.array(
-            [
-                i
-                for i, x in enumerate(self.loop_sim.compiled.parameters)
-                if x in self.compiled_loop.parameters
-            ]
-        )
-        for _, values in pd.DataFrame(loop_values).iterrows():
-            problem_loop = self.loop_sim.create_problem(values=values.to_dict())
-            y.append(problem_loop.y[mask_y])
-            p.append(problem_loop.p[mask_p])
+        counts = []
+        for loop_sim, compiled_loop, values in zip(
+            self.loop_sims, self.compiled_loops, self._split_loop_values(loop_values)
+        ):
+            mask_y = np.array(
+                [
+                    i
+                    for i, x in enumerate(loop_sim.compiled.variables)
+                    if x in compiled_loop.variables
+                ]
+            )
+            mask_p = np.array(
+                [
+                    i
+                    for i, x in enumerate(loop_sim.compiled.parameters)
+                    if x in compiled_loop.parameters
+                ]
+            )
+            df = pd.DataFrame(values)
+            for _, values in df.iterrows():
+                problem_loop = loop_sim.create_problem(values=values.to_dict())
+                y.append(problem_loop.y[mask_y])
+                p.append(problem_loop.p[mask_p])
+            counts.append(len(df))
+        if len(self.exchange) > 0:
+            N = counts[0]
+            if adjacency is None:
+                adjacency = sparse.csr_array((N, N))
+            adjacency = sparse.csr_array(adjacency)
+            if adjacency.shape != (N, N):
+                raise ValueError(f"adjacency must be {N}x{N}, got {adjacency.shape}")
+            if (adjacency != adjacency.T).nnz > 0:
+                raise ValueError("adjacency must be symmetric to conserve mass")
+            p.extend(
+                [
+                    list(self._exchanged.values()),
+                    adjacency.indptr,
+                    adjacency.indices,
+                    adjacency.data,
+                ]
+            )
+        elif adjacency is not None:
+            raise ValueError("adjacency requires exchanged species")
+        if len(self.loops) > 0:
+            p.append(np.array(counts, dtype=float))
         y = np.concatenate(y)
-        p = np.concatenate(p)
+        p = np.concatenate(p, dtype=float)
         return y, p
 
     def create_problem(
@@ -138,10 +476,13 @@ def create_problem(
         *,
         main_values: dict[Variable, float] = {},
         loop_values: dict[Variable, ArrayLike] = {},
+        adjacency: ArrayLike | sparse.sparray | None = None,
     ):
-        y, p = self.create_initials(main_values=main_values, loop_values=loop_values)
+        y, p = self.create_initials(
+            main_values=main_values, loop_values=loop_values, adjacency=adjacency
+        )
         return Problem(
-            self.func,
+            self.rhs(y, p),
             (0, np.inf),
             y,
             p,
@@ -154,12 +495,74 @@ def solve(
         *,
         main_values: dict[Variable, float] = {},
         loop_values: dict[Variable, ArrayLike] = {},
+        adjacency: ArrayLike | sparse.sparray | None = None,
         solver=LSODA(),
         save_at: ArrayLike,
-        loop_output: Literal["ignore", "sum", "index_as_suffix"] = "ignore",
+        loop_output: Literal["ignore", "sum", "index_as_suffix", "xarray"] = "ignore",
+        observables: Mapping[str, Variable | Mapping[Variable, float]] | None = None,
     ):
-        problem = self.create_problem(main_values=main_values, loop_values=loop_values)
+        """Solve and return main species, and optionally loop species.
+
+        loop_output:
+            - "ignore": main species only.
+            - "sum": loop species summed over loops.
+            - "index_as_suffix": a column per loop species and loop, as x_0, x_1.
+            - "xarray": a Dataset with dims (time,) for main species and
+              (time, loop) for loop species, which are views of the solution.
+              Further loop compartments have dims loop_1, loop_2, etc.
+
+        observables:
+            Named species or linear combinations of species (see projection),
+            which are the only columns computed and stored at each save
+            point, instead of the whole state. It replaces loop_output.
+        """
+        if observables is not None and loop_output != "ignore":
+            raise ValueError("observables replace loop_output")
+        run = Stats(solves=1)
+        with run.timer("create_initials"):
+            problem = self.create_problem(
+                main_values=main_values, loop_values=loop_values, adjacency=adjacency
+            )
+        stats = run if self.instrument else None
+        sparsity = None
+        if isinstance(inner_solver(solver), BDF | Radau):
+            sparsity = self.jacobian_sparsity(problem.y, problem.p)
+        if observables is not None:
+            projection = self.projection(observables, problem.y, problem.p)
+            solver = replace_solver(
+                solver, lambda s: _Observed(s, projection, sparsity, stats)
+            )
+        elif sparsity is not None:
+            solver = replace_solver(solver, lambda s: _Sparse(s, sparsity, stats))
+        if self.instrument:
+            self._compile(problem, run)
+            solver = Instrumented(solver, run)
         solution = solver(problem, save_at=np.asarray(save_at))
+
+        if observables is not None:
+            result = pd.DataFrame(
+                solution.y, index=solution.t, columns=list(observables)
+            )
+        else:
+            result = self._loop_output(problem, solution, loop_output)
+        if self.instrument:
+            self.stats += run
+            result.attrs["stats"] = run
+        return result
+
+    def _compile(self, problem: Problem, stats: Stats):
+        """Compile the RHS, if it was not, timing it."""
+        if len(problem.rhs.signatures) == 0:
+            with stats.timer("compile"):
+                y = problem.y
+                problem.rhs(float(problem.t[0]), y, problem.p, np.empty_like(y))
+
+    def _loop_output(
+        self,
+        problem: Problem,
+        solution: Solution,
+        loop_output: Literal["ignore", "sum", "index_as_suffix", "xarray"],
+    ):
         main_variables = self.main_sim.compiled.variables
         if loop_output == "ignore":
             return pd.DataFrame(
@@ -167,23 +570,184 @@ def solve(
                 index=solution.t,
                 columns=main_variables,
             )
-        elif loop_output == "sum":
-            loop_variables = self.compiled_loop.variables
-            all_variables = [*main_variables, *loop_variables]
-            y = solution.y[:, : len(all_variables)]
-            y[:, len(main_variables) :] = (
-                solution.y[:, len(main_variables) :]
-                .reshape(solution.y.shape[0], -1, len(loop_variables))
-                .sum(1)
+
+        blocks = []
+        start = len(main_variables)
+        for compiled_loop, N in zip(
+            self.compiled_loops, self.loop_counts(problem.y, problem.p)
+        ):
+            L = len(compiled_loop.variables)
+            y = solution.y[:, start : start + N * L].reshape(-1, N, L)
+            blocks.append((compiled_loop.variables, y))
+            start += N * L
+        if loop_output == "sum":
+            all_variables = list(main_variables)
+            y = [solution.y[:, : len(main_variables)]]
+            for loop_variables, y_loop in blocks:
+                all_variables.extend(loop_variables)
+                y.append(y_loop.sum(1))
+            return pd.DataFrame(
+                np.concatenate(y, axis=1), index=solution.t, columns=all_variables
             )
-            return pd.DataFrame(y, index=solution.t, columns=all_variables)
         elif loop_output == "index_as_suffix":
-            loop_variables = self.compiled_loop.variables
             all_variables = list(main_variables)
-            for i in range(
-                (solution.y.shape[1] - len(all_variables)) // len(loop_variables)
-            ):
-                all_variables.extend(f"{k}_{i}" for k in loop_variables)
-            return pd.DataFrame(solution.y, index=solution.t, columns=all_variables)
+            for loop_variables, y_loop in blocks:
+                for i in range(y_loop.shape[1]):
+                    all_variables.extend(f"{k}_{i}" for k in loop_variables)
+            return pd.DataFrame(
+                solution.y[:, :start], index=solution.t, columns=all_variables
+            )
+        elif loop_output == "xarray":
+            import xarray as xr
+
+            data_vars = {
+                str(k): ("time", solution.y[:, i]) for i, k in enumerate(main_variables)
+            }
+            for j, (loop_variables, y_loop) in enumerate(blocks):
+                dim = "loop" if j == 0 else f"loop_{j}"
+                for i, k in enumerate(loop_variables):
+                    if str(k) in data_vars:
+                        raise ValueError(f"{k} is in several loop compartments")
+                    data_vars[str(k)] = (("time", dim), y_loop[:, :, i])
+            return xr.Dataset(data_vars, coords={"time": solution.t})
         else:
             assert_never(loop_output)
+
+
+def inner_solver(solver):
+    """Solver inside wrappers, which are dataclasses with a `solver` field,
+    such as those of Scaled and Stimulated."""
+    while is_dataclass(solver) and hasattr(solver, "solver"):
+        solver = solver.solver
+    return solver
+
+
+def replace_solver(solver, f):
+    """Wrappers of solver (see inner_solver) around f(inner_solver(solver))."""
+    if is_dataclass(solver) and hasattr(solver, "solver"):
+        return replace(solver, solver=replace_solver(solver.solver, f))
+    return f(solver)
+
+
+def _transform(problem: Problem, t: NDArray, y: NDArray) -> NDArray:
+    """Output of the problem's transform, (T, n), for the states y, (n, T)."""
+    out = np.empty((len(problem.scale), t.size))
+    return problem.transform(t, y, problem.p, out).T
+
+
+@dataclass(frozen=True)
+class _Sparse:
+    """BDF or Radau with the Jacobian sparsity, for finite differences."""
+
+    solver: BDF | Radau
+    sparsity: sparse.csr_array
+    stats: Stats | None = None
+
+    def __call__(self, problem: Problem, *, save_at=None, events=()):
+        solver = self.solver
+        t_span = problem.t
+        if np.isinf(t_span[1]):
+            t_span = (t_span[0], save_at[-1])
+        solution = solve_ivp(
+            # A new output array per call, as the grouped finite differences
+            # keep the reference value while evaluating perturbed states.
+            lambda t, y, p: problem.rhs(t, y, p, np.empty_like(y)),
+            t_span,
+            problem.y,
+            method=solver._solver_class,
+            t_eval=save_at,
+            events=events,
+            args=(problem.p,),
+            rtol=solver.rtol,
+            atol=solver.atol,
+            first_step=solver.first_step,
+            max_step=solver.max_step,
+            jac_sparsity=self.sparsity,
+        )
+        if solution.status == -1:
+            raise RuntimeError(solution.message)
+        if self.stats is not None:
+            self.stats.njev += int(solution.njev)
+        t = np.asarray(solution.t)
+        return Solution(
+            t,
+            _transform(problem, t, np.asarray(solution.y)),
+            solution.t_events,
+            solution.y_events,
+        )
+
+
+@dataclass(frozen=True)
+class _Observed:
+    """Stepping loop that stores only a projection of the state at each
+    save point, with the solver's method and tolerances.
+
+    The only events supported are ChangeAt (see Stimulated), where the
+    integration is restarted with the changed state and parameters.
+    """
+
+    solver: Solver
+    projection: sparse.csr_array
+    sparsity: sparse.csr_array | None = None
+    stats: Stats | None = None
+
+    def __call__(self, problem: Problem, *, save_at: NDArray, events=()):
+        if not all(isinstance(e, ChangeAt) for e in events):
+            raise TypeError("only ChangeAt events are supported with observables")
+        solver = self.solver
+        options = dict(
+            rtol=solver.rtol,
+            atol=solver.atol,
+            first_step=solver.first_step,
+            max_step=solver.max_step,
+        )
+        if isinstance(solver, LSODA):
+            options["min_step"] = solver.min_step
+        elif self.sparsity is not None:
+            options["jac_sparsity"] = self.sparsity
+
+        t, y, p = problem.t[0], problem.y, problem.p
+        t_events = [
+            np.array([s for s in e.times if t < s < save_at[-1]]) for e in events
+        ]
+        y_events = [[] for _ in events]
+        out = np.empty((save_at.size, self.projection.shape[0]))
+        i = np.searchsorted(save_at, t, side="right")
+        (y_out,) = _transform(problem, np.array([t]), y[:, None])
+        out[:i] = self.projection @ y_out
+        steps = njev = 0
+        for t_stop in [*np.unique(np.concatenate([[], *t_events])), save_at[-1]]:
+            method = solver._solver_class(
+                lambda t, y, p=p: problem.rhs(t, y, p, np.empty_like(y)),
+                t,
+                y,
+                t_stop,
+                **options,
+            )
+            while method.status == "running":
+                message = method.step()
+                steps += 1
+                if method.status == "failed":
+                    raise RuntimeError(message)
+                stop = np.searchsorted(save_at, method.t, side="right")
+                if stop > i:
+                    segment = replace(problem, p=p)
+                    ts = save_at[i:stop]
+                    y_out = _transform(segment, ts, method.dense_output()(ts))
+                    out[i:stop] = (self.projection @ y_out.T).T
+                    i = stop
+            njev += method.njev
+            t, y = t_stop, method.y
+            for e, times, ys in zip(events, t_events, y_events):
+                if t in times:
+                    ys.append(y)
+                    y, (p,) = e.change(t, y, (p,))
+        if self.stats is not None:
+            self.stats.njev += int(njev)
+            self.stats.nsteps += steps
+        return Solution(
+            save_at,
+            out,
+            t_events,
+            [np.reshape(ys, (len(ys), y.size)) for ys in y_events],
+        )
@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import numpy as np
+from pytest import approx
+
+from ...mito import Mitochondria
+from ..codegen import count_operations, optimize, parallelize
+from ..loop_simulator import LoopSimulator
+
+SOURCE = """
+def step(t, y, p, ydot):
+    ydot[0] = -1.0 * (p[0] * y[0] ** 1 * y[1]) + 0
+    ydot[1] = 1.0 * (p[0] * y[0] ** 1 * y[1]) + -1.0 * (p[1] * y[1])
+    N_loops = y.size - 2
+    for loop_num in range(N_loops):
+        ydot[2 + loop_num] = p[1] * y[1] * y[2 + loop_num]
+        ydot[0] += p[1] * y[1] * y[2 + loop_num]
+    return ydot
+"""
+
+
+def test_optimize():
+    optimized = optimize(SOURCE)
+    before, after = count_operations(SOURCE), count_operations(optimized)
+    assert after["main"] < before["main"]
+    assert after["loop"] < before["loop"]
+
+    y, p = np.array([1.0, 2.0, 3.0, 4.0]), np.array([0.5, 0.25])
+    results = []
+    for source in (SOURCE, optimized):
+        namespace = {}
+        exec(source, namespace)
+        results.append(namespace["step"](0, y, p, np.empty(4)))
+    np.testing.assert_allclose(results[1], results[0], rtol=1e-15)
+
+
+def test_simplify():
+    optimized = optimize(SOURCE)
+    for trivial in ("1.0", "** 1", "+ 0", "+ -"):
+        assert trivial not in optimized
+    assert "= -_m" in optimized
+    assert " - p[1]" in optimized
+
+
+def test_optimize_rebinding():
+    source = """
+def step(t, y, p, ydot):
+    k = p[0] * p[1]
+    ydot[0] = k * y[0]
+    k = p[0] * p[2]
+    ydot[1] = k * y[0]
+    return ydot
+"""
+    y, p = np.array([2.0, 3.0]), np.array([0.5, 0.25, 4.0])
+    namespace = {}
+    exec(optimize(source), namespace)
+    assert namespace["step"](0, y, p, np.empty(2)) == approx([0.25, 4.0])
+
+
+def test_loop_simulator(arm_loop):
+    operations = arm_loop.operations
+    assert operations["compiled"]["main"] < operations["generated"]["main"] / 2
+    assert operations["compiled"]["loop"] < operations["generated"]["loop"] / 2
+
+    sims = [LoopSimulator(arm_loop.main, arm_loop.loop, optimize=False), arm_loop]
+    problems = [
+        sim.create_problem(loop_values={Mitochondria.Bcl2: [1e4, 2e4, 3e4]})
+        for sim in sims
+    ]
+    y = problems[0].y * np.linspace(0.5, 1.5, problems[0].y.size) + 1
+    dy = [
+        sim.func(0, y, problem.p, np.empty_like(y))
+        for sim, problem in zip(sims, problems)
+    ]
+    np.testing.assert_allclose(dy[1], dy[0], rtol=1e-12, atol=0)
+
+
+def test_parallelize():
+    # Run as Python, with 2 chunks for 3 loops.
+    numba = SimpleNamespace(prange=range, get_num_threads=lambda: 2)
+    y, p = np.array([1.0, 2.0, 3.0, 4.0, 5.0]), np.array([0.5, 0.25])
+    results = []
+    for source in (SOURCE, parallelize(SOURCE), parallelize(optimize(SOURCE))):
+        namespace = {"np": np, "numba": numba}
+        exec(source, namespace)
+        results.append(namespace["step"](0, y, p, np.empty(5)))
+    np.testing.assert_allclose(results[1], results[0], rtol=1e-15)
+    np.testing.assert_allclose(results[2], results[0], rtol=1e-15)
+
+
+def test_parallel_loop_simulator(arm_loop, workqueue):
+    sim = LoopSimulator(arm_loop.main, arm_loop.loop, parallel=3)
+    assert sim.create_problem(loop_values={Mitochondria.Bcl2: [1e4]}).rhs is sim.func
+
+    problem = sim.create_problem(loop_values={Mitochondria.Bcl2: [1e4, 2e4, 3e4]})
+    assert problem.rhs is sim.parallel_func
+    y = problem.y * np.linspace(0.5, 1.5, problem.y.size) + 1
+    np.testing.assert_allclose(
+        sim.parallel_func(0, y, problem.p, np.empty_like(y)),
+        sim.func(0, y, problem.p, np.empty_like(y)),
+        rtol=1e-12,
+    )
@@ -1,7 +1,20 @@
 import numpy as np
+import pytest
 from pandas.testing import assert_frame_equal
-from simbio import Compartment, Simulator, Species, initial, reactions
+from poincare.solvers import BDF, LSODA
+from pytest import approx
+from simbio import (
+    Compartment,
+    Parameter,
+    Simulator,
+    Species,
+    assign,
+    initial,
+    reactions,
+)
 
+from ...tests.common import Loop, Main, renamer
+from ..instrumentation import Stats
 from ..loop_simulator import LoopSimulator
 
 
@@ -32,3 +45,183 @@ class Loop(Compartment):
         df.rename(columns=str).rename_axis(index="time"),
         df_main,
     )
+
+
+def test_several_loops():
+    class Main(Compartment):
+        x: Species = initial(default=10)
+        r = reactions.Destruction(A=x, rate=0.1)
+
+    class Source(Compartment):
+        x: Species = initial(default=0)
+        a: Species = initial(default=1)
+        r = reactions.Conversion(A=a, B=x, rate=1)
+
+    class Sink(Compartment):
+        x: Species = initial(default=0)
+        b: Species = initial(default=0)
+        k: Parameter = assign(default=0.5)
+        r = reactions.Conversion(A=x, B=b, rate=k)
+
+    class Manual(Compartment):
+        main = Main()
+        source_0 = Source(x=main.x)
+        source_1 = Source(x=main.x)
+        sink_0 = Sink(x=main.x)
+        sink_1 = Sink(x=main.x)
+        sink_2 = Sink(x=main.x)
+
+    sim = LoopSimulator(Main, Source(x=Main.x), loops=[Sink(x=Main.x)])
+    t = np.linspace(0, 5, 11)
+    solver = LSODA(rtol=1e-8, atol=1e-10)
+    loop_values = {Source.a: [1, 2], Sink.k: [0.5, 1, 2]}
+    df = sim.solve(
+        loop_values=loop_values,
+        save_at=t,
+        solver=solver,
+        loop_output="index_as_suffix",
+    )
+    expected = Simulator(Manual).solve(
+        values={Manual.source_1.a: 2, Manual.sink_1.k: 1, Manual.sink_2.k: 2},
+        save_at=t,
+        solver=solver,
+    )
+
+    assert_frame_equal(
+        df.rename(columns=str).rename_axis(index="time"),
+        expected.rename(columns=renamer)[list(map(str, df.columns))],
+        rtol=1e-6,
+        atol=1e-9,
+    )
+
+    assert sim.loop_counts(*sim.create_initials(loop_values=loop_values)) == [2, 3]
+    df = sim.solve(loop_values=loop_values, save_at=t, loop_output="sum")
+    assert list(map(str, df.columns)) == ["x", "a", "b"]
+
+
+def test_exchange():
+    # a exchanged along 0 - 1 - 2, with weights 1 and 2
+    k = 0.3
+    adjacency = np.array([[0, 1, 0], [1, 0, 2], [0, 2, 0]])
+
+    class Manual(Compartment):
+        main = Main()
+        loop_0 = Loop(x=main.x, a=initial(default=3))
+        loop_1 = Loop(x=main.x, a=initial(default=0))
+        loop_2 = Loop(x=main.x, a=initial(default=0))
+        e01 = reactions.Conversion(A=loop_0.a, B=loop_1.a, rate=k)
+        e10 = reactions.Conversion(A=loop_1.a, B=loop_0.a, rate=k)
+        e12 = reactions.Conversion(A=loop_1.a, B=loop_2.a, rate=2 * k)
+        e21 = reactions.Conversion(A=loop_2.a, B=loop_1.a, rate=2 * k)
+
+    sim = LoopSimulator(Main, Loop(x=Main.x), exchange={Loop.a: k})
+    t = np.linspace(0, 5, 11)
+    kwargs = dict(
+        loop_values={Loop.a: [3, 0, 0]},
+        adjacency=adjacency,
+        save_at=t,
+        loop_output="index_as_suffix",
+    )
+    df = sim.solve(**kwargs, solver=LSODA(rtol=1e-8, atol=1e-10))
+    expected = Simulator(Manual).solve(save_at=t, solver=LSODA(rtol=1e-8, atol=1e-10))
+
+    assert_frame_equal(
+        df.rename(columns=str).rename_axis(index="time"),
+        expected.rename(columns=renamer)[list(map(str, df.columns))],
+        rtol=1e-6,
+        atol=1e-9,
+    )
+
+    # The sparsity covers the finite-difference Jacobian.
+    y, p = sim.create_initials(loop_values={Loop.a: [3, 0, 0]}, adjacency=adjacency)
+    y = y + np.arange(1, y.size + 1)
+    f0 = sim.func(0, y, p, np.empty_like(y))
+    J = np.empty((y.size, y.size))
+    for j in range(y.size):
+        dy = np.zeros_like(y)
+        dy[j] = 1e-6
+        J[:, j] = (sim.func(0, y + dy, p, np.empty_like(y)) - f0) / 1e-6
+    sparsity = sim.jacobian_sparsity(y, p).toarray()
+    assert not np.any((J != 0) & ~sparsity)
+    assert sparsity.sum() < y.size**2
+    assert (sim.adjacency(y, p).toarray() == adjacency).all()
+
+    # Rates are parameters
+    y, p = sim.create_initials(loop_values={Loop.a: [3, 0, 0]}, adjacency=adjacency)
+    i = p.size - (3 + 1) - 2 * 4 - 1  # before indptr, indices and weights
+    assert p[i] == k
+    p[i] = 0
+    dy = sim.func(0, y, p, np.empty_like(y))
+    assert dy[1:] == approx([-0.5 * 3, 0, 0])
+
+    with pytest.raises(ValueError, match="symmetric"):
+        sim.create_initials(
+            loop_values={Loop.a: [3, 0, 0]}, adjacency=np.triu(adjacency)
+        )
+
+    df_bdf = sim.solve(**kwargs, solver=BDF(rtol=1e-8, atol=1e-10))
+    assert_frame_equal(df_bdf, df, rtol=1e-5, atol=1e-8)
+
+
+def test_xarray():
+    pytest.importorskip("xarray")
+
+    sim = LoopSimulator(Main, Loop(x=Main.x))
+    t = np.linspace(0, 5, 11)
+    kwargs = dict(loop_values={Loop.a: [1, 2, 3]}, save_at=t)
+    ds = sim.solve(**kwargs, loop_output="xarray")
+    df = sim.solve(**kwargs, loop_output="index_as_suffix").rename(columns=str)
+
+    assert ds["x"].dims == ("time",)
+    assert ds["a"].dims == ("time", "loop")
+    np.testing.assert_array_equal(ds["x"], df["x"])
+    for i in range(3):
+        np.testing.assert_array_equal(ds["a"].isel(loop=i), df[f"a_{i}"])
+    # Both are views of the solution array.
+    assert ds["a"].values.base is ds["x"].values.base is not None
+
+
+@pytest.mark.parametrize(
+    "solver", [LSODA(rtol=1e-8, atol=1e-10), BDF(rtol=1e-8, atol=1e-10)]
+)
+def test_observables(solver):
+    sim = LoopSimulator(Main, Loop(x=Main.x))
+    kwargs = dict(loop_values={Loop.a: [1, 2, 3]}, save_at=np.linspace(0, 5, 11))
+    df = sim.solve(
+        **kwargs,
+        solver=solver,
+        observables={"x": Main.x, "total": {Main.x: 1, Loop.a: 1}, "a": Loop.a},
+    )
+    expected = sim.solve(**kwargs, solver=solver, loop_output="sum")
+    expected = expected.rename(columns=str)
+
+    assert list(df.columns) == ["x", "total", "a"]
+    np.testing.assert_allclose(df["x"], expected["x"], rtol=1e-6)
+    np.testing.assert_allclose(df["a"], expected["a"], rtol=1e-6)
+    np.testing.assert_allclose(df["total"], expected["x"] + expected["a"], rtol=1e-6)
+
+
+def test_instrument():
+    sim = LoopSimulator(Main, Loop(x=Main.x), instrument=True)
+    assert sim.stats.build > 0 and sim.stats.codegen > 0
+
+    kwargs = dict(loop_values={Loop.a: [1, 2]}, save_at=np.linspace(0, 5, 11))
+    runs = [
+        sim.solve(**kwargs).attrs["stats"],
+        sim.solve(**kwargs, solver=BDF()).attrs["stats"],
+        sim.solve(**kwargs, loop_output="xarray").attrs["stats"],
+    ]
+    assert runs[0].compile > 0 and runs[1].compile == 0
+    for run in runs:
+        assert run.solves == 1
+        assert run.integrate > 0 and run.create_initials > 0
+        assert run.nfev > 0
+    assert runs[0].nsteps > 0  # reported by odeint
+    assert runs[1].njev > 0  # reported by BDF
+
+    total = sum(runs, Stats())
+    assert total.nfev == sum(run.nfev for run in runs)
+    assert sim.stats.solves == 3
+    assert sim.stats.nfev == total.nfev
+
+    assert LoopSimulator(Main, Loop(x=Main.x)).stats is None
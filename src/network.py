@@ -0,0 +1,357 @@
+from __future__ import annotations
+
+from collections import ChainMap, defaultdict
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Callable, Collection, Iterable, Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+from poincare._node import Node
+from poincare._utils import eval_content
+from poincare.types import Number
+from scipy import sparse
+from simbio import MassAction
+from symbolite.core import evaluate, substitute
+
+
+def reaction_name(reaction: MassAction) -> str:
+    """Name of a reaction at the level of the model that contains it.
+
+    Reaction classes (e.g. reactions.MichaelisMenten) are walked up,
+    so that the forward and reverse halves of a reaction share a name.
+    """
+    node = reaction
+    while node.parent is not None and type(node.parent).__module__.startswith(
+        "simbio."
+    ):
+        node = node.parent
+    return str(node)
+
+
+def _rate_constants(compiled, rates: Sequence) -> Callable[[NDArray], NDArray]:
+    """Evaluate rate expressions from the parameter vector of a problem.
+
+    Rates that are parameters are taken from it directly.
+    """
+    position = {p: i for i, p in enumerate(compiled.parameters)}
+    index = np.array([position.get(k, -1) for k in rates], dtype=int)
+    expressions = [(j, k) for j, k in enumerate(rates) if index[j] < 0]
+
+    def func(p: NDArray) -> NDArray:
+        k = np.asarray(p, dtype=float)[index]
+        if len(expressions) == 0:
+            return k
+        content = ChainMap(
+            dict(zip(compiled.parameters, p)),
+            compiled.mapper,
+            {compiled.independent[0]: 0},
+        )
+        values = eval_content(
+            content,
+            compiled.libsl,
+            is_root=lambda x: isinstance(x, Number),
+            is_dependency=lambda x: isinstance(x, Node),
+        )
+        for j, rate in expressions:
+            k[j] = float(evaluate(substitute(rate, values), compiled.libsl))
+        return k
+
+    return func
+
+
+def influencers(
+    reactions: Sequence[tuple[Collection[str], Collection[str]]],
+    outputs: Iterable[str],
+) -> tuple[set[str], list[int]]:
+    """Species and reactions that can affect the outputs.
+
+    Each reaction is given by its reactants, which determine its rate,
+    and the species it changes (non-zero net stoichiometry).
+    A reaction affects the outputs if it changes a species that does,
+    and then its reactants do too.
+    """
+    changed_by = defaultdict(list)
+    for j, (_, changes) in enumerate(reactions):
+        for s in changes:
+            changed_by[s].append(j)
+
+    species, kept = set(outputs), set()
+    pending = list(species)
+    while pending:
+        for j in changed_by[pending.pop()]:
+            if j in kept:
+                continue
+            kept.add(j)
+            for s in reactions[j][0]:
+                if s not in species:
+                    species.add(s)
+                    pending.append(s)
+    return species, sorted(kept)
+
+
+@dataclass(frozen=True)
+class Network:
+    """Mass-action reaction network in the state order of a problem.
+
+    The rate of reaction j is k_j prod_i y_i^orders[j, i],
+    and dy/dt = stoichiometry @ rates. Matrices are sparse, so that
+    memory and time scale with the number of reactions, as for a
+    LoopSimulator with many loops.
+    """
+
+    species: list[str]
+    reactions: list[str]
+    orders: sparse.csr_array
+    "(R, S)"
+    stoichiometry: sparse.csr_array
+    "(S, R)"
+    rate_constants: Callable[[NDArray], NDArray]
+    "Rate constants from the parameter vector of a problem."
+
+    @classmethod
+    def from_reactions(
+        cls,
+        reactions: Sequence[MassAction],
+        variables: Sequence,
+    ) -> tuple[list[str], sparse.csr_array, sparse.csr_array]:
+        index = {v: i for i, v in enumerate(variables)}
+        orders, stoichiometry = [], []
+        for j, r in enumerate(reactions):
+            for s in r.reactants:
+                orders.append((j, index[s.variable], s.stoichiometry))
+                stoichiometry.append((index[s.variable], j, -s.stoichiometry))
+            for s in r.products:
+                stoichiometry.append((index[s.variable], j, s.stoichiometry))
+        shape = (len(reactions), len(variables))
+        return (
+            list(map(reaction_name, reactions)),
+            _csr(orders, shape),
+            # Duplicates are summed, so that catalysts cancel out.
+            _csr(stoichiometry, shape[::-1]),
+        )
+
+    @classmethod
+    def from_simulator(cls, sim) -> Network:
+        """Network of a simbio Simulator.
+
+        For a LoopSimulator, use from_loop_simulator.
+        """
+        compiled = sim.compiled
+        reactions = list(sim.model._yield(MassAction))
+        names, orders, stoichiometry = cls.from_reactions(reactions, compiled.variables)
+        return cls(
+            species=list(map(str, compiled.variables)),
+            reactions=names,
+            orders=orders,
+            stoichiometry=stoichiometry,
+            rate_constants=_rate_constants(compiled, [r.rate for r in reactions]),
+        )
+
+    @classmethod
+    def from_loop_simulator(cls, sim, N: int) -> Network:
+        """Network of a LoopSimulator with N loops.
+
+        Loop species and reactions are suffixed by the loop index, as in
+        LoopSimulator.solve(..., loop_output="index_as_suffix").
+        """
+        main = cls.from_simulator(sim.main_sim)
+        main_variables = sim.main_sim.compiled.variables
+        loop_variables = sim.compiled_loop.variables
+        reactions = list(sim.loop._yield(MassAction))
+        names, orders, stoichiometry = cls.from_reactions(
+            reactions, [*main_variables, *loop_variables]
+        )
+
+        M, L, R = len(main_variables), len(loop_variables), len(main.reactions)
+        # Loop blocks are on the diagonal, and share the main species.
+        loops, shared = sparse.eye_array(N), np.ones((N, 1))
+        all_orders = sparse.vstack(
+            [
+                sparse.hstack([main.orders, sparse.csr_array((R, N * L))]),
+                sparse.hstack(
+                    [
+                        sparse.kron(shared, orders[:, :M]),
+                        sparse.kron(loops, orders[:, M:]),
+                    ]
+                ),
+            ],
+            format="csr",
+        )
+        all_stoichiometry = sparse.vstack(
+            [
+                sparse.hstack(
+                    [main.stoichiometry, sparse.kron(shared.T, stoichiometry[:M])]
+                ),
+                sparse.hstack(
+                    [
+                        sparse.csr_array((N * L, R)),
+                        sparse.kron(loops, stoichiometry[M:]),
+                    ]
+                ),
+            ],
+            format="csr",
+        )
+        species, all_names = list(main.species), list(main.reactions)
+        for n in range(N):
+            species.extend(f"{v}_{n}" for v in loop_variables)
+            all_names.extend(f"{k}_{n}" for k in names)
+
+        main_rates = main.rate_constants
+        loop_rates = _rate_constants(_LoopCompiled(sim), [r.rate for r in reactions])
+        P_main = len(sim.main_sim.compiled.parameters)
+        P_loop = len(sim.compiled_loop.parameters)
+
+        def rate_constants(p: NDArray) -> NDArray:
+            k = [main_rates(p[:P_main])]
+            for n in range(N):
+                start = P_main + n * P_loop
+                k.append(loop_rates(p[start : start + P_loop]))
+            return np.concatenate(k)
+
+        return cls(
+            species=species,
+            reactions=all_names,
+            orders=all_orders,
+            stoichiometry=all_stoichiometry,
+            rate_constants=rate_constants,
+        )
+
+    def prune(self, outputs: Iterable[str]) -> Network:
+        """Network of the species and reactions that can affect the outputs."""
+        reactions = [
+            (
+                [self.species[i] for i in reactants],
+                [self.species[i] for i in changes],
+            )
+            for (reactants, _), (changes, _) in zip(
+                _rows(self.orders), _rows(self.stoichiometry.T)
+            )
+        ]
+        species, kept = influencers(reactions, outputs)
+        keep = [i for i, s in enumerate(self.species) if s in species]
+        rate_constants = self.rate_constants
+        return Network(
+            species=[self.species[i] for i in keep],
+            reactions=[self.reactions[j] for j in kept],
+            orders=self.orders[kept][:, keep],
+            stoichiometry=self.stoichiometry[keep][:, kept],
+            rate_constants=lambda p: rate_constants(p)[kept],
+        )
+
+    def compile(self) -> Callable:
+        """Numba-compiled RHS with signature (t, y, k, dy), as in Problem.rhs."""
+        # Imported here, as the rebop environment uses influencers without numba.
+        import numba
+
+        index, orders = self._reactants
+        # Padding points to an extra species, and is skipped by its zero order.
+        index = np.where(orders == 0, 0, index)
+        columns = _rows(self.stoichiometry.T)
+        m = max(1, max((i.size for i, _ in columns), default=0))
+        changes = np.zeros((len(self.reactions), m), dtype=np.int64)
+        coefficients = np.zeros((len(self.reactions), m))
+        for j, (i, values) in enumerate(columns):
+            changes[j, : i.size] = i
+            coefficients[j, : i.size] = values
+
+        @numba.njit
+        def rhs(t, y, k, dy):
+            dy[:] = 0
+            for j in range(index.shape[0]):
+                rate = k[j]
+                for c in range(index.shape[1]):
+                    if orders[j, c] != 0:
+                        rate *= y[index[j, c]] ** orders[j, c]
+                for c in range(changes.shape[1]):
+                    dy[changes[j, c]] += coefficients[j, c] * rate
+            return dy
+
+        return rhs
+
+    @cached_property
+    def _reactants(self) -> tuple[NDArray, NDArray]:
+        """Species index and order of each reactant, padded to (R, m).
+
+        Padding points to an extra species with y = 1 and order 0.
+        """
+        rows = _rows(self.orders)
+        m = max(1, max((i.size for i, _ in rows), default=0))
+        index = np.full((len(self.reactions), m), len(self.species))
+        orders = np.zeros((len(self.reactions), m))
+        for j, (i, values) in enumerate(rows):
+            index[j, : i.size] = i
+            orders[j, : i.size] = values
+        return index, orders
+
+    def rates(self, y: NDArray, k: NDArray) -> NDArray:
+        index, orders = self._reactants
+        return k * np.prod(np.append(y, 1)[index] ** orders, axis=1)
+
+    def rhs(self, y: NDArray, k: NDArray) -> NDArray:
+        return self.stoichiometry @ self.rates(y, k)
+
+    def rates_jacobian(self, y: NDArray, k: NDArray) -> sparse.csr_array:
+        """Derivative of reaction rates with respect to species, (R, S)."""
+        index, orders = self._reactants
+        y = np.append(y, 1)
+        factors = y[index] ** orders
+        values = np.empty(index.shape)
+        for c in range(index.shape[1]):
+            others = np.prod(np.delete(factors, c, axis=1), axis=1)
+            order = orders[:, c]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                power = np.where(order > 0, y[index[:, c]] ** (order - 1), 0)
+            values[:, c] = k * order * power * others
+        rows = np.broadcast_to(np.arange(len(self.reactions))[:, None], index.shape)
+        # Padding goes to the extra column, which is dropped.
+        out = sparse.csr_array(
+            (values.ravel(), (rows.ravel(), index.ravel())),
+            shape=(len(self.reactions), len(self.species) + 1),
+        )
+        return out[:, :-1]
+
+    def jacobian(self, y: NDArray, k: NDArray) -> sparse.csr_array:
+        """Analytic Jacobian of the right-hand side, (S, S)."""
+        return self.stoichiometry @ self.rates_jacobian(y, k)
+
+
+def _csr(entries: list[tuple[int, int, float]], shape) -> sparse.csr_array:
+    rows, columns, values = np.reshape(entries, (-1, 3)).T
+    out = sparse.csr_array((values, (rows.astype(int), columns.astype(int))), shape)
+    out.eliminate_zeros()
+    return out
+
+
+def _rows(matrix) -> list[tuple[NDArray, NDArray]]:
+    """Column indices and values of the non-zeros of each row."""
+    matrix = sparse.csr_array(matrix)
+    if matrix.shape[0] == 0:
+        return []
+    matrix.sum_duplicates()
+    matrix.eliminate_zeros()
+    bounds = matrix.indptr[1:-1]
+    return list(zip(np.split(matrix.indices, bounds), np.split(matrix.data, bounds)))
+
+
+@dataclass(frozen=True)
+class _LoopCompiled:
+    """Parameters and defaults of a LoopSimulator loop, in the order of its block."""
+
+    sim: object
+
+    @property
+    def parameters(self):
+        return self.sim.compiled_loop.parameters
+
+    @property
+    def mapper(self):
+        return self.sim.loop_sim.compiled.mapper
+
+    @property
+    def independent(self):
+        return self.sim.loop_sim.compiled.independent
+
+    @property
+    def libsl(self):
+        return self.sim.loop_sim.compiled.libsl
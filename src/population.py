@@ -0,0 +1,231 @@
+from collections import ChainMap
+from dataclasses import dataclass
+from typing import Callable, Mapping
+
+import numba
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike, NDArray
+from poincare._node import Node
+from poincare._utils import eval_content
+from poincare.compile import build_first_order_vectorized_body
+from poincare.simulator import Problem
+from poincare.solvers import LSODA, Solution
+from poincare.types import Number
+from scipy import integrate
+from simbio import Compartment, Simulator
+from simbio.core import _species_to_variable
+
+from .n_mito.codegen import optimize, stack
+
+Distribution = Callable[[np.random.Generator, int], NDArray]
+
+
+def lognormal(median: float, sigma: float) -> Distribution:
+    """Lognormal distribution, where log(x) has the given sigma."""
+    return lambda rng, n: median * rng.lognormal(0, sigma, n)
+
+
+def sample(
+    distributions: Mapping[object, Distribution],
+    n: int,
+    *,
+    seed: int | None = None,
+) -> dict:
+    """Values of n cells drawn from each distribution."""
+    rng = np.random.default_rng(seed)
+    return {k: dist(rng, n) for k, dist in distributions.items()}
+
+
+def block_jacobian(rhs, block: int) -> Callable:
+    """Finite-difference Jacobian of a block-diagonal system, in the banded
+    layout of odeint with ml = mu = block - 1.
+
+    The i-th species of all blocks are perturbed together, as they do not
+    interact, so it takes `block` RHS evaluations, instead of one per species.
+    It is compiled with numba if rhs is.
+    """
+    eps = np.sqrt(np.finfo(float).eps)
+    bands = 2 * block - 1
+
+    def jacobian(t, y, p, dy):
+        f0 = rhs(t, y, p, np.empty_like(y))
+        f = np.empty_like(y)
+        J = np.zeros((bands, y.size))
+        for k in range(block):
+            y_k = y.copy()
+            for j in range(k, y.size, block):
+                y_k[j] += eps * max(abs(y[j]), 1.0)
+            rhs(t, y_k, p, f)
+            for j in range(k, y.size, block):
+                h = y_k[j] - y[j]
+                start = j - k
+                # d f[i] / d y[j] goes to J[i - j + block - 1, j]
+                for i in range(start, start + block):
+                    J[i - j + block - 1, j] = (f[i] - f0[i]) / h
+        return J
+
+    if isinstance(rhs, numba.core.dispatcher.Dispatcher):
+        return numba.njit(jacobian)
+    return jacobian
+
+
+class _Values(np.ndarray):
+    """Array of per-cell values, hashable by identity as symbolite requires."""
+
+    __hash__ = object.__hash__
+
+
+@dataclass(frozen=True)
+class _Banded:
+    """LSODA (odeint) with the banded Jacobian of independent blocks."""
+
+    solver: LSODA
+    jacobian: Callable
+    block: int
+
+    def __call__(self, problem: Problem, *, save_at: NDArray, events=()):
+        if len(events) > 0:
+            raise TypeError("events are not supported by odeint")
+        solver = self.solver
+        y = integrate.odeint(
+            problem.rhs,
+            tfirst=True,
+            t=save_at,
+            y0=problem.y,
+            args=(problem.p, np.empty_like(problem.y)),
+            atol=solver.atol,
+            rtol=solver.rtol,
+            h0=solver.first_step if solver.first_step is not None else 0,
+            hmin=solver.min_step,
+            hmax=solver.max_step if solver.max_step is not np.inf else 0,
+            Dfun=self.jacobian,
+            ml=self.block - 1,
+            mu=self.block - 1,
+        )
+        return Solution(save_at, y)
+
+
+class Population:
+    """Independent cells of a model, for parameter screens of small models.
+
+    The RHS is the model's ODE step repeated over cells, as the loops of
+    LoopSimulator with no main species. Initial values and parameters of
+    all cells are evaluated at once, and cells are integrated in batches
+    of `batch` cells stacked in a single state.
+
+    Cells in a batch share the solver's step size and error norm, the RMS
+    over all of them, so that a stiff cell slows the others. With LSODA,
+    the block-diagonal Jacobian (block_jacobian) is factorized as a banded
+    matrix, whose cost per cell grows with the bandwidth. Hence, the
+    default batch=1, with per-cell error control, is usually the fastest.
+
+    >>> pop = Population(ARM)
+    >>> values = sample({ARM.cytoplasm.XIAP: lognormal(1e5, 0.3)}, 1000)
+    >>> df = pop.solve({**values, ARM.L_concentration: 100}, save_at=t)
+    """
+
+    def __init__(self, model: type[Compartment], /, *, optimize: bool = True):
+        self.model = model
+        self.sim = Simulator(model)
+        self.variables = list(self.sim.compiled.variables)
+        self.optimize = optimize
+        self.func = numba.njit(self._compile_func())
+        self.jacobian = block_jacobian(self.func, len(self.variables))
+
+    def build_func(self) -> str:
+        compiled = build_first_order_vectorized_body(self.model)
+        return stack(compiled.func, len(compiled.variables), len(compiled.parameters))
+
+    def _compile_func(self):
+        func = self.build_func()
+        if self.optimize:
+            func = optimize(func)
+        lm = {}
+        exec(func, globals(), lm)
+        return lm["ode_step"]
+
+    def create_initials(self, values: Mapping[object, ArrayLike]):
+        """Initial state and parameters of each cell, stacked.
+
+        Values are scalars, shared by all cells, or arrays with one value
+        per cell. Default values are evaluated once for all cells.
+        """
+        compiled = self.sim.compiled
+        values = {
+            _species_to_variable(k): np.asarray(v, dtype=float).view(_Values)
+            for k, v in values.items()
+        }
+        result = eval_content(
+            ChainMap(values, compiled.mapper, {compiled.independent[0]: 0}),
+            compiled.libsl,
+            is_root=lambda x: isinstance(x, Number | np.ndarray),
+            is_dependency=lambda x: isinstance(x, Node),
+        )
+        cells = np.broadcast_shapes(*(v.shape for v in values.values()))
+        y = [np.broadcast_to(result[k], cells) for k in compiled.variables]
+        p = [np.broadcast_to(result[k], cells) for k in compiled.parameters]
+        return (
+            np.stack(y, -1, dtype=float).ravel(),
+            np.stack(p, -1, dtype=float).ravel(),
+        )
+
+    def create_problem(
+        self,
+        values: Mapping[object, ArrayLike] = {},
+        *,
+        t_span: tuple[float, float] = (0, np.inf),
+    ) -> Problem:
+        y, p = self.create_initials(values)
+        return Problem(
+            self.func,
+            t_span,
+            y,
+            p,
+            transform=lambda t, y, p, dy: y,
+            scale=np.ones_like(y),
+        )
+
+    def solve(
+        self,
+        values: Mapping[object, ArrayLike] = {},
+        *,
+        save_at: ArrayLike,
+        solver=LSODA(),
+        batch: int = 1,
+    ) -> pd.DataFrame:
+        """Solve all cells, in batches of `batch` cells.
+
+        Columns are (cell, variable).
+        """
+        save_at = np.asarray(save_at)
+        problem = self.create_problem(values, t_span=(0, save_at[-1]))
+        n_y = len(self.variables)
+        n_cells = len(problem.y) // n_y
+        n_p = len(problem.p) // n_cells
+        if isinstance(solver, LSODA):
+            solver = _Banded(solver, self.jacobian, n_y)
+
+        y = []
+        for start in range(0, n_cells, batch):
+            stop = min(start + batch, n_cells)
+            solution = solver(
+                Problem(
+                    problem.rhs,
+                    problem.t,
+                    problem.y[start * n_y : stop * n_y],
+                    problem.p[start * n_p : stop * n_p],
+                    transform=problem.transform,
+                    scale=problem.scale[start * n_y : stop * n_y],
+                ),
+                save_at=save_at,
+            )
+            y.append(solution.y)
+        return pd.DataFrame(
+            np.concatenate(y, axis=1),
+            index=pd.Series(save_at, name="time"),
+            columns=pd.MultiIndex.from_product(
+                [range(n_cells), map(str, self.variables)],
+                names=["cell", "variable"],
+            ),
+        )
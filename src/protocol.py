@@ -0,0 +1,170 @@
+import dataclasses
+import inspect
+from dataclasses import dataclass, field
+from typing import Mapping, Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+from poincare.simulator import Problem
+from poincare.solvers import LSODA
+from scipy_events import ChangeAt
+
+
+@dataclass(frozen=True)
+class Step:
+    """Values applied from `time` on, on top of those of previous steps.
+
+    Parameters take the new values, and species whose initial value depends
+    on them (e.g. ARM.cytoplasm.L on ARM.L) are set to their new initial value.
+    For a LoopSimulator, `values` are main values.
+    """
+
+    time: float
+    values: Mapping = field(default_factory=dict)
+    loop_values: Mapping = field(default_factory=dict)
+
+
+def pulse(
+    component,
+    value: float,
+    *,
+    start: float,
+    duration: float,
+    baseline: float = 0,
+) -> list[Step]:
+    """Steps that set a component to value during [start, start + duration)."""
+    return [
+        Step(start, {component: value}),
+        Step(start + duration, {component: baseline}),
+    ]
+
+
+@dataclass(frozen=True)
+class _Change:
+    """Set species and parameters of the segment that starts at t."""
+
+    segments: dict[float, tuple[NDArray, NDArray, NDArray]]
+
+    def __call__(self, t: float, y: NDArray, args: tuple) -> tuple[NDArray, tuple]:
+        y_new, changed, p = self.segments[t]
+        return np.where(changed, y_new, y), (p, *args[1:])
+
+
+@dataclass(frozen=True)
+class _WithChanges:
+    """Solver that also applies changes, and hides them from the solution."""
+
+    solver: object
+    change: ChangeAt
+
+    def __call__(self, problem: Problem, *, save_at=None, events=()):
+        if np.isinf(problem.t[1]) and save_at is not None:
+            # LoopSimulator problems are unbounded, which events do not support.
+            problem = dataclasses.replace(problem, t=(problem.t[0], save_at[-1]))
+        n = len(events)
+        solution = self.solver(problem, save_at=save_at, events=[*events, self.change])
+        return dataclasses.replace(
+            solution,
+            t_events=solution.t_events[:n],
+            y_events=solution.y_events[:n],
+        )
+
+
+class Stimulated:
+    """Simulator or LoopSimulator with a time-dependent stimulus protocol.
+
+    Each step is applied as a discontinuity within a single integration,
+    where the solver is restarted at the breakpoint with the new state and
+    parameters, which are computed before solving.
+
+    >>> sim = Stimulated(
+    ...     Simulator(ARM),
+    ...     [*pulse(ARM.cytoplasm.L, 1000, start=0, duration=3600)],
+    ... )
+    >>> df = sim.solve({ARM.L: 0}, save_at=t)  # ligand wash-out after 1 h
+    """
+
+    def __init__(self, sim, /, protocol: Sequence[Step]):
+        self.sim = sim
+        self.protocol = sorted(protocol, key=lambda step: step.time)
+        self._signature = inspect.signature(sim.create_problem)
+        self._is_loop = hasattr(sim, "main_sim")
+
+    def __getattr__(self, name):
+        return getattr(self.sim, name)
+
+    def _values(self, bound: inspect.BoundArguments) -> tuple[dict, dict]:
+        if self._is_loop:
+            return (
+                dict(bound.arguments.get("main_values", {})),
+                dict(bound.arguments.get("loop_values", {})),
+            )
+        return dict(bound.arguments.get("values", {})), {}
+
+    def _create_problem(self, bound, values: dict, loop_values: dict) -> Problem:
+        bound = self._signature.bind(*bound.args, **bound.kwargs)
+        if self._is_loop:
+            bound.arguments["main_values"] = values
+            bound.arguments["loop_values"] = loop_values
+        else:
+            bound.arguments["values"] = values
+        return self.sim.create_problem(*bound.args, **bound.kwargs)
+
+    def segments(self, *args, **kwargs) -> list[tuple[float, Problem, NDArray]]:
+        """Start time, problem and species set by the steps of each segment."""
+        bound = self._signature.bind(*args, **kwargs)
+        values, loop_values = self._values(bound)
+        t0 = bound.arguments.get("t_span", (0, np.inf))[0]
+
+        times = [t0]
+        for step in self.protocol:
+            if step.time > times[-1]:
+                times.append(step.time)
+        segments = []
+        for t in times:
+            steps = [
+                s for s in self.protocol if s.time == t or (t == t0 and s.time < t0)
+            ]
+            unknown = ({}, {})
+            for step in steps:
+                values.update(step.values)
+                loop_values.update(step.loop_values)
+                unknown[0].update(dict.fromkeys(step.values, np.nan))
+                unknown[1].update(
+                    {
+                        k: np.full(np.shape(v), np.nan)
+                        for k, v in step.loop_values.items()
+                    }
+                )
+            problem = self._create_problem(bound, values, loop_values)
+            dependent = self._create_problem(
+                bound, {**values, **unknown[0]}, {**loop_values, **unknown[1]}
+            )
+            segments.append((t, problem, np.isnan(dependent.y)))
+        return segments
+
+    def create_problem(self, *args, **kwargs) -> Problem:
+        return self.segments(*args, **kwargs)[0][1]
+
+    def change(self, segments: list[tuple[float, Problem, NDArray]]) -> ChangeAt:
+        # A single ChangeAt, as scipy_events mishandles several of them.
+        return ChangeAt(
+            times=[t for t, _, _ in segments[1:]],
+            change=_Change(
+                {t: (problem.y, changed, problem.p) for t, problem, changed in segments}
+            ),
+        )
+
+    def solve(self, *args, solver=LSODA(), **kwargs):
+        signature = inspect.signature(self.sim.solve)
+        bound = signature.bind(*args, **kwargs)
+        values = {
+            k: v for k, v in bound.arguments.items() if k in self._signature.parameters
+        }
+        if not self._is_loop and "t_span" not in values:
+            save_at = bound.arguments.get("save_at")
+            values["t_span"] = (0, np.asarray(save_at)[-1])
+        segments = self.segments(**values)
+        if len(segments) > 1:
+            solver = _WithChanges(solver, self.change(segments))
+        return type(self.sim).solve(self, *args, solver=solver, **kwargs)
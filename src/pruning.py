@@ -0,0 +1,100 @@
+from typing import Callable, Sequence
+
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike
+from poincare.simulator import Problem
+from poincare.solvers import LSODA
+
+from .network import Network
+
+
+def output_names(species: Sequence[str], outputs: Sequence) -> list[str]:
+    """Species names of outputs, where loop species expand to all loops."""
+    names = []
+    for output in map(str, outputs):
+        if output in species:
+            names.append(output)
+            continue
+        loops = [
+            s
+            for s in species
+            if s.startswith(f"{output}_") and s.removeprefix(f"{output}_").isdigit()
+        ]
+        if len(loops) == 0:
+            raise KeyError(output)
+        names.extend(loops)
+    return names
+
+
+class Pruned:
+    """Simulator or LoopSimulator restricted to what can affect `outputs`.
+
+    Species and reactions that cannot affect the outputs (network.influencers)
+    are removed, and the remaining mass-action network is integrated with
+    a compiled RHS whose parameters are the rate constants.
+    Only outputs are returned by solve.
+
+    >>> sim = Pruned(Simulator(ARM), [ARM.cytoplasm.C3_A, ARM.cytoplasm.Apop])
+    >>> df = sim.solve({ARM.L_concentration: 100}, save_at=t)
+    """
+
+    def __init__(self, sim, /, outputs: Sequence):
+        self.sim = sim
+        self.outputs = list(outputs)
+        self._is_loop = hasattr(sim, "main_sim")
+        self._networks: dict[int, tuple[Network, list[int], Callable]] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.sim, name)
+
+    def network(self, size: int) -> tuple[Network, list[int], Callable]:
+        """Pruned network for a full state of the given size, the indices of
+        its species in the full state, and its compiled RHS."""
+        if size not in self._networks:
+            if self._is_loop:
+                M = len(self.sim.main_sim.compiled.variables)
+                N = (size - M) // len(self.sim.compiled_loop.variables)
+                network = Network.from_loop_simulator(self.sim, N)
+            else:
+                network = Network.from_simulator(self.sim)
+            pruned = network.prune(output_names(network.species, self.outputs))
+            index = [network.species.index(s) for s in pruned.species]
+            self._networks[size] = pruned, index, pruned.compile()
+        return self._networks[size]
+
+    def _create_problem(self, *args, **kwargs) -> tuple[Problem, Network]:
+        problem = self.sim.create_problem(*args, **kwargs)
+        network, index, rhs = self.network(len(problem.y))
+        y = np.asarray(problem.y, dtype=float)[index]
+        problem = Problem(
+            rhs=rhs,
+            t=problem.t,
+            y=y,
+            p=network.rate_constants(problem.p),
+            transform=lambda t, y, p, out: y,
+            scale=np.ones_like(y),
+        )
+        return problem, network
+
+    def create_problem(self, *args, **kwargs) -> Problem:
+        return self._create_problem(*args, **kwargs)[0]
+
+    def solve(
+        self,
+        *args,
+        save_at: ArrayLike,
+        solver=LSODA(),
+        **kwargs,
+    ) -> pd.DataFrame:
+        save_at = np.asarray(save_at)
+        if not self._is_loop:
+            kwargs.setdefault("t_span", (0, save_at[-1]))
+        problem, network = self._create_problem(*args, **kwargs)
+        solution = solver(problem, save_at=save_at)
+        df = pd.DataFrame(
+            solution.y,
+            index=pd.Series(solution.t, name="time"),
+            columns=network.species,
+        )
+        return df[output_names(network.species, self.outputs)]
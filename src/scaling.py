@@ -0,0 +1,81 @@
+import dataclasses
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import NDArray
+from poincare.simulator import Problem
+from poincare.solvers import LSODA, Solver
+
+from .n_mito.loop_simulator import replace_solver
+
+
+def pilot_scale(
+    problem: Problem,
+    t_end: float,
+    *,
+    solver: Solver = LSODA(rtol=1e-3, atol=1),
+    n: int = 100,
+    floor: float = 1,
+) -> NDArray:
+    """Typical magnitude of each species, the maximum of its initial value
+    and of a loose-tolerance run until t_end, but at least floor."""
+    save_at = np.linspace(problem.t[0], t_end, n)
+    problem = dataclasses.replace(
+        problem,
+        t=(problem.t[0], t_end),
+        transform=lambda t, y, p, out: y,
+        scale=np.ones_like(problem.y),
+    )
+    y = solver(problem, save_at=save_at).y
+    scale = np.maximum(np.abs(problem.y), np.abs(y).max(axis=0))
+    return np.maximum(scale, floor)
+
+
+@dataclass(frozen=True)
+class _ScaledTolerance:
+    """Solver with the absolute tolerance multiplied by the species scale."""
+
+    solver: Solver
+    scaled: "Scaled"
+
+    def __call__(self, problem: Problem, *, save_at=None, events=()):
+        t_end = problem.t[1]
+        if np.isinf(t_end):
+            t_end = save_at[-1]
+        scale = self.scaled.scale(problem, t_end)
+        solver = replace_solver(
+            self.solver, lambda s: dataclasses.replace(s, atol=s.atol * scale)
+        )
+        return solver(problem, save_at=save_at, events=events)
+
+
+class Scaled:
+    """Simulator or LoopSimulator with per-species absolute tolerances.
+
+    The solver's atol is taken relative to the typical magnitude of each
+    species (pilot_scale), so that species from ~100 (flip, R) to ~1e6
+    (PARP_U) are solved to a similar relative accuracy. The scale is computed
+    once per state size, from the first problem solved, and can be set in
+    `scales`.
+
+    >>> sim = Scaled(Simulator(ARM))
+    >>> df = sim.solve(save_at=t, solver=LSODA(rtol=1e-6, atol=1e-6))
+    """
+
+    def __init__(self, sim, /, *, floor: float = 1):
+        self.sim = sim
+        self.floor = floor
+        self.scales: dict[int, NDArray] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.sim, name)
+
+    def scale(self, problem: Problem, t_end: float) -> NDArray:
+        size = len(problem.y)
+        if size not in self.scales:
+            self.scales[size] = pilot_scale(problem, t_end, floor=self.floor)
+        return self.scales[size]
+
+    def solve(self, *args, solver=LSODA(), **kwargs):
+        solver = _ScaledTolerance(solver, self)
+        return type(self.sim).solve(self, *args, solver=solver, **kwargs)
@@ -0,0 +1,155 @@
+import json
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Mapping
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from scipy.stats import qmc
+
+from .sweep import Model, Sweep
+
+
+@dataclass(frozen=True, kw_only=True)
+class GSA:
+    """Global sensitivity analysis over log10 factors of parameter defaults.
+
+    Uses a Saltelli design from a scrambled Sobol sequence: matrices A and B
+    with n rows each, and AB_i, which is A with column i taken from B.
+    It requires n (d + 2) runs for d parameters, from which both Sobol
+    indices (Jansen estimators) and Morris elementary effects (radial design)
+    are computed.
+
+    Runs are evaluated by `sweep` in chunks, each written to a parquet file
+    in `path` as soon as it is done. Existing chunks are skipped, so an
+    interrupted analysis resumes where it stopped.
+
+    >>> gsa = GSA(
+    ...     sweep=Sweep(
+    ...         simulator=functools.partial(Simulator, ARM, backend="numba"),
+    ...         save_at=np.linspace(0, 15 * 3600, 1_000),
+    ...         observables=[ARM.cytoplasm.Smac_C, ARM.cytoplasm.C3_A],
+    ...         metrics={"onset": metrics.onset},
+    ...     ),
+    ...     bounds={ARM.KF: (-1, 1), ARM.mitocondria.Bcl2: (-1, 1)},
+    ...     n=2**10,
+    ...     path=Path("results/gsa"),
+    ... )
+    >>> y = gsa.outputs(gsa.run())
+    >>> y["delay"] = y["cytoplasm.C3_A", "onset"] - y["cytoplasm.Smac_C", "onset"]
+    >>> gsa.sobol(y["delay"])
+    """
+
+    sweep: Sweep
+    bounds: Mapping
+    n: int
+    path: Path
+    seed: int = 0
+    chunk: int = 1_024
+
+    @cached_property
+    def model(self) -> Model:
+        return self.sweep.model()
+
+    @cached_property
+    def names(self) -> list[str]:
+        return [self.model.name(k) for k in self.bounds]
+
+    def unit_design(self) -> NDArray:
+        """Points in the unit hypercube, as blocks A, B, AB_1, ..., AB_d."""
+        d = len(self.bounds)
+        sampler = qmc.Sobol(2 * d, scramble=True, seed=self.seed)
+        base = sampler.random(self.n)
+        A, B = base[:, :d], base[:, d:]
+        blocks = [A, B]
+        for i in range(d):
+            AB = A.copy()
+            AB[:, i] = B[:, i]
+            blocks.append(AB)
+        return np.concatenate(blocks)
+
+    def design(self) -> pd.DataFrame:
+        names = self.names
+        defaults = self.model.defaults(names)
+        defaults.update((self.model.name(k), v) for k, v in self.sweep.values.items())
+        low, high = np.transpose(list(self.bounds.values()))
+        factors = 10 ** qmc.scale(self.unit_design(), low, high)
+        return pd.DataFrame(
+            factors * np.array([defaults[k] for k in names]),
+            columns=names,
+        ).rename_axis("point")
+
+    def run(self) -> pd.DataFrame:
+        """Evaluate missing chunks of the design and return all results."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        config = {
+            "parameters": [[k, *b] for k, b in zip(self.names, self.bounds.values())],
+            "n": self.n,
+            "seed": self.seed,
+            "chunk": self.chunk,
+        }
+        p = self.path / "config.json"
+        if p.exists() and json.loads(p.read_text()) != config:
+            raise ValueError(f"{self.path} belongs to a different analysis")
+        p.write_text(json.dumps(config))
+
+        design = self.design()
+        chunks = {
+            self.path / f"chunk_{start // self.chunk:05d}.parquet": design.iloc[
+                start : start + self.chunk
+            ]
+            for start in range(0, len(design), self.chunk)
+        }
+        missing = {p: points for p, points in chunks.items() if not p.exists()}
+        for (p, points), df in zip(
+            missing.items(), self.sweep.stream(missing.values())
+        ):
+            df.insert(0, "point", np.repeat(points.index, len(df) // len(points)))
+            df.to_parquet(p)
+        return pd.concat(map(pd.read_parquet, chunks), ignore_index=True)
+
+    def outputs(self, results: pd.DataFrame) -> pd.DataFrame:
+        """One row per point and one column per (observable, metric)."""
+        return results.pivot(
+            index="point",
+            columns=["observable", "metric"],
+            values="value",
+        )
+
+    def _blocks(self, y: pd.Series) -> tuple[NDArray, NDArray, NDArray]:
+        y = y.sort_index().to_numpy()
+        d = len(self.bounds)
+        if y.size != self.n * (d + 2):
+            raise ValueError(f"expected {self.n * (d + 2)} outputs, got {y.size}")
+        y = y.reshape(d + 2, self.n)
+        return y[0], y[1], y[2:]
+
+    def sobol(self, y: pd.Series) -> pd.DataFrame:
+        """First order (S1) and total (ST) Sobol indices of an output."""
+        fA, fB, fAB = self._blocks(y)
+        variance = np.var(np.concatenate([fA, fB]))
+        return pd.DataFrame(
+            {
+                "S1": np.mean(fB * (fAB - fA), axis=1) / variance,
+                "ST": np.mean((fA - fAB) ** 2, axis=1) / (2 * variance),
+            },
+            index=pd.Index(self.names, name="parameter"),
+        )
+
+    def morris(self, y: pd.Series) -> pd.DataFrame:
+        """Mean absolute (mu_star) and standard deviation (sigma) of elementary
+        effects, per unit of log10 factor."""
+        fA, _, fAB = self._blocks(y)
+        u = self.unit_design().reshape(len(self.bounds) + 2, self.n, -1)
+        low, high = np.transpose(list(self.bounds.values()))
+        step = np.diagonal(u[2:] - u[0], axis1=0, axis2=2).T * (high - low)[:, None]
+        effects = (fAB - fA) / step
+        return pd.DataFrame(
+            {
+                "mu_star": np.mean(np.abs(effects), axis=1),
+                "sigma": np.std(effects, axis=1),
+            },
+            index=pd.Index(self.names, name="parameter"),
+        )
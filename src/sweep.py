@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import contextlib
+import itertools
+import os
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, Mapping, Protocol, Sequence
+
+import numpy as np
+import pandas as pd
+from numpy.typing import ArrayLike, NDArray
+from poincare._node import Node
+from poincare._utils import eval_content
+from poincare.simulator import Problem
+from poincare.solvers import LSODA, Solver
+from poincare.types import Number
+from simbio import Simulator
+from simbio.core import _species_to_variable
+
+from . import metrics
+
+
+class Metric(Protocol):
+    def __call__(self, t: NDArray, x: NDArray, /) -> float: ...
+
+
+def evaluate_defaults(sim: Simulator) -> dict:
+    """Numerical default value of every component of a compiled model."""
+    content = ChainMap(sim.compiled.mapper, {sim.compiled.independent[0]: 0})
+    return eval_content(
+        content,
+        sim.compiled.libsl,
+        is_root=lambda x: isinstance(x, Number),
+        is_dependency=lambda x: isinstance(x, Node),
+    )
+
+
+class Model:
+    """Uniform interface over Simulator and LoopSimulator.
+
+    Components are referred to by name, so that values can be sent to workers.
+    For LoopSimulator, loop components are prefixed by the loop class name
+    (e.g. `Mitochondria.Bcl2`), and set to the same value in every loop.
+    The number of loops is the length of the array loop_values,
+    or 1 if they are all scalars or empty.
+    """
+
+    def __init__(self, sim, /, *, loop_values: Mapping = {}):
+        self.sim = sim
+        self.loop_values = dict(loop_values)
+        sizes = {np.size(v) for v in self.loop_values.values() if np.ndim(v) > 0}
+        if len(sizes) > 1:
+            raise ValueError(f"loop_values have different lengths: {sorted(sizes)}")
+        self.n_loops = sizes.pop() if sizes else 1
+        if self.is_loop:
+            self.components = {str(k): k for k in sim.main_sim.compiled.mapper}
+            prefix = type(sim.loop).__name__
+            self.loop_components = {
+                f"{prefix}.{k}": k
+                for k in sim.loop_sim.compiled.mapper
+                if k not in sim.main_sim.compiled.mapper
+            }
+            self.variables = list(map(str, sim.main_sim.compiled.variables))
+        else:
+            self.components = {str(k): k for k in sim.compiled.mapper}
+            self.loop_components = {}
+            self.variables = list(sim.transform.output)
+
+    @property
+    def is_loop(self) -> bool:
+        return hasattr(self.sim, "main_sim")
+
+    def name(self, key, /) -> str:
+        """Name of a component."""
+        if isinstance(key, str):
+            if key in self.components or key in self.loop_components:
+                return key
+            raise KeyError(key)
+
+        key = _species_to_variable(key)
+        for name, value in (*self.components.items(), *self.loop_components.items()):
+            if value == key:
+                return name
+        raise KeyError(key)
+
+    def defaults(self, names: Sequence[str], /) -> dict[str, float]:
+        if self.is_loop:
+            main = evaluate_defaults(self.sim.main_sim)
+            loop = evaluate_defaults(self.sim.loop_sim)
+        else:
+            main = loop = evaluate_defaults(self.sim)
+
+        out = {}
+        for k in names:
+            if k in self.components:
+                out[k] = float(main[self.components[k]])
+            else:
+                out[k] = float(loop[self.loop_components[k]])
+        return out
+
+    def create_problem(self, values: Mapping[str, float], /, *, t_end: float):
+        if not self.is_loop:
+            return self.sim.create_problem(
+                {self.components[k]: v for k, v in values.items()},
+                t_span=(0, t_end),
+            )
+
+        N = self.n_loops
+        main_values = {}
+        loop_values = {k: np.broadcast_to(v, N) for k, v in self.loop_values.items()}
+        for k, v in values.items():
+            if k in self.components:
+                main_values[self.components[k]] = v
+            else:
+                loop_values[self.loop_components[k]] = np.full(N, v)
+        return self.sim.create_problem(main_values=main_values, loop_values=loop_values)
+
+
+@dataclass(frozen=True, kw_only=True)
+class Sweep:
+    """Evaluate metrics of observables over many parameter values.
+
+    Each point is solved with `values` updated by the point values.
+    The simulator is built once per worker process by calling `simulator`,
+    which must be picklable (e.g. a functools.partial), and reused for all
+    parameter values. Solutions are not converted to DataFrames.
+
+    >>> sweep = Sweep(
+    ...     simulator=functools.partial(Simulator, ARM, backend="numba"),
+    ...     save_at=np.linspace(0, 15 * 3600, 1_000),
+    ...     observables=[ARM.cytoplasm.C3_A],
+    ... )
+    >>> sweep.one_at_a_time([ARM.L, ARM.R], np.logspace(-5, 5, 50))
+    """
+
+    simulator: Callable[[], Simulator]
+    save_at: ArrayLike
+    observables: Sequence
+    metrics: Mapping[str, Metric] = field(
+        default_factory=lambda: {
+            "onset": metrics.onset,
+            "switch_width": metrics.switch_width,
+            "peak": metrics.peak,
+        }
+    )
+    solver: Solver = LSODA(rtol=1e-6, atol=1e-6)
+    values: Mapping = field(default_factory=dict)
+    loop_values: Mapping = field(default_factory=dict)
+    workers: int | None = None
+
+    def model(self) -> Model:
+        return Model(self.simulator(), loop_values=self.loop_values)
+
+    def run(self, points: pd.DataFrame | Mapping, /) -> pd.DataFrame:
+        """Evaluate each row of points.
+
+        Columns are components or their names.
+        Returns a tidy table with one row per point, observable and metric.
+        """
+        return pd.concat(list(self.stream([points])), ignore_index=True)
+
+    def stream(
+        self, chunks: Iterable[pd.DataFrame | Mapping], /
+    ) -> Iterator[pd.DataFrame]:
+        """Evaluate chunks of points, yielding the table of each chunk.
+
+        All chunks share the same worker processes.
+        """
+        model = self.model()
+        observables = [
+            k if isinstance(k, str) else str(_species_to_variable(k))
+            for k in self.observables
+        ]
+        keys = list(itertools.product(observables, self.metrics))
+        values = {model.name(k): v for k, v in self.values.items()}
+
+        workers = self.workers if self.workers is not None else os.cpu_count()
+        with contextlib.ExitStack() as stack:
+            if workers == 1:
+                _initialize(self, values)
+                executor = None
+            else:
+                executor = stack.enter_context(
+                    ProcessPoolExecutor(
+                        workers,
+                        initializer=_initialize,
+                        initargs=(self, values),
+                    )
+                )
+
+            for points in chunks:
+                points = pd.DataFrame(points)
+                points.columns = [model.name(k) for k in points.columns]
+                rows = points.to_dict(orient="records")
+                if executor is None:
+                    results = map(_evaluate, rows)
+                else:
+                    results = executor.map(
+                        _evaluate,
+                        rows,
+                        chunksize=max(1, len(rows) // (4 * workers)),
+                    )
+                yield pd.DataFrame(
+                    [
+                        {**point, "observable": o, "metric": m, "value": value}
+                        for point, result in zip(rows, results)
+                        for (o, m), value in zip(keys, result)
+                    ]
+                )
+
+    def one_at_a_time(self, parameters: Sequence, factors: ArrayLike) -> pd.DataFrame:
+        """Scale each parameter by factors from its default, keeping the rest."""
+        model = self.model()
+        names = [model.name(k) for k in parameters]
+        defaults = model.defaults(names)
+        defaults.update((model.name(k), v) for k, v in self.values.items())
+        factors = np.asarray(factors)
+
+        points = pd.DataFrame(
+            [{k: defaults[k] * f} for k in names for f in factors],
+            columns=names,
+        )
+        df = self.run(points)
+        n = len(df) // len(points)
+        df.insert(0, "parameter", np.repeat(names, factors.size * n))
+        df.insert(1, "factor", np.repeat(np.tile(factors, len(names)), n))
+        return df.drop(columns=names)
+
+
+@dataclass
+class Evaluator:
+    """Metrics of the observables of a sweep at single points, in-process.
+
+    The simulator is built once. Values, by name, override those of the sweep,
+    and points override both.
+
+    >>> evaluate = Evaluator(sweep)
+    >>> pd.Series(evaluate({"k1": 0.8}), index=evaluate.outputs)
+    """
+
+    sweep: Sweep
+    values: dict[str, float] = field(default_factory=dict)
+    model: Model = field(init=False)
+    save_at: NDArray = field(init=False)
+    index: list[int] = field(init=False)
+    "Index of each observable in the state."
+
+    def __post_init__(self):
+        self.model = Model(self.sweep.simulator(), loop_values=self.sweep.loop_values)
+        self.values = {
+            **{self.model.name(k): v for k, v in self.sweep.values.items()},
+            **self.values,
+        }
+        self.save_at = np.asarray(self.sweep.save_at)
+        self.index = [
+            self.model.variables.index(
+                k if isinstance(k, str) else str(_species_to_variable(k))
+            )
+            for k in self.sweep.observables
+        ]
+
+    @property
+    def outputs(self) -> pd.MultiIndex:
+        """(observable, metric) of each evaluated value."""
+        return pd.MultiIndex.from_product(
+            [[self.model.variables[i] for i in self.index], self.sweep.metrics],
+            names=["observable", "metric"],
+        )
+
+    def problem(self, values: Mapping[str, float]) -> Problem:
+        return self.model.create_problem(values, t_end=self.save_at[-1])
+
+    def __call__(self, values: Mapping[str, float]) -> list[float]:
+        values = {**self.values, **{k: v for k, v in values.items() if not pd.isna(v)}}
+        problem = self.problem(values)
+        solution = self.sweep.solver(problem, save_at=self.save_at)
+        out = []
+        for i in self.index:
+            x = solution.y[:, i]
+            out.extend(m(solution.t, x) for m in self.sweep.metrics.values())
+        return out
+
+
+_worker: Evaluator | None = None
+
+
+def _initialize(sweep: Sweep, values: dict[str, float]):
+    global _worker
+    if _worker is not None and _worker.sweep is sweep and _worker.values == values:
+        return  # reuse the compiled simulator
+    _worker = Evaluator(sweep, values)
+
+
+def _evaluate(values: Mapping[str, float]) -> list[float]:
+    assert _worker is not None
+    return _worker(values)
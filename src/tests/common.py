@@ -1,12 +1,60 @@
+from typing import TYPE_CHECKING
+
 import numpy as np
 import pandas as pd
-import pysb
 import simbio
+from simbio import (
+    Compartment,
+    MassAction,
+    Parameter,
+    Species,
+    assign,
+    initial,
+    reactions,
+)
+
+if TYPE_CHECKING:
+    import pysb
 
 TOL = 1e-6
 
 
-def run_pysb(model: pysb.Model, times: np.ndarray):
+class Chain(Compartment):
+    """A -> B -> C, where dC/dt peaks at log(k1 / k2) / (k1 - k2)."""
+
+    k1: Parameter = assign(default=1)
+    k2: Parameter = assign(default=2)
+    A: Species = initial(default=1)
+    B: Species = initial(default=0)
+    C: Species = initial(default=0)
+    r1 = MassAction(reactants=[A], products=[B], rate=k1)
+    r2 = MassAction(reactants=[B], products=[C], rate=k2)
+
+
+class Main(Compartment):
+    """x decays, and is produced from a in each Loop."""
+
+    x: Species = initial(default=1)
+    r = reactions.Destruction(A=x, rate=0.1)
+
+
+class Loop(Compartment):
+    x: Species = initial(default=0)
+    a: Species = initial(default=1)
+    k: Parameter = assign(default=0.5)
+    r = reactions.Conversion(A=a, B=x, rate=k)
+
+
+def renamer(x: str, /) -> str:
+    """Names of a manual model with main and loop_<i> compartments,
+    as given by LoopSimulator with loop_output="index_as_suffix"."""
+    compartment, _, name = x.partition(".")
+    if compartment == "main":
+        return name
+    return f"{name}_{compartment.rpartition('_')[2]}"
+
+
+def run_pysb(model: "pysb.Model", times: np.ndarray):
     import sys
     import types
 
@@ -40,7 +88,7 @@ def run_simbio(sim: simbio.Simulator, times: np.ndarray):
 def run_models(
     *,
     simbio_model: simbio.Compartment,
-    pysb_model: pysb.Model,
+    pysb_model: "pysb.Model",
     times: np.ndarray,
     mapping: dict[simbio.Species, str],
 ):
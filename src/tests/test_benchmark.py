@@ -0,0 +1,40 @@
+import numpy as np
+from pytest import approx
+from simbio import Simulator
+
+from .. import metrics
+from ..benchmark import Case, run, work_precision
+from .common import Chain
+
+
+def chain(k1: float = 2) -> Case:
+    # B = 1 - exp(-k1 t) if k2 = 0
+    sim = Simulator(Chain)
+    return Case(
+        "chain",
+        sim.create_problem({Chain.k1: k1, Chain.k2: 0}, t_span=(0, 100)),
+        metrics.Cleavage(
+            metrics.state_index(sim, Chain.A),
+            metrics.state_index(sim, Chain.B),
+        ),
+    )
+
+
+def test_run():
+    result = run(chain(), "LSODA", rtol=1e-8, atol=1e-10)
+    assert result["success"]
+    assert result["nfev"] > 0
+    assert result["delay"] == approx(np.log(2) / 2, rel=1e-6)
+
+
+def test_work_precision():
+    df = work_precision(
+        [chain()],
+        tolerances=[(1e-3, 1e-6), (1e-8, 1e-10)],
+    )
+    assert len(df) == 6
+    assert df["success"].all()
+    assert set(df.columns) >= {"case", "method", "time", "nfev", "njev", "error"}
+    loose, tight = df.query("method == 'BDF'")["error"]
+    assert tight < loose
+    assert tight == approx(0, abs=1e-6)
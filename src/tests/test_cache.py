@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+from poincare.solvers import LSODA
+from scipy import sparse
+from simbio import Simulator
+
+from ..cache import Cached
+from ..mito import ARM_Cito, Mitochondria
+from ..n_mito.loop_simulator import LoopSimulator
+from .common import Chain, Loop, Main
+
+
+def test_cached(tmp_path):
+    sim = Cached(Simulator(Chain), maxsize=2, path=tmp_path)
+    t = np.linspace(0, 1, 11)
+    df = sim.solve({Chain.k1: 2}, save_at=t)
+    df.iloc[:] = 0  # returned copies do not modify the cache
+    expected = sim.sim.solve({Chain.k1: 2}, save_at=t)
+    pd.testing.assert_frame_equal(sim.solve({Chain.k1: 2.0}, save_at=t), expected)
+    assert (sim.hits, sim.misses) == (1, 1)
+
+    sim.solve({Chain.k1: 3}, save_at=t)
+    sim.solve({Chain.k1: 2}, save_at=t, solver=LSODA(rtol=1e-8))
+    sim.solve({Chain.k1: 2}, save_at=t[:5])
+    assert (sim.hits, sim.misses) == (1, 4)
+    assert len(sim.memory) == 2
+
+    # On disk
+    sim = Cached(Simulator(Chain), path=tmp_path)
+    pd.testing.assert_frame_equal(sim.solve({Chain.k1: 2}, save_at=t), expected)
+    assert (sim.hits, sim.misses) == (1, 0)
+
+
+def test_cached_loop(tmp_path, arm_loop):
+    kwargs = dict(
+        main_values={ARM_Cito.L: 1_000},
+        loop_values={Mitochondria.Bcl2: [1e4, 3e4]},
+        save_at=np.linspace(0, 30_000, 100),
+    )
+    df = Cached(arm_loop, path=tmp_path).solve(**kwargs)
+    sim = Cached(arm_loop, path=tmp_path)
+    pd.testing.assert_frame_equal(sim.solve(**kwargs), df)
+    assert sim.hits == 1
+
+    kwargs["loop_values"] = {Mitochondria.Bcl2: [1e4, 2e4]}
+    sim.solve(**kwargs)
+    assert sim.misses == 1
+
+
+def test_cached_xarray(tmp_path):
+    xarray = pytest.importorskip("xarray")
+    sim = Cached(LoopSimulator(Main, Loop(x=Main.x)), path=tmp_path)
+    kwargs = dict(
+        loop_values={Loop.a: [1, 2, 3]},
+        save_at=np.linspace(0, 5, 11),
+        loop_output="xarray",
+    )
+    ds = sim.solve(**kwargs)
+    ds["a"][:] = 0  # returned copies do not modify the cache
+    expected = sim.sim.solve(**kwargs)
+    xarray.testing.assert_identical(sim.solve(**kwargs), expected)
+    assert (sim.hits, sim.misses) == (1, 1)
+
+    # On disk
+    sim = Cached(LoopSimulator(Main, Loop(x=Main.x)), path=tmp_path)
+    xarray.testing.assert_identical(sim.solve(**kwargs), expected)
+    assert (sim.hits, sim.misses) == (1, 0)
+
+
+def test_cached_instrument(tmp_path):
+    sim = Cached(LoopSimulator(Main, Loop(x=Main.x), instrument=True), path=tmp_path)
+    kwargs = dict(loop_values={Loop.a: [1, 2, 3]}, save_at=np.linspace(0, 5, 11))
+    df = sim.solve(**kwargs)
+    assert df.attrs["stats"].solves == 1
+
+    df = sim.solve(**kwargs)
+    assert "stats" not in df.attrs
+    assert sim.stats.solves == 1
+
+    # On disk
+    sim = Cached(LoopSimulator(Main, Loop(x=Main.x), instrument=True), path=tmp_path)
+    df = sim.solve(**kwargs)
+    assert "stats" not in df.attrs
+    assert sim.hits == 1
+
+
+def test_cached_exchange(tmp_path):
+    def create(k):
+        return Cached(LoopSimulator(Main, Loop(x=Main.x), exchange={Loop.a: k}))
+
+    kwargs = dict(loop_values={Loop.a: [3, 0, 0]}, save_at=np.linspace(0, 5, 11))
+    path = sparse.csr_array([[0, 1, 0], [1, 0, 0], [0, 0, 0]])
+    other = sparse.csr_array([[0, 0, 0], [0, 0, 1], [0, 1, 0]])
+    assert create(0.3).key(**kwargs, adjacency=path) != create(0.3).key(
+        **kwargs, adjacency=other
+    )
+    assert create(0.3).key(**kwargs, adjacency=path) != create(0.6).key(
+        **kwargs, adjacency=path
+    )
+
+    sim = Cached(
+        LoopSimulator(Main, Loop(x=Main.x), exchange={Loop.a: 0.3}), path=tmp_path
+    )
+    kwargs["loop_output"] = "index_as_suffix"
+    df = sim.solve(**kwargs, adjacency=path)
+    pd.testing.assert_frame_equal(
+        sim.solve(**kwargs, adjacency=other),
+        sim.sim.solve(**kwargs, adjacency=other),
+    )
+    assert (sim.hits, sim.misses) == (0, 2)
+    assert not df.equals(sim.solve(**kwargs, adjacency=other))
@@ -0,0 +1,81 @@
+import functools
+
+import numpy as np
+import pandas as pd
+from simbio import Simulator
+
+from ..calibration import Calibration, Memo, targets
+from .common import Chain
+
+
+def test_targets():
+    df = targets()
+    assert list(df.index) == [1000, 250, 50, 10, 2]
+    assert df.loc[50, "ligand"] == 3_000
+    assert df.loc[50, "delay_mean"] == 240 * 60
+
+
+def test_memo(tmp_path):
+    calls = []
+
+    def func(x):
+        calls.append(x)
+        return sum(x)
+
+    path = tmp_path / "checkpoint.jsonl"
+    xs = [np.array([0.1, 0.2]), np.array([0.3, 0.4]), np.array([0.1, 0.2])]
+    assert Memo(path).wrap(map)(func, xs) == [0.1 + 0.2, 0.3 + 0.4, 0.1 + 0.2]
+    assert len(calls) == 2
+
+    # Resumed from the checkpoint
+    assert Memo(path).wrap(map)(func, xs[:2]) == [0.1 + 0.2, 0.3 + 0.4]
+    assert len(calls) == 2
+
+
+def calibration(**kwargs) -> Calibration:
+    return Calibration(
+        simulator=functools.partial(Simulator, Chain),
+        parameters=[Chain.k2],
+        ligand=Chain.k1,
+        substrate=Chain.A,
+        product=Chain.C,
+        t_end=100,
+        data=pd.DataFrame(
+            {
+                "ligand": [1, 3],
+                "delay_mean": [2.0, 1.0],
+                "delay_std": [0.5, 0.5],
+                "switch_width_mean": [0.5, 0.2],
+                "switch_width_std": [0.1, 0.1],
+            }
+        ),
+        workers=1,
+        **kwargs,
+    )
+
+
+def test_fit():
+    result = calibration().fit(seed=0, maxiter=1, popsize=2, polish=False)
+    assert result.x.shape == (1,)
+    assert -1 <= result.x[0] <= 1
+    assert np.isfinite(result.fun)
+
+
+def test_resume(tmp_path):
+    kwargs = dict(seed=0, popsize=2, polish=False)
+    expected = calibration().fit(maxiter=2, **kwargs)
+
+    path = tmp_path / "checkpoint.jsonl"
+    calibration(checkpoint=path).fit(maxiter=1, **kwargs)
+    interrupted = path.read_text().splitlines()
+
+    result = calibration(checkpoint=path).fit(maxiter=2, **kwargs)
+    resumed = path.read_text().splitlines()
+    assert resumed[: len(interrupted)] == interrupted
+    assert len(resumed) > len(interrupted)
+    assert result.x == expected.x
+    assert result.fun == expected.fun
+
+    # Fully replayed, without new points
+    calibration(checkpoint=path).fit(maxiter=2, **kwargs)
+    assert path.read_text().splitlines() == resumed
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from poincare.solvers import BDF, LSODA
+from simbio import Simulator
+
+from ..conservation import Reduced
+from ..mito import ARM_Cito, Mitochondria
+from .common import Chain
+
+
+def test_reduced():
+    sim = Reduced(Simulator(Chain), global_laws=True)
+    t = np.linspace(0, 3, 7)
+    solver = LSODA(rtol=1e-10, atol=1e-12)
+    df = sim.solve({Chain.A: 2}, save_at=t, solver=solver)
+    assert sim.create_problem().y.size == 2
+    assert sim.conservation.main.tolist() == [[1, 1, 1]]
+    expected = sim.sim.solve({Chain.A: 2}, save_at=t, solver=solver)
+    pd.testing.assert_frame_equal(df, expected, rtol=1e-8)
+
+
+@pytest.mark.parametrize(
+    "solver", [LSODA(rtol=1e-8, atol=1e-4), BDF(rtol=1e-8, atol=1e-4)]
+)
+def test_reduced_loop(arm_loop, solver):
+    sim = Reduced(arm_loop)
+    kwargs = dict(
+        main_values={ARM_Cito.L: 1_000},
+        loop_values={Mitochondria.Bcl2: [1e4, 3e4]},
+    )
+    k = len(sim.create_problem(**kwargs).y)
+    n = arm_loop.create_problem(**kwargs).y.size
+    assert n - k == 2 * len(sim.conservation.loop)
+
+    kwargs.update(save_at=np.linspace(0, 20_000, 11), solver=solver)
+    for loop_output in ["index_as_suffix", "sum"]:
+        df = sim.solve(**kwargs, loop_output=loop_output)
+        expected = arm_loop.solve(**kwargs, loop_output=loop_output)
+        assert list(df.columns) == list(expected.columns)
+        scale = expected.abs().max() + 1
+        pd.testing.assert_frame_equal(df / scale, expected / scale, rtol=0, atol=1e-4)
+
+    observables = {"C3_A": ARM_Cito.C3_A, "Bcl2": Mitochondria.Bcl2}
+    df = sim.solve(**kwargs, observables=observables)
+    expected = arm_loop.solve(**kwargs, observables=observables)
+    scale = expected.abs().max() + 1
+    pd.testing.assert_frame_equal(df / scale, expected / scale, rtol=0, atol=1e-4)
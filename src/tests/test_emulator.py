@@ -0,0 +1,51 @@
+import functools
+
+import numpy as np
+from pytest import approx
+from simbio import Simulator
+
+from .. import metrics
+from ..emulator import Emulator, GaussianProcess, at
+from ..sweep import Sweep
+from .common import Chain
+
+
+def test_gaussian_process():
+    X = np.linspace(0, 1, 20)[:, None]
+    gp = GaussianProcess().fit(X, np.sin(4 * X[:, 0]))
+    mean, std = gp.predict([[0.33], [0.5]])
+    assert mean == approx(np.sin(4 * np.array([0.33, 0.5])), abs=1e-3)
+    assert np.all(std < 1e-2)
+
+
+def test_emulator():
+    def onset(k1, k2=2):
+        return np.log(k1 / k2) / (k1 - k2)
+
+    sweep = Sweep(
+        simulator=functools.partial(Simulator, Chain),
+        save_at=np.linspace(0, 10, 2001),
+        observables=[Chain.C],
+        metrics={"onset": metrics.onset, **at([0.5, 1.0])},
+        workers=1,
+    )
+    emulator = Emulator.train(sweep, {Chain.k1: (0.5, 1.5)}, n=16)
+    mean, std = emulator.predict({"k1": 0.8})
+    assert mean["C", "onset"] == approx(onset(0.8), rel=1e-3)
+    assert std["C", "onset"] < 1e-2
+
+    mean, std = emulator.curves({"k1": 0.8})
+    assert list(mean.index) == [0.5, 1.0]
+
+    # Outside the domain, solved by the same evaluator
+    mean, std = emulator.predict({"k1": 3})
+    assert mean["C", "onset"] == approx(onset(3), rel=1e-3)
+    assert std["C", "onset"] == 0
+    evaluator = emulator._evaluator
+
+    # Parameters not in the domain
+    assert not emulator.contains({"k1": 0.8, "k2": 3})
+    mean, std = emulator.predict({"k1": 0.8, "k2": 3})
+    assert mean["C", "onset"] == approx(onset(0.8, 3), rel=1e-3)
+    assert std["C", "onset"] == 0
+    assert emulator._evaluator is evaluator
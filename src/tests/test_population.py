@@ -0,0 +1,45 @@
+import numpy as np
+from poincare.solvers import LSODA
+from pytest import approx, mark
+from simbio import Simulator
+
+from ..population import Population, lognormal, sample
+from .common import Chain
+
+
+def test_sample():
+    values = sample({Chain.k1: lognormal(2, 0.1)}, 10_000, seed=0)
+    assert np.median(values[Chain.k1]) == approx(2, rel=1e-2)
+    assert np.std(np.log(values[Chain.k1])) == approx(0.1, rel=5e-2)
+
+
+def test_create_initials():
+    pop = Population(Chain)
+    values = {Chain.k1: [1.0, 2.0, 3.0], Chain.A: [4.0, 5.0, 6.0], Chain.k2: 7.0}
+    y, p = pop.create_initials(values)
+    sim = Simulator(Chain)
+    for i in range(3):
+        problem = sim.create_problem(
+            {k: np.ravel(v)[i % np.size(v)] for k, v in values.items()}
+        )
+        assert y[3 * i : 3 * (i + 1)] == approx(problem.y)
+        assert p[2 * i : 2 * (i + 1)] == approx(problem.p)
+
+    y, p = pop.create_initials({})
+    assert y == approx(sim.create_problem().y)
+
+
+@mark.parametrize("batch", [1, 2, 3])
+def test_population(batch):
+    k1 = np.array([1.0, 2.0, 3.0])
+    t = np.linspace(0, 2, 21)
+    df = Population(Chain).solve(
+        {Chain.k1: k1, Chain.k2: 0},
+        save_at=t,
+        solver=LSODA(rtol=1e-8, atol=1e-10),
+        batch=batch,
+    )
+    assert df.columns.names == ["cell", "variable"]
+    # B = 1 - exp(-k1 t) if k2 = 0
+    B = df.xs("B", axis=1, level="variable").values
+    assert B == approx(1 - np.exp(-np.outer(t, k1)), abs=1e-7)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from poincare.solvers import BDF, LSODA
+from pytest import approx
+from simbio import Simulator
+
+from ..mito import ARM_Cito, Mitochondria
+from ..n_mito.loop_simulator import LoopSimulator
+from ..protocol import Step, Stimulated, pulse
+from .common import Chain, Loop, Main
+
+
+def test_stimulated():
+    sim = Stimulated(
+        Simulator(Chain),
+        [Step(2, {Chain.k1: 0}), Step(1, {Chain.A: 1})],
+    )
+    t = np.linspace(0, 3, 7)
+    df = sim.solve(save_at=t, solver=LSODA(rtol=1e-8, atol=1e-10))
+    assert df["A"].to_numpy() == approx(
+        [1, np.exp(-0.5), np.exp(-1), np.exp(-0.5), np.exp(-1), np.exp(-1), np.exp(-1)],
+        rel=1e-6,
+    )
+    assert "event" not in df
+
+    # Steps at the start are initial values.
+    sim = Stimulated(Simulator(Chain), [Step(0, {Chain.A: 2})])
+    assert sim.solve(save_at=t)["A"].iloc[0] == 2
+
+
+def test_stimulated_loop(arm_loop):
+    sim = Stimulated(
+        arm_loop,
+        pulse(ARM_Cito.L, 1_000, start=0, duration=1_800),
+    )
+    df = sim.solve(
+        loop_values={Mitochondria.Bcl2: [1e4, 3e4]},
+        save_at=[0, 1_800, 2_000],
+    ).rename(columns=str)
+    assert df["L"].to_numpy()[:2] == approx([1_000, 950], rel=1e-2)
+    assert df["L"].iloc[2] < 50
+
+
+@pytest.mark.parametrize(
+    "solver", [LSODA(rtol=1e-8, atol=1e-10), BDF(rtol=1e-8, atol=1e-10)]
+)
+def test_stimulated_loop_solvers(solver):
+    # Conversion of a stops at t = 2.
+    sim = Stimulated(
+        LoopSimulator(Main, Loop(x=Main.x)),
+        [Step(2, loop_values={Loop.k: [0, 0, 0]})],
+    )
+    t = np.linspace(0, 4, 9)
+    kwargs = dict(loop_values={Loop.a: [1, 2, 3]}, save_at=t, solver=solver)
+    expected = 6 * np.exp(-0.5 * np.minimum(t, 2))
+
+    df = sim.solve(**kwargs, loop_output="sum").rename(columns=str)
+    assert df["a"].to_numpy() == approx(expected, rel=1e-6)
+    df = sim.solve(**kwargs, observables={"a": Loop.a})
+    assert df["a"].to_numpy() == approx(expected, rel=1e-6)
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from poincare.solvers import LSODA
+from pytest import approx
+from simbio import Simulator
+
+from ..mito import ARM, ARM_Cito, Mitochondria
+from ..network import Network, influencers
+from ..pruning import Pruned
+from .common import Chain
+
+
+def test_influencers():
+    # A -> B -> C, B + D -> B + E
+    reactions = [(["A"], ["A", "B"]), (["B"], ["B", "C"]), (["B", "D"], ["D", "E"])]
+    assert influencers(reactions, ["B"]) == ({"A", "B"}, [0, 1])
+    assert influencers(reactions, ["E"]) == ({"A", "B", "D", "E"}, [0, 1, 2])
+    assert influencers(reactions, ["A"]) == ({"A"}, [0])
+
+
+def test_prune_arm():
+    network = Network.from_simulator(Simulator(ARM))
+    outputs = ["cytoplasm.C3_A", "cytoplasm.C8_A", "cytoplasm.Apop"]
+    pruned = network.prune(outputs)
+    assert set(network.species) - set(pruned.species) == {
+        "cytoplasm.C3_ub",
+        "cytoplasm.PARP_C",
+    }
+
+
+def test_pruned():
+    sim = Pruned(Simulator(Chain), [Chain.A])
+    t = np.linspace(0, 2, 5)
+    df = sim.solve(save_at=t, solver=LSODA(rtol=1e-8, atol=1e-10))
+    assert list(df.columns) == ["A"]
+    assert sim.create_problem().y.size == 1
+    assert df["A"].to_numpy() == approx(np.exp(-t), rel=1e-6)
+
+    sim = Pruned(Simulator(Chain), [Chain.B])
+    solver = LSODA(rtol=1e-8, atol=1e-10)
+    pd.testing.assert_frame_equal(
+        sim.solve(save_at=t, solver=solver),
+        sim.sim.solve(save_at=t, solver=solver)[["B"]],
+        rtol=1e-6,
+    )
+
+
+def test_pruned_loop(arm_loop):
+    loop = arm_loop
+    kwargs = dict(
+        main_values={ARM_Cito.L: 1_000},
+        loop_values={Mitochondria.Bcl2: [1e4, 3e4]},
+        save_at=np.linspace(0, 20_000, 11),
+    )
+    df = Pruned(loop, [ARM_Cito.Apop, Mitochondria.Bcl2]).solve(**kwargs)
+    assert list(df.columns) == ["Apop", "Bcl2_0", "Bcl2_1"]
+    expected = loop.solve(**kwargs, loop_output="index_as_suffix")
+    expected = expected.rename(columns=str)[df.columns]
+    assert (df - expected).abs().max().max() < 1e-3 * expected.abs().max().max()
@@ -0,0 +1,70 @@
+import numpy as np
+from poincare.solvers import BDF, LSODA
+from pytest import approx
+from simbio import Simulator
+
+from ..mito import ARM_Cito, Mitochondria
+from ..scaling import Scaled, pilot_scale
+from .common import Chain
+
+
+def test_pilot_scale():
+    sim = Simulator(Chain)
+    problem = sim.create_problem({Chain.k1: 1, Chain.k2: 2}, t_span=(0, 10))
+    scale = pilot_scale(
+        problem, 10, solver=LSODA(rtol=1e-8, atol=1e-10), n=10_001, floor=0
+    )
+    # B peaks at t = log(k1 / k2) / (k1 - k2) = log(2)
+    assert scale == approx([1, 0.25, 1], rel=1e-4)
+
+    scale = pilot_scale(problem, 10, floor=0.5)
+    assert scale[1] == 0.5
+
+
+def test_scaled():
+    t = np.linspace(0, 10, 11)
+    sim = Scaled(Simulator(Chain), floor=1e-3)
+    solver = LSODA(rtol=1e-8, atol=1e-8)
+    expected = Simulator(Chain).solve(save_at=t, solver=solver)
+    df = sim.solve(save_at=t, solver=solver)
+    assert df.values == approx(expected.values, rel=1e-6, abs=1e-7)
+    (scale,) = sim.scales.values()
+    assert scale == approx([1, 0.25, 1], rel=1e-2)
+
+
+def test_scaled_loop(arm_loop):
+    sim = Scaled(arm_loop)
+    t = np.linspace(0, 6 * 3600, 11)
+    values = dict(
+        main_values={ARM_Cito.L: 1000},
+        loop_values={Mitochondria.volume: [0.03, 0.04]},
+    )
+    solver = LSODA(rtol=1e-7, atol=1e-6)
+    expected = sim.sim.solve(**values, save_at=t, solver=solver)
+    df = sim.solve(**values, save_at=t, solver=solver)
+    assert df.values == approx(expected.values, rel=1e-3, abs=1)
+    (size,) = sim.scales
+    assert size == sim.create_problem(**values).y.size
+
+
+def test_scaled_loop_solvers(arm_loop):
+    sim = Scaled(arm_loop)
+    values = dict(
+        main_values={ARM_Cito.L: 1000},
+        loop_values={Mitochondria.Bcl2: [1e4, 3e4]},
+        save_at=np.linspace(0, 6 * 3600, 11),
+    )
+    observables = {"C3_A": ARM_Cito.C3_A, "Bcl2": Mitochondria.Bcl2}
+    reference = BDF(rtol=1e-10, atol=1e-8)
+    expected = arm_loop.solve(**values, solver=reference, loop_output="sum")
+    expected_observed = arm_loop.solve(
+        **values, solver=reference, observables=observables
+    )
+    for solver in [LSODA(rtol=1e-7, atol=1e-6), BDF(rtol=1e-7, atol=1e-6)]:
+        df = sim.solve(**values, solver=solver, loop_output="sum")
+        scale = expected.abs().max() + 1
+        assert ((df - expected).abs() / scale).max().max() < 1e-2
+
+        df = sim.solve(**values, solver=solver, observables=observables)
+        scale = expected_observed.abs().max() + 1
+        assert ((df - expected_observed).abs() / scale).max().max() < 1e-2
@@ -0,0 +1,41 @@
+import functools
+
+import numpy as np
+from pytest import approx
+from simbio import Simulator
+
+from .. import metrics
+from ..sensitivity import GSA
+from ..sweep import Sweep
+from .common import Chain
+
+
+def test_gsa(tmp_path):
+    gsa = GSA(
+        sweep=Sweep(
+            simulator=functools.partial(Simulator, Chain),
+            save_at=np.linspace(0, 10, 1001),
+            observables=[Chain.B],
+            metrics={"peak": metrics.peak},
+            workers=1,
+        ),
+        # The peak of B is proportional to A
+        bounds={Chain.k1: (-1, 1), Chain.k2: (-1, 1), Chain.A: (-0.01, 0.01)},
+        n=2**6,
+        chunk=100,
+        path=tmp_path,
+    )
+    results = gsa.run()
+    assert len(list(tmp_path.glob("chunk_*.parquet"))) == 4
+
+    y = gsa.outputs(results)["B", "peak"]
+    sobol = gsa.sobol(y)
+    assert sobol.loc["k1", "ST"] > 0.1
+    assert sobol.loc["k2", "ST"] > 0.1
+    assert sobol.loc["A", "ST"] < 0.01
+    morris = gsa.morris(y)
+    assert morris.loc["A", "mu_star"] == approx(np.log(10) * y.mean(), rel=0.05)
+
+    # Resumes from existing chunks
+    (tmp_path / "chunk_00001.parquet").unlink()
+    assert gsa.run().equals(results)
@@ -0,0 +1,119 @@
+import numpy as np
+from pytest import approx
+from simbio import (
+    Compartment,
+    MassAction,
+    Parameter,
+    Simulator,
+    Species,
+    assign,
+    initial,
+)
+
+from ..mito import ARM_Cito, Mitochondria
+from ..n_mito.loop_simulator import LoopSimulator
+from ..network import Network
+from ..steady_state import PreEquilibrated, steady_state
+
+
+class Reversible(Compartment):
+    """A <-> B, with S + B -> C as stimulus."""
+
+    kf: Parameter = assign(default=1)
+    kr: Parameter = assign(default=3)
+    ks: Parameter = assign(default=1)
+    A: Species = initial(default=1)
+    B: Species = initial(default=0)
+    C: Species = initial(default=0)
+    S: Species = initial(default=1)
+    forward = MassAction(reactants=[A], products=[B], rate=kf)
+    reverse = MassAction(reactants=[B], products=[A], rate=kr)
+    stimulus = MassAction(reactants=[S, B], products=[C], rate=ks)
+
+
+class Reservoir(Compartment):
+    """x <-> z, with x bound by the Binding loops."""
+
+    x: Species = initial(default=100)
+    z: Species = initial(default=0)
+    kf: Parameter = assign(default=1)
+    kr: Parameter = assign(default=2)
+    forward = MassAction(reactants=[x], products=[z], rate=kf)
+    reverse = MassAction(reactants=[z], products=[x], rate=kr)
+
+
+class Binding(Compartment):
+    """x + y <-> c"""
+
+    x: Species = initial(default=0)
+    y: Species = initial(default=1)
+    c: Species = initial(default=0)
+    kb: Parameter = assign(default=0.1)
+    ku: Parameter = assign(default=1)
+    bind = MassAction(reactants=[x, y], products=[c], rate=kb)
+    unbind = MassAction(reactants=[c], products=[x, y], rate=ku)
+
+
+def test_network_loop(arm_loop):
+    sim = arm_loop
+    problem = sim.create_problem(
+        main_values={ARM_Cito.L: 1_000},
+        loop_values={Mitochondria.Bcl2: [1e4, 2e4, 3e4]},
+    )
+    network = Network.from_loop_simulator(sim, 3)
+    y = np.asarray(problem.y) * np.linspace(0.5, 1.5, problem.y.size) + 1
+    k = network.rate_constants(problem.p)
+    dy = np.empty_like(y)
+    problem.rhs(0, y, problem.p, dy)
+    assert network.rhs(y, k) == approx(dy)
+
+    J = network.jacobian(y, k).toarray()
+    h = 1e-6 * y
+    for i in range(0, y.size, 7):
+        e = np.zeros_like(y)
+        e[i] = h[i]
+        fd = (network.rhs(y + e, k) - network.rhs(y - e, k)) / (2 * h[i])
+        assert J[:, i] == approx(fd, rel=1e-5, abs=1e-9)
+
+
+def test_steady_state():
+    sim = Simulator(Reversible)
+    problem = sim.create_problem({Reversible.S: 0})
+    network = Network.from_simulator(sim)
+    y = steady_state(network, problem.y, network.rate_constants(problem.p))
+    expected = {"A": 0.75, "B": 0.25, "C": 0, "S": 0}
+    assert dict(zip(network.species, y)) == approx(expected)
+
+
+def test_steady_state_loops():
+    N = 2_000
+    sim = LoopSimulator(Reservoir, Binding(x=Reservoir.x))
+    problem = sim.create_problem(
+        loop_values={
+            Binding.kb: np.linspace(0.01, 1, N),
+            Binding.y: np.linspace(1, 5, N),
+        }
+    )
+    network = Network.from_loop_simulator(sim, N)
+    assert network.stoichiometry.nnz < 10 * N
+    k = network.rate_constants(problem.p)
+    y = steady_state(network, problem.y, k)
+    assert np.abs(network.rhs(y, k)).max() < 1e-6
+
+    # Conserved totals
+    assert network.species[:4] == ["x", "z", "c_0", "y_0"]
+    x, z, (c, y_free) = y[0], y[1], y[2:].reshape(N, 2).T
+    assert x + z + c.sum() == approx(100)
+    assert y_free + c == approx(np.linspace(1, 5, N))
+
+
+def test_pre_equilibrated():
+    sim = PreEquilibrated(Simulator(Reversible), unstimulated={Reversible.S: 0})
+    df = sim.solve({Reversible.ks: 2}, save_at=np.linspace(0, 1, 11))
+    expected = {"A": 0.75, "B": 0.25, "C": 0, "S": 1}
+    assert df.iloc[0].to_dict() == approx(expected)
+    assert df["C"].iloc[-1] > 0
+    assert len(sim.cache) == 1
+
+    sim.solve({Reversible.ks: 3}, save_at=np.linspace(0, 1, 11))
+    assert len(sim.cache) == 2
@@ -0,0 +1,100 @@
+import functools
+
+import numpy as np
+from pytest import approx, mark
+from simbio import Simulator
+
+from .. import metrics
+from ..mito import ARM_Cito, Mitochondria
+from ..n_mito.loop_simulator import LoopSimulator
+from ..sweep import Model, Sweep
+from .common import Chain, Loop, Main
+
+
+def test_metrics():
+    t = np.linspace(0, 200, 2001)
+    t_d, t_s = 100.0, 2.0
+    x = 1 / (1 + np.exp(-(t - t_d) / (4 * t_s)))
+    assert metrics.onset(t, x) == approx(t_d, abs=1e-3)
+    assert metrics.switch_width(t, x) == approx(t_s, rel=1e-3)
+    assert np.isnan(metrics.crossing(t, x, 2))
+
+
+@mark.parametrize("workers", [1, 2])
+def test_sweep(workers):
+    sweep = Sweep(
+        simulator=functools.partial(Simulator, Chain),
+        save_at=np.linspace(0, 10, 2001),
+        observables=[Chain.C],
+        workers=workers,
+    )
+    df = sweep.run({Chain.k1: [1, 3], "k2": [2, 2]})
+    onset = df.query("metric == 'onset'").set_index("k1")["value"]
+    for k1, k2 in [(1, 2), (3, 2)]:
+        assert onset[k1] == approx(np.log(k1 / k2) / (k1 - k2), abs=1e-3)
+
+    df = sweep.one_at_a_time([Chain.k1, Chain.k2], [0.5, 1, 2])
+    assert len(df) == 2 * 3 * 3
+    assert set(df["parameter"]) == {"k1", "k2"}
+    peak = df.query("metric == 'peak'")["value"]
+    assert peak.to_numpy() == approx(1, abs=1e-2)
+
+
+def test_sweep_loop(arm_loop):
+    sweep = Sweep(
+        simulator=lambda: arm_loop,
+        save_at=np.linspace(0, 30_000, 1_000),
+        observables=[ARM_Cito.C3_A],
+        values={ARM_Cito.L: 1_000},
+        loop_values={Mitochondria.Mito_A: [0, 0]},
+        workers=1,
+    )
+    df = sweep.one_at_a_time([ARM_Cito.L, Mitochondria.Bcl2], [0.1, 1])
+    assert set(df["parameter"]) == {"L", "Mitochondria.Bcl2"}
+    onset = df.query("metric == 'onset'").set_index(["parameter", "factor"])["value"]
+    # More ligand, earlier onset. More Bcl2, later onset.
+    assert onset["L", 0.1] > onset["L", 1]
+    assert onset["Mitochondria.Bcl2", 0.1] < onset["Mitochondria.Bcl2", 1]
+
+    (bcl2,) = sweep.model().defaults(["Mitochondria.Bcl2"]).values()
+    for (parameter, factor), value in onset.items():
+        scale = {parameter: factor}
+        expected = arm_loop.solve(
+            main_values={ARM_Cito.L: 1_000 * scale.get("L", 1)},
+            loop_values={
+                Mitochondria.Mito_A: [0, 0],
+                Mitochondria.Bcl2: 2 * [bcl2 * scale.get("Mitochondria.Bcl2", 1)],
+            },
+            solver=sweep.solver,
+            save_at=sweep.save_at,
+            observables={"C3_A": ARM_Cito.C3_A},
+        )
+        t, x = expected.index.to_numpy(), expected["C3_A"].to_numpy()
+        assert value == approx(metrics.onset(t, x), rel=1e-6)
+
+
+def test_scalar_loop_values():
+    sim = LoopSimulator(Main, Loop(x=Main.x))
+    assert Model(sim).n_loops == 1
+    assert Model(sim, loop_values={Loop.k: [1, 2, 3]}).n_loops == 3
+
+    model = Model(sim, loop_values={Loop.k: 2})
+    problem = model.create_problem({"Loop.k": 3}, t_end=1)
+    assert problem.p[-1] == 3
+    problem = model.create_problem({"x": 2}, t_end=1)
+    assert problem.y[0] == 2
+    assert problem.p[-1] == 2
+
+
+def test_cleavage():
+    sim = Simulator(Chain)
+    cleavage = metrics.Cleavage(
+        metrics.state_index(sim, Chain.A),
+        metrics.state_index(sim, Chain.B),
+    )
+    # B = 1 - exp(-k1 t) if k2 = 0
+    k1 = 2
+    problem = sim.create_problem({Chain.k1: k1, Chain.k2: 0}, t_span=(0, 100))
+    out = cleavage(problem)
+    assert out["delay"] == approx(np.log(2) / k1, rel=1e-4)
+    assert out["switch_width"] == approx(1 / (8 * k1), rel=1e-4)